@@ -14,9 +14,15 @@ python3 manage.py collectstatic --noinput || {
     exit 1
 }
 
+# 监控指标的多进程目录，每次启动时清空上次运行留下的文件
+export METRICS_MULTIPROC_DIR=${METRICS_MULTIPROC_DIR:-/tmp/wxcloudrun-metrics}
+rm -rf "$METRICS_MULTIPROC_DIR"
+mkdir -p "$METRICS_MULTIPROC_DIR"
+
 # 启动Gunicorn服务
 echo "启动Gunicorn..."
 exec gunicorn \
+    --config gunicorn.conf.py \
     --bind 0.0.0.0:80 \
     --workers 1 \
     --timeout 120 \
@@ -0,0 +1,9 @@
+# Gunicorn 配置：启动参数在 docker-entrypoint.sh 中指定，这里只放服务钩子
+
+
+def post_worker_init(worker):
+    """worker 完成初始化后恢复上次进程退出前未完成的后台任务（在线程池中执行，不阻塞启动）"""
+    from wxcloudrun import jobs, upload_offload
+
+    jobs.replay_jobs()
+    upload_offload.replay_uploads()
@@ -0,0 +1,132 @@
+import json
+import logging
+import threading
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+class AchievementRule:
+    """编译后的成就解锁条件"""
+    # 计算该条件所需的队员统计项
+    requires = ()
+    rule_type = None
+
+    def __init__(self, achievement_id, criteria_type):
+        self.achievement_id = achievement_id
+        self.criteria_type = criteria_type
+
+    def progress(self, stats):
+        """
+        根据队员统计数据计算完成进度
+
+        Args:
+            stats: PlayerStats对象
+
+        Returns:
+            int: 0-100，100表示达成
+        """
+        raise NotImplementedError
+
+class _ThresholdRule(AchievementRule):
+    """统计值达到目标即解锁的条件，未达成时按比例记录进度"""
+    stat_name = None
+
+    def __init__(self, achievement_id, criteria_type, target):
+        super().__init__(achievement_id, criteria_type)
+        if target <= 0:
+            raise ValueError(f'目标值必须大于0: {target}')
+        self.target = target
+
+    def progress(self, stats):
+        value = getattr(stats, self.stat_name)
+        if value >= self.target:
+            return 100
+        return min(99, int(value / self.target * 100))
+
+class CompletionCountRule(_ThresholdRule):
+    """完成指定数量的不同任务"""
+    rule_type = 'completion_count'
+    requires = ('task_count',)
+    stat_name = 'task_count'
+
+class ConsecutiveDaysRule(_ThresholdRule):
+    """每日任务连续完成指定天数"""
+    rule_type = 'consecutive_days'
+    requires = ('max_streak',)
+    stat_name = 'max_streak'
+
+class AssessmentScoreRule(AchievementRule):
+    """考核得分达到指定分数（任一项目或全部项目）"""
+    rule_type = 'score'
+    requires = ('scores',)
+
+    def __init__(self, achievement_id, criteria_type, min_score, all_items=False):
+        super().__init__(achievement_id, criteria_type)
+        self.min_score = min_score
+        self.all_items = all_items
+
+    def progress(self, stats):
+        if not stats.score_count:
+            return 0
+        # 全部项目达标即最低分达标，任一项目达标即最高分达标
+        score = stats.min_score if self.all_items else stats.max_score
+        return 100 if score >= self.min_score else 0
+
+class PlayerStats:
+    """队员成就相关的统计数据"""
+    __slots__ = ('task_count', 'max_streak', 'score_count', 'min_score', 'max_score')
+
+    def __init__(self):
+        self.task_count = 0
+        self.max_streak = 0
+        self.score_count = 0
+        self.min_score = None
+        self.max_score = None
+
+def compile_rule(achievement):
+    """
+    将成就的条件JSON编译为规则对象
+
+    Returns:
+        AchievementRule，无法识别或配置错误时返回None
+    """
+    try:
+        criteria = json.loads(achievement.criteria_value or '{}')
+
+        if achievement.criteria_type == 'auto_task':
+            rule_type = criteria.get('type')
+            if rule_type == 'completion_count':
+                return CompletionCountRule(achievement.id, achievement.criteria_type, int(criteria.get('count', 0)))
+            if rule_type == 'consecutive_days':
+                return ConsecutiveDaysRule(
+                    achievement.id, achievement.criteria_type, int(criteria.get('consecutive_days', 0))
+                )
+
+        elif achievement.criteria_type == 'auto_assessment':
+            if criteria.get('type', 'score') == 'score':
+                return AssessmentScoreRule(
+                    achievement.id,
+                    achievement.criteria_type,
+                    float(criteria.get('min_score', 0)),
+                    bool(criteria.get('all_items', False)),
+                )
+
+    except (json.JSONDecodeError, ValueError, TypeError, AttributeError) as e:
+        logger.error(f"处理成就 {achievement.id} ({achievement.name}) 时出错: {str(e)}")
+
+    return None
+
+# 成就ID -> (updated_at, 规则对象)
+_rule_cache = {}
+_rule_cache_lock = threading.Lock()
+
+def get_rule(achievement):
+    """获取成就的编译规则，成就更新后自动重新编译"""
+    cached = _rule_cache.get(achievement.id)
+    if cached and cached[0] == achievement.updated_at:
+        return cached[1]
+
+    rule = compile_rule(achievement)
+    with _rule_cache_lock:
+        _rule_cache[achievement.id] = (achievement.updated_at, rule)
+    return rule
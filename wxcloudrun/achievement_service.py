@@ -1,12 +1,16 @@
-import json
 import logging
-from django.db.models import Count, Q, F, Exists, OuterRef
-from django.utils import timezone
-from datetime import date, timedelta
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q, F, Max, Min, Sum
+from datetime import date, datetime, timedelta
 from .models import (
-    PersonalAchievement, PlayerAchievement, Player, 
-    TaskCompletion, Task, AssessmentScore
+    PersonalAchievement, PlayerAchievement, AchievementProgress, Player,
+    TaskCompletion, TaskStreak, AssessmentScore
 )
+from .achievement_rules import PlayerStats, get_rule
+from .background import submit_on_commit
+from .leaderboard import get_leaderboard, refresh_player_points
 
 # 设置日志
 logger = logging.getLogger(__name__)
@@ -14,11 +18,7 @@ logger = logging.getLogger(__name__)
 def check_all_achievements():
     """检查所有队员的所有成就"""
     logger.info("开始检查所有队员的成就")
-    players = Player.objects.all()
-    
-    for player in players:
-        check_player_achievements(player.id)
-    
+    evaluate_achievements()
     logger.info("所有队员的成就检查完成")
     return True
 
@@ -27,11 +27,8 @@ def check_player_achievements(player_id):
     try:
         player = Player.objects.get(id=player_id)
         
-        # 检查任务相关成就
-        check_task_achievements(player_id)
-        
-        # 检查考核相关成就
-        check_assessment_achievements(player_id)
+        # 检查任务及考核相关的自动成就
+        evaluate_achievements([player_id])
         
         # 检查连续/累计相关成就
         check_streak_achievements(player_id)
@@ -49,75 +46,17 @@ def check_player_achievements(player_id):
         logger.error(f"检查队员ID {player_id} 成就时出错: {str(e)}")
         return False
 
-def check_task_achievements(player_id):
-    """检查任务相关成就"""
+def check_task_achievements(player_id, rule_types=None):
+    """
+    检查任务相关成就
+    
+    Args:
+        player_id: 队员ID
+        rule_types: 只检查指定条件类型（如 completion_count、consecutive_days）的成就，默认全部检查
+    """
     try:
-        # 获取所有基于任务的自动成就
-        task_achievements = PersonalAchievement.objects.filter(
-            criteria_type='auto_task',
-            is_public=True
-        )
-        
-        player = Player.objects.get(id=player_id)
-        
-        for achievement in task_achievements:
-            try:
-                # 如果已经获得此成就，跳过
-                if PlayerAchievement.objects.filter(player=player, achievement=achievement).exists():
-                    continue
-                    
-                # 解析条件值
-                criteria_dict = json.loads(achievement.criteria_value or '{}')
-                task_type = criteria_dict.get('type')
-                
-                # 根据不同条件类型处理
-                if task_type == 'completion_count':
-                    # 按完成任务数量颁发成就
-                    task_count = int(criteria_dict.get('count', 0))
-                    completed_tasks = TaskCompletion.objects.filter(
-                        player=player, 
-                        verified=True
-                    ).values('task').distinct().count()
-                    
-                    # 更新进度
-                    progress = min(100, int(completed_tasks / task_count * 100))
-                    
-                    # 检查是否达成
-                    if completed_tasks >= task_count:
-                        _award_achievement(player, achievement)
-                    else:
-                        # 记录进度
-                        _update_achievement_progress(player, achievement, progress)
-                        
-                elif task_type == 'consecutive_days':
-                    # 按连续完成天数颁发成就
-                    consecutive_days = int(criteria_dict.get('consecutive_days', 0))
-                    
-                    # 获取队员所有任务的最大连续天数
-                    max_streak = 0
-                    for task in Task.objects.filter(period='daily'):
-                        streak = task.get_task_streak(player)
-                        if streak > max_streak:
-                            max_streak = streak
-                    
-                    # 更新进度
-                    progress = min(100, int(max_streak / consecutive_days * 100))
-                    
-                    # 检查是否达成
-                    if max_streak >= consecutive_days:
-                        _award_achievement(player, achievement)
-                    else:
-                        # 记录进度
-                        _update_achievement_progress(player, achievement, progress)
-                
-                # 可以添加更多成就类型处理...
-                
-            except (json.JSONDecodeError, ValueError, TypeError, KeyError) as e:
-                logger.error(f"处理成就 {achievement.id} ({achievement.name}) 时出错: {str(e)}")
-                continue
-                
+        evaluate_achievements([player_id], criteria_types=['auto_task'], rule_types=rule_types)
         return True
-        
     except Exception as e:
         logger.error(f"检查任务成就时出错: {str(e)}")
         return False
@@ -125,59 +64,265 @@ def check_task_achievements(player_id):
 def check_assessment_achievements(player_id):
     """检查考核相关成就"""
     try:
-        # 获取所有基于考核的自动成就
-        assessment_achievements = PersonalAchievement.objects.filter(
-            criteria_type='auto_assessment',
-            is_public=True
-        )
-        
-        player = Player.objects.get(id=player_id)
-        
-        for achievement in assessment_achievements:
-            try:
-                # 如果已经获得此成就，跳过
-                if PlayerAchievement.objects.filter(player=player, achievement=achievement).exists():
-                    continue
-                    
-                # 解析条件值
-                criteria_dict = json.loads(achievement.criteria_value or '{}')
-                assessment_type = criteria_dict.get('type', 'score')
-                
-                # 处理不同类型的考核成就
-                if assessment_type == 'score':
-                    # 按分数颁发
-                    min_score = float(criteria_dict.get('min_score', 0))
-                    
-                    # 查询队员的考核分数
-                    scores = AssessmentScore.objects.filter(player=player)
-                    
-                    if criteria_dict.get('all_items', False):
-                        # 要求所有考核项目都达到分数
-                        all_passed = scores.count() > 0
-                        for score in scores:
-                            if score.score < min_score:
-                                all_passed = False
-                                break
-                                
-                        if all_passed:
-                            _award_achievement(player, achievement)
-                    else:
-                        # 任一考核项目达到分数即可
-                        if scores.filter(score__gte=min_score).exists():
-                            _award_achievement(player, achievement)
-                
-                # 更多考核成就处理...
-                
-            except (json.JSONDecodeError, ValueError, TypeError, KeyError) as e:
-                logger.error(f"处理成就 {achievement.id} ({achievement.name}) 时出错: {str(e)}")
-                continue
-                
+        evaluate_achievements([player_id], criteria_types=['auto_assessment'])
         return True
-        
     except Exception as e:
         logger.error(f"检查考核成就时出错: {str(e)}")
         return False
 
+def _load_rules(criteria_types=None, rule_types=None):
+    """加载并编译需要评估的自动成就规则"""
+    achievements = PersonalAchievement.objects.filter(
+        criteria_type__in=criteria_types or ['auto_task', 'auto_assessment'],
+        is_public=True
+    ).only('id', 'name', 'criteria_type', 'criteria_value', 'updated_at')
+    
+    rules = []
+    for achievement in achievements:
+        rule = get_rule(achievement)
+        if rule is None:
+            continue
+        if rule_types is not None and rule.rule_type not in rule_types:
+            continue
+        rules.append(rule)
+    return rules
+
+def _load_player_stats(player_ids, requires):
+    """
+    以分组查询一次性计算队员的成就统计数据
+    
+    Args:
+        player_ids: 队员ID列表，None表示全部队员
+        requires: 需要的统计项集合
+    
+    Returns:
+        dict: {队员ID: PlayerStats}
+    """
+    stats = defaultdict(PlayerStats)
+    
+    def scoped(queryset):
+        return queryset if player_ids is None else queryset.filter(player_id__in=player_ids)
+    
+    if 'task_count' in requires:
+        # 已验证完成的不同任务数量
+        rows = scoped(TaskCompletion.objects.filter(verified=True)).values('player_id').annotate(
+            task_count=Count('task_id', distinct=True)
+        ).values_list('player_id', 'task_count')
+        for player_id, task_count in rows:
+            stats[player_id].task_count = task_count
+    
+    if 'max_streak' in requires:
+        # 每日任务的最大连续天数
+        rows = scoped(TaskStreak.objects.filter(task__period='daily')).values('player_id').annotate(
+            max_streak=Max('current_streak')
+        ).values_list('player_id', 'max_streak')
+        for player_id, max_streak in rows:
+            stats[player_id].max_streak = max_streak or 0
+    
+    if 'scores' in requires:
+        # 考核成绩的最低分与最高分
+        rows = scoped(AssessmentScore.objects.all()).values('player_id').annotate(
+            score_count=Count('id'), min_score=Min('score'), max_score=Max('score')
+        ).values_list('player_id', 'score_count', 'min_score', 'max_score')
+        for player_id, score_count, min_score, max_score in rows:
+            player_stats = stats[player_id]
+            player_stats.score_count = score_count
+            player_stats.min_score = min_score
+            player_stats.max_score = max_score
+    
+    return stats
+
+def evaluate_achievements(player_ids=None, criteria_types=None, rule_types=None):
+    """
+    批量评估自动成就
+    
+    规则只编译一次，队员统计数据以少量分组查询计算，
+    新解锁的成就以 bulk_create 写入，进度变化以批量 upsert 写入进度表。
+    
+    Args:
+        player_ids: 队员ID列表，默认评估全部队员
+        criteria_types: 只评估指定颁发方式（auto_task / auto_assessment）的成就
+        rule_types: 只评估指定条件类型的成就
+    
+    Returns:
+        tuple: (新解锁数量, 进度更新数量)
+    """
+    rules = _load_rules(criteria_types, rule_types)
+    if not rules:
+        return 0, 0
+    
+    requires = {item for rule in rules for item in rule.requires}
+    stats = _load_player_stats(player_ids, requires)
+    if not stats:
+        return 0, 0
+    
+    achievement_ids = [rule.achievement_id for rule in rules]
+    player_ids = list(stats.keys())
+    
+    # 已解锁的成就
+    unlocked = set(PlayerAchievement.objects.filter(
+        achievement_id__in=achievement_ids,
+        player_id__in=player_ids
+    ).values_list('player_id', 'achievement_id'))
+    
+    # 已记录的进度，只写入有提升的部分
+    recorded_progress = dict(
+        ((player_id, achievement_id), progress)
+        for player_id, achievement_id, progress in AchievementProgress.objects.filter(
+            achievement_id__in=achievement_ids,
+            player_id__in=player_ids
+        ).values_list('player_id', 'achievement_id', 'progress')
+    )
+    
+    awards = []
+    progress_updates = []
+    for player_id, player_stats in stats.items():
+        for rule in rules:
+            key = (player_id, rule.achievement_id)
+            if key in unlocked:
+                continue
+            
+            progress = rule.progress(player_stats)
+            if progress >= 100:
+                awards.append(key)
+            elif progress > recorded_progress.get(key, 0):
+                progress_updates.append((player_id, rule.achievement_id, progress))
+    
+    award_achievements(awards)
+    upsert_achievement_progress(progress_updates)
+    
+    logger.info(f"成就评估完成：新解锁 {len(awards)} 个，进度更新 {len(progress_updates)} 条")
+    return len(awards), len(progress_updates)
+
+def award_achievements(pairs):
+    """
+    批量颁发自动成就
+    
+    依赖 (player, achievement) 唯一约束单条语句插入，并发重复颁发会被忽略；
+    颁发后删除对应的进度记录并刷新获奖队员的排行榜积分。
+    
+    Args:
+        pairs: (队员ID, 成就ID) 列表
+    """
+    if not pairs:
+        return
+    
+    with transaction.atomic():
+        # awarded_by 为 None 表示自动颁发
+        PlayerAchievement.objects.bulk_create([
+            PlayerAchievement(player_id=player_id, achievement_id=achievement_id, progress=100)
+            for player_id, achievement_id in pairs
+        ], batch_size=1000, ignore_conflicts=True)
+        
+        players_by_achievement = defaultdict(list)
+        for player_id, achievement_id in pairs:
+            players_by_achievement[achievement_id].append(player_id)
+        for achievement_id, player_ids in players_by_achievement.items():
+            AchievementProgress.objects.filter(
+                achievement_id=achievement_id,
+                player_id__in=player_ids
+            ).delete()
+        
+        # bulk_create 不触发信号，直接刷新获奖队员的排行榜积分
+        refresh_player_points({player_id for player_id, _ in pairs})
+    
+    for player_id, achievement_id in pairs:
+        logger.info(f"成就(ID:{achievement_id}) 已授予队员(ID:{player_id})")
+
+def upsert_achievement_progress(entries, batch_size=500):
+    """
+    批量写入成就进度
+    
+    每批使用一条 INSERT ... ON DUPLICATE KEY UPDATE（SQLite/PostgreSQL 为 ON CONFLICT）语句，
+    进度只增不减，多个进程同时写入也不会相互覆盖。
+    
+    Args:
+        entries: (队员ID, 成就ID, 进度) 列表
+        batch_size: 每条语句写入的记录数
+    """
+    if not entries:
+        return
+    
+    table = AchievementProgress._meta.db_table
+    now = datetime.now()
+    
+    if connection.vendor == 'mysql':
+        conflict_clause = (
+            'ON DUPLICATE KEY UPDATE '
+            'updated_at = IF(VALUES(progress) > progress, VALUES(updated_at), updated_at), '
+            'progress = GREATEST(progress, VALUES(progress))'
+        )
+    else:
+        greatest = 'MAX' if connection.vendor == 'sqlite' else 'GREATEST'
+        conflict_clause = (
+            'ON CONFLICT (player_id, achievement_id) DO UPDATE SET '
+            f'updated_at = CASE WHEN excluded.progress > {table}.progress '
+            f'THEN excluded.updated_at ELSE {table}.updated_at END, '
+            f'progress = {greatest}({table}.progress, excluded.progress)'
+        )
+    
+    with connection.cursor() as cursor:
+        for start in range(0, len(entries), batch_size):
+            batch = entries[start:start + batch_size]
+            placeholders = ', '.join(['(%s, %s, %s, %s)'] * len(batch))
+            params = [
+                value
+                for player_id, achievement_id, progress in batch
+                for value in (player_id, achievement_id, progress, now)
+            ]
+            cursor.execute(
+                f'INSERT INTO {table} (player_id, achievement_id, progress, updated_at) '
+                f'VALUES {placeholders} {conflict_clause}',
+                params
+            )
+
+def _auto_check_enabled():
+    """是否开启成就自动检查"""
+    return getattr(settings, 'ACHIEVEMENT_SETTINGS', {}).get('AUTO_CHECK_ENABLED', True)
+
+def handle_task_completion_event(player_id, task_period):
+    """任务完成记录新增或审核通过后，只重新评估依赖任务完成情况的成就"""
+    rule_types = {'completion_count'}
+    # 只有每日任务会影响连续打卡类成就
+    if task_period == 'daily':
+        rule_types.add('consecutive_days')
+    return check_task_achievements(player_id, rule_types)
+
+def handle_assessment_score_event(player_id):
+    """考核成绩保存后，只重新评估考核类成就"""
+    return check_assessment_achievements(player_id)
+
+def handle_bulk_task_completion_event(player_ids, include_daily):
+    """批量审核通过后，一次评估所有相关队员依赖任务完成情况的成就"""
+    rule_types = {'completion_count'}
+    if include_daily:
+        rule_types.add('consecutive_days')
+    return evaluate_achievements(list(player_ids), criteria_types=['auto_task'], rule_types=rule_types)
+
+def enqueue_task_completion_event(completion):
+    """在事务提交后将任务完成事件交给后台队列处理"""
+    if not _auto_check_enabled() or not completion.verified:
+        return
+    submit_on_commit(handle_task_completion_event, completion.player_id, completion.task.period)
+
+def enqueue_bulk_task_completion_event(player_ids, include_daily):
+    """
+    在事务提交后将批量审核事件交给后台队列处理
+
+    Args:
+        player_ids: 有完成记录审核通过的队员ID
+        include_daily: 其中是否包含每日任务
+    """
+    if not _auto_check_enabled() or not player_ids:
+        return
+    submit_on_commit(handle_bulk_task_completion_event, tuple(sorted(set(player_ids))), include_daily)
+
+def enqueue_assessment_score_event(score):
+    """在事务提交后将考核成绩事件交给后台队列处理"""
+    if not _auto_check_enabled():
+        return
+    submit_on_commit(handle_assessment_score_event, score.player_id)
+
 def check_streak_achievements(player_id):
     """检查连续/累计相关成就"""
     # 实现连续登录、累计打卡等成就检查逻辑
@@ -188,50 +333,9 @@ def check_special_achievements(player_id):
     # 实现首次完成任务、特定日期打卡等特殊成就
     pass
 
-def _award_achievement(player, achievement):
-    """为玩家颁发成就"""
-    # 检查是否已经颁发过
-    if not PlayerAchievement.objects.filter(player=player, achievement=achievement).exists():
-        # 创建新的成就记录
-        PlayerAchievement.objects.create(
-            player=player,
-            achievement=achievement,
-            progress=100,  # 完全解锁
-            # awarded_by 为 None 表示自动颁发
-        )
-        logger.info(f"成就 '{achievement.name}' 已授予队员 {player.name}(ID:{player.id})")
-        return True
-    return False
-
-def _update_achievement_progress(player, achievement, progress):
-    """更新队员成就进度"""
-    # 检查是否已有进度记录
-    achievement_record, created = PlayerAchievement.objects.get_or_create(
-        player=player,
-        achievement=achievement,
-        defaults={'progress': progress}
-    )
-    
-    # 如果已存在且进度有提升，则更新
-    if not created and achievement_record.progress < progress:
-        achievement_record.progress = progress
-        achievement_record.save()
-        logger.info(f"队员 {player.name}(ID:{player.id}) 的成就 '{achievement.name}' 进度更新为 {progress}%")
-    
-    return True
-
 def get_recent_achievements(days=7):
     """获取最近几天的成就解锁记录"""
     recent_date = date.today() - timedelta(days=days)
     return PlayerAchievement.objects.filter(
         awarded_date__gte=recent_date
     ).select_related('player', 'achievement').order_by('-awarded_date')
-
-def get_leaderboard():
-    """获取成就积分排行榜"""
-    return Player.objects.annotate(
-        total_points=Sum(
-            F('achievements__achievement__points'),
-            filter=Q(achievements__progress=100)
-        )
-    ).filter(total_points__gt=0).order_by('-total_points')[:50]
@@ -1,15 +1,19 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin, GroupAdmin
 from django.contrib.auth.models import User, Group
-from django.http import HttpResponse
-from django.urls import path
-from django.shortcuts import render, redirect
+from django.http import HttpResponse, JsonResponse
+from django.urls import path, reverse
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+from django.core.exceptions import PermissionDenied
 from django import forms
-import pandas as pd
-from .models import Coach, Parent, Player, School, EnrollmentYear, Team, Task, TaskCompletion, Assessment, AssessmentItem, AssessmentScore, TeamResult
+from django.utils.html import format_html
+from .models import Coach, Parent, Player, School, EnrollmentYear, Team, Task, TaskType, TaskCompletion, Assessment, AssessmentItem, AssessmentScore, TeamResult
 # Updated import to include AchievementSeries
-from .models import AchievementCategory, AchievementSeries, PersonalAchievement, PlayerAchievement, TeamAchievement
+from .models import AchievementCategory, AchievementSeries, PersonalAchievement, PlayerAchievement, TeamAchievement, ImportJob
+from .jobs import create_player_import_job, get_job_progress
+from .exports import export_response, filtered_queryset
+from .verification import MAX_BATCH_SIZE, bulk_set_verified
 
 # 设置管理后台标题
 admin.site.site_header = '超群九人后台管理'
@@ -122,7 +126,11 @@ class PlayerAdmin(admin.ModelAdmin):
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
-            path('import-excel/', self.import_excel, name='player_import_excel'),
+            path('import-excel/', self.admin_site.admin_view(self.import_excel), name='player_import_excel'),
+            path('import-jobs/<int:job_id>/', self.admin_site.admin_view(self.import_job_status),
+                 name='player_import_job'),
+            path('import-jobs/<int:job_id>/status/', self.admin_site.admin_view(self.import_job_status_json),
+                 name='player_import_job_status'),
         ]
         return custom_urls + urls
 
@@ -134,64 +142,43 @@ class PlayerAdmin(admin.ModelAdmin):
             
             excel_file = request.FILES['excel_file']
             try:
-                df = pd.read_excel(excel_file)
-                required_columns = ['队员姓名', '学校', '入学年份', '家长姓名', '家长电话']
-                for col in required_columns:
-                    if col not in df.columns:
-                        raise ValueError(f'Excel文件缺少必要的列：{col}')
-
-                for _, row in df.iterrows():
-                    # 获取或创建学校
-                    school = None
-                    if pd.notna(row['学校']):
-                        school = School.objects.filter(name=row['学校']).first()
-                        if not school:
-                            self.message_user(request, f'学校 "{row["学校"]}" 不存在，请先在系统中添加该学校', level=messages.ERROR)
-                            return redirect('..')
-
-                    # 获取入学年份
-                    enrollment_year = None
-                    if pd.notna(row['入学年份']):
-                        try:
-                            year = int(row['入学年份'])
-                            enrollment_year = EnrollmentYear.objects.filter(year=year).first()
-                            if not enrollment_year:
-                                self.message_user(request, f'入学年份 {year} 不存在，请先在系统中添加该年份', level=messages.ERROR)
-                                return redirect('..')
-                        except (ValueError, TypeError):
-                            self.message_user(request, f'入学年份格式不正确：{row["入学年份"]}', level=messages.ERROR)
-                            return redirect('..')
-
-                    # 创建或更新家长信息
-                    parent = None
-                    if pd.notna(row['家长电话']):
-                        parent, _ = Parent.objects.get_or_create(
-                            phone=str(row['家长电话']),
-                            defaults={
-                                'name': row['家长姓名'] if pd.notna(row['家长姓名']) else ''
-                            }
-                        )
-                    
-                    # 创建队员记录
-                    player = Player.objects.create(
-                        name=row['队员姓名'],
-                        school=school,
-                        enrollment_year=enrollment_year,
-                        notes=row['备注'] if pd.notna(row.get('备注')) else ''
-                    )
-                    
-                    # 如果有家长信息，建立关联
-                    if parent:
-                        player.parents.add(parent)
-                
-                self.message_user(request, '导入成功')
-                return redirect('..')
+                # 文件暂存到磁盘后在后台执行导入，页面轮询任务进度
+                job = create_player_import_job(excel_file, request.user)
+                return redirect('admin:player_import_job', job_id=job.id)
             except Exception as e:
                 self.message_user(request, f'导入失败：{str(e)}', level=messages.ERROR)
                 return redirect('..')
         
         return render(request, 'admin/player_import.html')
 
+    def import_job_status(self, request, job_id):
+        job = get_object_or_404(ImportJob, id=job_id)
+        return render(request, 'admin/import_job_status.html', {
+            'job': job,
+            'status_url': reverse('admin:player_import_job_status', args=[job.id]),
+            'title': f'导入任务：{job.file_name}',
+        })
+
+    def import_job_status_json(self, request, job_id):
+        job = get_object_or_404(ImportJob, id=job_id)
+        progress, message = get_job_progress(job)
+        result = job.get_result()
+        return JsonResponse({
+            'code': 200,
+            'message': '获取成功',
+            'data': {
+                'id': job.id,
+                'status': job.status,
+                'status_display': job.get_status_display(),
+                'progress': progress,
+                'message': message,
+                'finished': job.status in ('succeeded', 'failed'),
+                # 错误较多时只返回前200条
+                'errors': result.get('errors', [])[:200],
+                'error_count': len(result.get('errors', [])),
+            }
+        })
+
     def has_view_permission(self, request, obj=None):
         return request.user.is_superuser or request.user.is_staff
 
@@ -204,6 +191,32 @@ class PlayerAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         return request.user.is_superuser
 
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ['file_name', 'kind', 'status', 'progress', 'message', 'created_by', 'created_at', 'finished_at', 'status_link']
+    list_filter = ['kind', 'status', 'created_at']
+    search_fields = ['file_name', 'message']
+    readonly_fields = ['kind', 'status', 'file_name', 'file_path', 'progress', 'message', 'result',
+                       'created_by', 'created_at', 'started_at', 'finished_at']
+    
+    def status_link(self, obj):
+        url = reverse('admin:player_import_job', args=[obj.id])
+        return format_html('<a href="{}">查看进度</a>', url)
+    status_link.short_description = '进度'
+    
+    def has_view_permission(self, request, obj=None):
+        return request.user.is_superuser or request.user.is_staff
+        
+    def has_add_permission(self, request):
+        # 导入任务只能通过队员列表的“导入Excel”创建
+        return False
+        
+    def has_change_permission(self, request, obj=None):
+        return False
+        
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
+
 # 取消注册默认的User和Group管理
 admin.site.unregister(User)
 admin.site.unregister(Group)
@@ -361,11 +374,68 @@ class TaskAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         return request.user.is_superuser
 
+class ExportAdminMixin:
+    """任务完成记录和考核成绩的导出：按条件导出页面和导出选中记录的动作"""
+    export_kind = None
+    change_list_template = 'admin/export_changelist.html'
+    actions = ['export_selected_csv', 'export_selected_xlsx']
+
+    def get_urls(self):
+        urls = super().get_urls()
+        info = self.model._meta.app_label, self.model._meta.model_name
+        custom_urls = [
+            path('export/', self.admin_site.admin_view(self.export_view), name='%s_%s_export' % info),
+        ]
+        return custom_urls + urls
+
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        if 'format' in request.GET:
+            try:
+                queryset = filtered_queryset(self.export_kind, request.GET)
+            except ValueError:
+                self.message_user(request, '筛选条件格式不正确', level=messages.ERROR)
+                return redirect('.')
+            return export_response(self.export_kind, queryset, request.GET['format'])
+
+        return render(request, 'admin/export_form.html', {
+            'title': f'导出{self.model._meta.verbose_name}',
+            'teams': Team.objects.order_by('name'),
+            'task_types': TaskType.objects.order_by('name') if self.export_kind == 'completions' else None,
+        })
+
+    def export_selected_csv(self, request, queryset):
+        return export_response(self.export_kind, queryset, 'csv')
+    export_selected_csv.short_description = "导出选中记录为CSV"
+
+    def export_selected_xlsx(self, request, queryset):
+        return export_response(self.export_kind, queryset, 'xlsx')
+    export_selected_xlsx.short_description = "导出选中记录为Excel"
+
 @admin.register(TaskCompletion)
-class TaskCompletionAdmin(admin.ModelAdmin):
+class TaskCompletionAdmin(ExportAdminMixin, admin.ModelAdmin):
     list_display = ['task', 'player', 'completion_date', 'verified', 'verified_by']
     list_filter = ['completion_date', 'verified', 'task']
     search_fields = ['task__title', 'player__name']
+    export_kind = 'completions'
+    actions = ExportAdminMixin.actions + ['verify_selected', 'reject_selected']
+
+    def _bulk_verify(self, request, queryset, verified):
+        outcomes, truncated = bulk_set_verified(request.user, verified, queryset=queryset)
+        updated = sum(1 for outcome in outcomes.values() if outcome == 'updated')
+        message = f"{'审核通过' if verified else '驳回'} {updated} 条记录，{len(outcomes) - updated} 条无需修改"
+        if truncated:
+            message += f"（每次最多处理 {MAX_BATCH_SIZE} 条，剩余记录请再次执行）"
+        self.message_user(request, message)
+
+    def verify_selected(self, request, queryset):
+        self._bulk_verify(request, queryset, True)
+    verify_selected.short_description = "审核通过选中的完成记录"
+
+    def reject_selected(self, request, queryset):
+        self._bulk_verify(request, queryset, False)
+    reject_selected.short_description = "驳回选中的完成记录"
 
     def has_view_permission(self, request, obj=None):
         return request.user.is_superuser or request.user.is_staff
@@ -420,10 +490,11 @@ class AssessmentItemAdmin(admin.ModelAdmin):
         return request.user.is_superuser
 
 @admin.register(AssessmentScore)
-class AssessmentScoreAdmin(admin.ModelAdmin):
+class AssessmentScoreAdmin(ExportAdminMixin, admin.ModelAdmin):
     list_display = ['assessment', 'assessment_item', 'player', 'score', 'recorded_by']
     list_filter = ['assessment', 'assessment_item', 'recorded_by']
     search_fields = ['player__name', 'assessment__name']
+    export_kind = 'scores'
 
     def has_view_permission(self, request, obj=None):
         return request.user.is_superuser or request.user.is_staff
@@ -1,16 +1,26 @@
 from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.admin.views.decorators import staff_member_required
-from .utils.cloud_storage import CloudStorage
+from . import media_store, upload_offload
+from .image_pipeline import (
+    ImageProcessingError, asset_thumbnail, is_static_image, primary_url, process_image, variant_urls
+)
+from .models import UploadJob
 import json
-import uuid
+import os
 
 @staff_member_required
 @csrf_exempt
 @require_http_methods(["POST"])
 def upload_badge_image(request):
-    """管理员上传徽章图片到云存储"""
+    """
+    管理员上传徽章图片到云存储
+
+    async=1 时文件先保存到本地并立即返回临时地址和任务ID，由后台线程上传到云存储，
+    上传完成后记录中的临时地址会被替换为云存储地址。
+    """
     try:
         if 'image' not in request.FILES:
             return JsonResponse({
@@ -20,15 +30,42 @@ def upload_badge_image(request):
         
         image_file = request.FILES['image']
         folder = request.POST.get('folder', 'badges')
-        image_type = request.POST.get('type', 'badge')
         
-        # 生成唯一文件名
-        file_name = f"{image_type}_{uuid.uuid4().hex}{'.png'}"
+        # 保留原扩展名（动画徽章可能是 gif/webp/json）
+        ext = os.path.splitext(image_file.name)[1].lower() or '.png'
+        offload = upload_offload.use_async(request)
+        job = None
         
-        # 上传到云存储
-        image_url = CloudStorage.upload_file(image_file, file_name, folder)
+        # 静态图片生成各尺寸的 WebP/JPEG 版本后上传
+        if is_static_image(image_file):
+            try:
+                if offload:
+                    asset, job = upload_offload.process_image_async(image_file, folder=folder, user=request.user)
+                else:
+                    asset = process_image(image_file, folder=folder, storage='cloud')
+            except (ImageProcessingError, IOError) as e:
+                return JsonResponse({
+                    'success': False,
+                    'message': f'图片处理失败: {str(e)}'
+                })
+            return JsonResponse({
+                'success': True,
+                'url': primary_url(asset),
+                'thumbnail': asset_thumbnail(asset),
+                'variants': variant_urls(asset),
+                'job_id': job.id if job else None,
+                'message': '图片上传成功'
+            })
         
-        if not image_url:
+        # 动图等其他文件以内容哈希命名流式上传原文件，已存在时跳过上传；大文件（如徽章动画）自动分块并行上传
+        try:
+            if offload:
+                image_url, job = upload_offload.save_async(
+                    image_file, folder, ext, content_type=image_file.content_type, user=request.user
+                )
+            else:
+                image_url = media_store.save(image_file, folder, ext, content_type=image_file.content_type, storage='cloud')
+        except IOError:
             return JsonResponse({
                 'success': False,
                 'message': '图片上传失败'
@@ -38,6 +75,7 @@ def upload_badge_image(request):
         return JsonResponse({
             'success': True,
             'url': image_url,
+            'job_id': job.id if job else None,
             'message': '图片上传成功'
         })
     
@@ -46,3 +84,13 @@ def upload_badge_image(request):
             'success': False,
             'message': f'上传出错: {str(e)}'
         })
+
+@staff_member_required
+@require_http_methods(["GET"])
+def upload_job_status(request, job_id):
+    """后台上传任务的状态，完成后返回临时地址对应的云存储地址"""
+    job = get_object_or_404(UploadJob, id=job_id)
+    return JsonResponse({
+        'success': True,
+        'data': upload_offload.job_status(job)
+    })
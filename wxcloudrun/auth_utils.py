@@ -1,37 +1,242 @@
 import jwt
+import threading
+import time
+from collections import OrderedDict
 from django.conf import settings
+from django.db import transaction
 from django.http import JsonResponse
+from .metrics import jwt_verifications, record_cache
 import logging
 
 # 设置日志
 logger = logging.getLogger(__name__)
 
-def verify_parent_token(request):
-    """验证家长token的通用函数"""
-    auth_header = request.headers.get('Authorization')
-    logger.info(f"Auth header received: {auth_header[:20]}...")
-    
-    if not auth_header or not auth_header.startswith('Bearer '):
-        logger.error(f"Invalid auth header format: {auth_header}")
-        return None, JsonResponse({'code': 401, 'message': '无效的token格式'}, status=401)
-    
-    token = auth_header.split(' ')[1]
+class Principal:
+    """已通过验证的token身份"""
+    __slots__ = ('user_id', 'user_type', 'expires_at')
+
+    def __init__(self, user_id, user_type, expires_at=None):
+        self.user_id = user_id
+        self.user_type = user_type
+        # token过期时间（Unix时间戳），None表示不过期
+        self.expires_at = expires_at
+
+    @property
+    def is_parent(self):
+        return self.user_type == 'parent'
+
+    @property
+    def is_coach(self):
+        return self.user_type == 'coach'
+
+    def is_expired(self, now=None):
+        return self.expires_at is not None and (now or time.time()) >= self.expires_at
+
+    def __repr__(self):
+        return f"Principal({self.user_type}:{self.user_id})"
+
+class VerifiedTokenCache:
+    """
+    最近验证通过的token缓存（LRU）
+
+    以token签名为键，命中且未过期时跳过HS256验证；已过期的条目在读取或容量不足时优先淘汰。
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        signature = token.rpartition('.')[2]
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is None:
+                return None
+            cached_token, principal = entry
+            # 签名相同但头部或载荷不同的token视为未命中，重新完整验证
+            if cached_token != token:
+                return None
+            if principal.is_expired():
+                del self._entries[signature]
+                return None
+            self._entries.move_to_end(signature)
+            return principal
+
+    def put(self, token, principal):
+        if self.max_size <= 0:
+            return
+        signature = token.rpartition('.')[2]
+        with self._lock:
+            self._entries[signature] = (token, principal)
+            self._entries.move_to_end(signature)
+            if len(self._entries) > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        """先清理已过期的条目，仍超出容量时淘汰最久未使用的条目"""
+        now = time.time()
+        expired = [key for key, (_, principal) in self._entries.items() if principal.is_expired(now)]
+        for key in expired:
+            del self._entries[key]
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+token_cache = VerifiedTokenCache(getattr(settings, 'JWT_CACHE_SIZE', 1024))
+
+def get_bearer_token(request):
+    """从Authorization请求头中取出Bearer token，格式不正确时返回None"""
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    return auth_header[len('Bearer '):].strip() or None
+
+def authenticate_token(token):
+    """
+    验证token并返回身份
+
+    Raises:
+        jwt.ExpiredSignatureError: token已过期
+        jwt.InvalidTokenError: token无效
+    """
+    principal = token_cache.get(token)
+    record_cache('jwt', principal is not None)
+    if principal is not None:
+        jwt_verifications.inc(result='cached')
+        return principal
+
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=['HS256'])
-        logger.info(f"Token decoded successfully for user_id: {payload.get('user_id')}")
-        
-        # 验证用户类型
-        if payload.get('user_type') != 'parent':
-            logger.error(f"Invalid user type: {payload.get('user_type')}")
-            return None, JsonResponse({'code': 401, 'message': '用户类型错误'}, status=401)
-            
-        return payload, None
     except jwt.ExpiredSignatureError:
-        logger.error("Token has expired")
-        return None, JsonResponse({'code': 401, 'message': 'token已过期'}, status=401)
-    except jwt.InvalidTokenError as e:
-        logger.error(f"Invalid token: {str(e)}")
+        jwt_verifications.inc(result='expired')
+        raise
+    except jwt.InvalidTokenError:
+        jwt_verifications.inc(result='invalid')
+        raise
+    jwt_verifications.inc(result='verified')
+    principal = Principal(payload.get('user_id'), payload.get('user_type'), payload.get('exp'))
+    token_cache.put(token, principal)
+    return principal
+
+def require_principal(request, user_type=None):
+    """
+    获取认证中间件验证过的身份
+
+    Args:
+        request: 请求对象
+        user_type: 要求的用户类型（'parent'/'coach'），为None时不限制
+
+    Returns:
+        tuple: (Principal, None) 或 (None, 错误响应)
+    """
+    principal = getattr(request, 'principal', None)
+    if principal is None:
+        error = getattr(request, 'auth_error', None)
+        if error is None:
+            return None, JsonResponse({'code': 401, 'message': '未登录'}, status=401)
+        if isinstance(error, jwt.ExpiredSignatureError):
+            return None, JsonResponse({'code': 401, 'message': 'token已过期'}, status=401)
         return None, JsonResponse({'code': 401, 'message': '无效的token'}, status=401)
-    except Exception as e:
-        logger.error(f"Unexpected error during token verification: {str(e)}")
-        return None, JsonResponse({'code': 500, 'message': '服务器验证错误'}, status=500)
+
+    if user_type and principal.user_type != user_type:
+        logger.error(f"用户类型错误: {principal.user_type}")
+        return None, JsonResponse({'code': 401, 'message': '用户类型错误'}, status=401)
+
+    return principal, None
+
+def verify_parent_token(request):
+    """验证家长token的通用函数"""
+    return require_principal(request, 'parent')
+
+def _ownership_settings():
+    return getattr(settings, 'PARENT_PLAYER_CACHE', {})
+
+def _shared_cache():
+    """共享缓存（未配置时返回None）"""
+    alias = _ownership_settings().get('ALIAS')
+    if not alias:
+        return None
+    from django.core.cache import caches
+    return caches[alias]
+
+def _shared_key(parent_id):
+    return f'parent_players:{parent_id}'
+
+# 家长ID -> (缓存时间, 绑定的队员ID集合)
+_owned_players = {}
+_owned_players_lock = threading.Lock()
+
+def get_owned_player_ids(parent_id):
+    """
+    获取家长绑定的队员ID集合
+
+    先查进程内缓存，再查共享缓存，都未命中时查询数据库并回填。
+    绑定关系变化时由 m2m_changed 信号使本进程和共享缓存失效；
+    其他进程、实例或直接修改数据库不会触发本进程的信号，进程内缓存始终只保留 LOCAL_TTL 秒。
+    """
+    shared = _shared_cache()
+    cached = _owned_players.get(parent_id)
+    if cached is not None:
+        cached_at, player_ids = cached
+        if time.monotonic() - cached_at < _ownership_settings().get('LOCAL_TTL', 5):
+            record_cache('parent_players', True)
+            return player_ids
+
+    player_ids = shared.get(_shared_key(parent_id)) if shared is not None else None
+    record_cache('parent_players', player_ids is not None)
+    if player_ids is None:
+        from .models import Player
+        player_ids = frozenset(
+            Player.parents.through.objects.filter(parent_id=parent_id).values_list('player_id', flat=True)
+        )
+        if shared is not None:
+            shared.set(_shared_key(parent_id), player_ids, _ownership_settings().get('TIMEOUT', 3600))
+
+    with _owned_players_lock:
+        _owned_players[parent_id] = (time.monotonic(), player_ids)
+    return player_ids
+
+def parent_owns_player(parent_id, player_id):
+    """检查队员是否绑定在家长名下"""
+    try:
+        return int(player_id) in get_owned_player_ids(parent_id)
+    except (TypeError, ValueError):
+        return False
+
+def _drop_owned_players(parent_ids):
+    shared = _shared_cache()
+    with _owned_players_lock:
+        if parent_ids is None:
+            _owned_players.clear()
+        else:
+            for parent_id in parent_ids:
+                _owned_players.pop(parent_id, None)
+
+    if shared is not None:
+        if parent_ids is None:
+            # 共享缓存中无法枚举其他进程写入的键，按全部家长清理
+            from .models import Parent
+            parent_ids = Parent.objects.values_list('id', flat=True)
+        shared.delete_many([_shared_key(parent_id) for parent_id in parent_ids])
+
+def invalidate_owned_players(parent_ids=None):
+    """
+    使家长的队员集合缓存失效
+
+    在事务中调用时，提交后会再失效一次，避免其他请求在提交前读到旧数据并回填缓存。
+
+    Args:
+        parent_ids: 家长ID列表，为None时清空全部缓存
+    """
+    if parent_ids is not None:
+        parent_ids = list(parent_ids)
+    _drop_owned_players(parent_ids)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _drop_owned_players(parent_ids))
@@ -1,42 +1,25 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-import jwt
-from . import settings
+from .auth_utils import require_principal
 
 @csrf_exempt
 @require_http_methods(["POST"])
 def verify_token(request):
     try:
-        # 从请求头中获取token
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return JsonResponse({
-                'code': 401,
-                'message': '未提供token'
-            }, status=401)
+        # token已由认证中间件验证
+        principal, error_response = require_principal(request)
+        if error_response:
+            return error_response
 
-        # 验证token
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            return JsonResponse({
-                'code': 200,
-                'message': 'token有效',
-                'data': {
-                    'user_id': payload.get('user_id'),
-                    'user_type': payload.get('user_type')
-                }
-            })
-        except jwt.ExpiredSignatureError:
-            return JsonResponse({
-                'code': 401,
-                'message': 'token已过期'
-            }, status=401)
-        except jwt.InvalidTokenError:
-            return JsonResponse({
-                'code': 401,
-                'message': '无效的token'
-            }, status=401)
+        return JsonResponse({
+            'code': 200,
+            'message': 'token有效',
+            'data': {
+                'user_id': principal.user_id,
+                'user_type': principal.user_type
+            }
+        })
 
     except Exception as e:
         return JsonResponse({
@@ -0,0 +1,94 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from django.db import connections, transaction
+
+# 设置日志
+logger = logging.getLogger('log')
+
+_queue = queue.Queue()
+_pending = set()
+_lock = threading.Lock()
+_worker = None
+
+def _run():
+    """后台线程：依次执行队列中的任务"""
+    while True:
+        func, args = _queue.get()
+        with _lock:
+            _pending.discard((func, args))
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error(f"后台任务 {func.__name__}{args} 执行出错: {str(e)}")
+        finally:
+            # 后台线程使用独立的数据库连接，执行完毕后及时释放
+            connections.close_all()
+            _queue.task_done()
+
+def _ensure_worker():
+    """按需启动后台线程（gunicorn fork 之后才会创建）"""
+    global _worker
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='wxcloudrun-background', daemon=True)
+            _worker.start()
+
+def submit(func, *args):
+    """
+    提交后台任务
+
+    参数相同且尚未执行的任务只会保留一个，避免同一事件被重复处理。
+
+    Args:
+        func: 要执行的函数
+        args: 位置参数，需可哈希
+    """
+    key = (func, args)
+    with _lock:
+        if key in _pending:
+            return False
+        _pending.add(key)
+    _ensure_worker()
+    _queue.put(key)
+    return True
+
+def submit_on_commit(func, *args):
+    """在当前事务提交后提交后台任务，事务回滚则不执行"""
+    transaction.on_commit(lambda: submit(func, *args))
+
+def wait_idle():
+    """阻塞直到队列中的任务全部执行完毕（供管理命令等同步场景使用）"""
+    _queue.join()
+
+@contextmanager
+def renew_lease(queryset, seconds):
+    """
+    执行期间在独立线程中定期续约（更新 lease_until），执行时间超过租约时任务不会被其他进程认领
+
+    续约线程使用独立的数据库连接，任务在事务中执行时续约同样对其他进程可见。
+
+    Args:
+        queryset: 要续约的任务（如 filter(id=job_id, status='running')）
+        seconds: 租约秒数，每隔三分之一租约续约一次
+    """
+    stop = threading.Event()
+
+    def renew():
+        try:
+            while not stop.wait(seconds / 3):
+                queryset.update(lease_until=datetime.now() + timedelta(seconds=seconds))
+        except Exception as e:
+            logger.error(f"任务续约出错: {str(e)}")
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=renew, name='wxcloudrun-lease', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,233 @@
+import logging
+from datetime import date, datetime, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Task, TaskCompletion, Team
+from .achievement_service import enqueue_bulk_task_completion_event
+from .background import submit_on_commit
+from .streak_service import get_task_streaks, refresh_task_streaks
+from .team_dashboard import refresh_daily_stats_bulk
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 每条打卡的处理结果
+CREATED = 'created'                      # 已打卡
+DUPLICATE = 'duplicate'                  # 当天已有打卡记录（重复提交），返回已有记录
+ALREADY_COMPLETED = 'already_completed'  # 一次性任务已完成过
+FORBIDDEN = 'forbidden'                  # 不是自己的孩子，或队员不属于任务队伍
+NOT_FOUND = 'not_found'                  # 任务不存在
+INACTIVE = 'inactive'                    # 任务在打卡日期未进行
+EXPIRED = 'expired'                      # 打卡时间超出允许补传的天数或晚于今天
+INVALID = 'invalid'                      # 参数格式错误
+
+def sync_settings():
+    return getattr(settings, 'CHECKIN_SYNC_SETTINGS', {})
+
+def parse_client_time(value):
+    """
+    解析客户端打卡时间：毫秒时间戳（Date.now()）、ISO 格式时间或 YYYY-MM-DD
+
+    Returns:
+        date: 打卡日期（按服务器时区），无法解析时返回 None
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.fromtimestamp(value / 1000).date()
+        except (OverflowError, OSError, ValueError):
+            return None
+    if not isinstance(value, str):
+        return None
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            return parse_date(value)
+    except ValueError:
+        return None
+    if timezone.is_aware(moment):
+        moment = timezone.make_naive(moment)
+    return moment.date()
+
+def _validate_item(item, today):
+    """
+    检查单条打卡的格式
+
+    Returns:
+        tuple: (规范化后的打卡 dict, None) 或 (None, 错误说明)
+    """
+    if not isinstance(item, dict):
+        return None, '格式错误'
+    player_id, task_id = item.get('player_id'), item.get('task_id')
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in (player_id, task_id)):
+        return None, 'player_id和task_id必须是整数'
+
+    completed_at = item.get('completed_at')
+    completion_date = today if completed_at is None else parse_client_time(completed_at)
+    if completion_date is None:
+        return None, '无效的completed_at'
+
+    notes = item.get('notes') or ''
+    attachment = item.get('attachment') or None
+    if not isinstance(notes, str) or not (attachment is None or isinstance(attachment, str)):
+        return None, 'notes和attachment必须是字符串'
+    if attachment and len(attachment) > TaskCompletion._meta.get_field('proof').max_length:
+        return None, 'attachment过长'
+
+    return {
+        'player_id': player_id,
+        'task_id': task_id,
+        'completion_date': completion_date,
+        'notes': notes,
+        'attachment': attachment,
+    }, None
+
+def _task_open_on(task, day):
+    return task['status'] == 'active' and task['start_date'] <= day and (task['end_date'] is None or task['end_date'] >= day)
+
+def sync_completions(owned_player_ids, items, today=None):
+    """
+    批量提交离线缓存的打卡
+
+    整批的任务、队伍归属和已有记录各用一次查询校验，新记录用一条 bulk_create 写入，
+    唯一键 (任务, 队员, 日期) 冲突时忽略，同一条打卡重复提交不会重复写入。
+    bulk_create 不触发 post_save，连续完成记录在同一事务中按任务一次重算，
+    队伍统计和任务类成就在提交后各提交一次后台任务。
+
+    Args:
+        owned_player_ids: 当前家长绑定的队员ID集合
+        items: 打卡列表，每条包含 player_id、task_id，可选 completed_at（客户端打卡时间）、
+            notes、attachment 和 client_id（客户端幂等键，原样返回）
+        today: 服务器当前日期，默认今天
+
+    Returns:
+        list: 与 items 一一对应的处理结果
+    """
+    today = today or date.today()
+    earliest = today - timedelta(days=sync_settings().get('MAX_OFFLINE_DAYS', 7))
+
+    results = []
+    valid = []
+    for index, item in enumerate(items):
+        result = {'client_id': item.get('client_id') if isinstance(item, dict) else None}
+        results.append(result)
+        checkin, error = _validate_item(item, today)
+        if error:
+            result.update(result=INVALID, message=error)
+        elif not (earliest <= checkin['completion_date'] <= today):
+            result.update(result=EXPIRED, message='打卡时间超出可补传的范围')
+        elif checkin['player_id'] not in owned_player_ids:
+            result.update(result=FORBIDDEN, message='无权访问该队员信息')
+        else:
+            valid.append((index, checkin))
+
+    task_ids = {checkin['task_id'] for _, checkin in valid}
+    player_ids = {checkin['player_id'] for _, checkin in valid}
+    tasks = {
+        task['id']: task for task in Task.objects.filter(id__in=task_ids).values(
+            'id', 'period', 'status', 'start_date', 'end_date', 'require_proof'
+        )
+    }
+
+    # 队员所在队伍与任务所属队伍有交集才可以打卡
+    player_teams, task_teams = {}, {}
+    for player_id, team_id in Team.players.through.objects.filter(player_id__in=player_ids).values_list('player_id', 'team_id'):
+        player_teams.setdefault(player_id, set()).add(team_id)
+    for task_id, team_id in Task.teams.through.objects.filter(task_id__in=tasks.keys()).values_list('task_id', 'team_id'):
+        task_teams.setdefault(task_id, set()).add(team_id)
+
+    eligible = []
+    for index, checkin in valid:
+        task = tasks.get(checkin['task_id'])
+        if task is None:
+            results[index].update(result=NOT_FOUND, message='任务不存在')
+        elif not _task_open_on(task, checkin['completion_date']):
+            results[index].update(result=INACTIVE, message='该任务在打卡日期未进行')
+        elif not player_teams.get(checkin['player_id'], set()) & task_teams.get(task['id'], set()):
+            results[index].update(result=FORBIDDEN, message='该队员不属于任务队伍')
+        else:
+            eligible.append((index, checkin))
+
+    eligible_task_ids = {checkin['task_id'] for _, checkin in eligible}
+    eligible_player_ids = {checkin['player_id'] for _, checkin in eligible}
+    dates = {checkin['completion_date'] for _, checkin in eligible}
+    once_task_ids = {task_id for task_id in eligible_task_ids if tasks[task_id]['period'] == 'once'}
+
+    with transaction.atomic():
+        existing = {}
+        once_done = set()
+        if eligible:
+            for completion_id, task_id, player_id, completion_date, verified in TaskCompletion.objects.filter(
+                task_id__in=eligible_task_ids, player_id__in=eligible_player_ids
+            ).filter(
+                # 一次性任务需要查看所有日期，周期任务只需要查看打卡日期
+                Q(task_id__in=once_task_ids) | Q(completion_date__in=dates)
+            ).order_by().values_list('id', 'task_id', 'player_id', 'completion_date', 'verified'):
+                existing[(task_id, player_id, completion_date)] = (completion_id, verified)
+                if verified and tasks[task_id]['period'] == 'once':
+                    once_done.add((task_id, player_id))
+
+        new_completions = {}
+        for index, checkin in eligible:
+            task = tasks[checkin['task_id']]
+            key = (checkin['task_id'], checkin['player_id'], checkin['completion_date'])
+            if key in existing or key in new_completions:
+                results[index].update(result=DUPLICATE, message='当天已打卡', _key=key)
+            elif task['period'] == 'once' and key[:2] in once_done:
+                results[index].update(result=ALREADY_COMPLETED, message='该任务已完成过')
+            else:
+                # 与单条打卡一致：需要证明但没有提供时等待审核
+                verified = not (task['require_proof'] and not checkin['attachment'])
+                if task['period'] == 'once' and verified:
+                    once_done.add(key[:2])
+                new_completions[key] = TaskCompletion(
+                    task_id=key[0],
+                    player_id=key[1],
+                    completion_date=key[2],
+                    notes=checkin['notes'],
+                    proof=checkin['attachment'],
+                    verified=verified,
+                )
+                results[index].update(result=CREATED, message='打卡成功' if verified else '打卡成功，等待审核', _key=key)
+
+        if new_completions:
+            # 并发提交的同一条打卡由唯一键去重，不会报错
+            TaskCompletion.objects.bulk_create(new_completions.values(), batch_size=500, ignore_conflicts=True)
+            # ignore_conflicts 时不返回主键，按唯一键取回ID
+            for completion_id, task_id, player_id, completion_date, verified in TaskCompletion.objects.filter(
+                task_id__in={key[0] for key in new_completions},
+                player_id__in={key[1] for key in new_completions},
+                completion_date__in={key[2] for key in new_completions},
+            ).order_by().values_list('id', 'task_id', 'player_id', 'completion_date', 'verified'):
+                existing[(task_id, player_id, completion_date)] = (completion_id, verified)
+
+            verified_keys = [key for key, completion in new_completions.items() if completion.verified]
+            refresh_task_streaks({key[:2] for key in verified_keys})
+            submit_on_commit(
+                refresh_daily_stats_bulk,
+                tuple(sorted({key[0] for key in new_completions})),
+                tuple(sorted({key[2] for key in new_completions}))
+            )
+            if verified_keys:
+                include_daily = any(tasks[key[0]]['period'] == 'daily' for key in verified_keys)
+                enqueue_bulk_task_completion_event([key[1] for key in verified_keys], include_daily)
+
+    streaks = get_task_streaks(eligible_task_ids, eligible_player_ids) if eligible else {}
+    for result in results:
+        key = result.pop('_key', None)
+        if key is None:
+            continue
+        completion_id, verified = existing[key]
+        result.update(
+            completion_id=completion_id,
+            status='completed' if verified else 'pending',
+            completion_date=key[2].strftime('%Y-%m-%d'),
+            streak=streaks.get(key[:2], 0),
+        )
+
+    logger.info(f"批量打卡：共 {len(items)} 条，新增 {len(new_completions)} 条")
+    return results
@@ -0,0 +1,132 @@
+import json
+from datetime import datetime
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+from django.views.decorators.csrf import csrf_exempt
+from django.db.models import Q
+from .models import Coach, Team, TaskCompletion
+from .auth_utils import require_principal
+from .team_dashboard import build_team_dashboard
+from .verification import MAX_BATCH_SIZE, bulk_set_verified, filter_completions
+import logging
+
+# 设置日志
+logger = logging.getLogger('log')
+
+def _coached_team_ids(coach_id):
+    """教练担任主教练或教练的活跃队伍"""
+    return set(Team.objects.filter(
+        Q(head_coach_id=coach_id) | Q(coaches__id=coach_id),
+        status='active'
+    ).values_list('id', flat=True))
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def coach_dashboard(request):
+    """
+    教练看板：所带队伍的每日完成率、待验证数量、连续记录中断的队员和最近几周趋势
+
+    参数 team_id 可选（默认全部所带队伍），weeks 为统计周数。
+    """
+    principal, error_response = require_principal(request, 'coach')
+    if error_response:
+        return error_response
+
+    config = getattr(settings, 'TEAM_DASHBOARD_SETTINGS', {})
+    try:
+        weeks = int(request.GET.get('weeks') or config.get('DEFAULT_WEEKS', 4))
+    except ValueError:
+        return JsonResponse({'code': 400, 'message': '无效的weeks参数'}, status=400)
+    weeks = max(1, min(weeks, config.get('MAX_WEEKS', 12)))
+
+    team_ids = _coached_team_ids(principal.user_id)
+
+    team_id = request.GET.get('team_id')
+    if team_id:
+        if not team_id.isdigit() or int(team_id) not in team_ids:
+            return JsonResponse({'code': 403, 'message': '您不是该队伍的教练'}, status=403)
+        team_ids = {int(team_id)}
+
+    try:
+        teams = build_team_dashboard(team_ids, weeks)
+    except Exception as e:
+        logger.error(f"获取教练看板出错: {str(e)}")
+        return JsonResponse({'code': 500, 'message': f'服务器错误: {str(e)}'}, status=500)
+
+    return JsonResponse({
+        'code': 200,
+        'message': '获取成功',
+        'data': {
+            'weeks': weeks,
+            'teams': teams,
+        }
+    })
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def verify_completions(request):
+    """
+    批量审核任务完成记录
+
+    请求体：completion_ids（ID列表），或 team_id / task_id / date 筛选条件（至少一项，只处理待审核的记录）；
+    action 为 verify（默认）或 reject。返回每条记录的处理结果。
+    """
+    principal, error_response = require_principal(request, 'coach')
+    if error_response:
+        return error_response
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'code': 400, 'message': '无效的请求数据'}, status=400)
+
+    action = data.get('action', 'verify')
+    if action not in ('verify', 'reject'):
+        return JsonResponse({'code': 400, 'message': '无效的action参数'}, status=400)
+
+    coach = Coach.objects.filter(id=principal.user_id, is_active=True).select_related('user').first()
+    if coach is None:
+        return JsonResponse({'code': 403, 'message': '教练账号不可用'}, status=403)
+    team_ids = _coached_team_ids(coach.id)
+
+    completion_ids = data.get('completion_ids')
+    if completion_ids is not None:
+        # bool 是 int 的子类，true/false 不能当作ID
+        if not isinstance(completion_ids, list) or not all(
+            isinstance(i, int) and not isinstance(i, bool) for i in completion_ids
+        ):
+            return JsonResponse({'code': 400, 'message': 'completion_ids必须是整数列表'}, status=400)
+        if not completion_ids or len(completion_ids) > MAX_BATCH_SIZE:
+            return JsonResponse({'code': 400, 'message': f'completion_ids数量应为1到{MAX_BATCH_SIZE}'}, status=400)
+        outcomes, truncated = bulk_set_verified(
+            coach.user, action == 'verify', completion_ids=completion_ids, team_ids=team_ids
+        )
+    else:
+        team_id, task_id, date_str = data.get('team_id'), data.get('task_id'), data.get('date')
+        if not (team_id or task_id or date_str):
+            return JsonResponse({'code': 400, 'message': '缺少completion_ids或筛选条件'}, status=400)
+        try:
+            team_id = int(team_id) if team_id else None
+            task_id = int(task_id) if task_id else None
+            completion_date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else None
+        except (TypeError, ValueError):
+            return JsonResponse({'code': 400, 'message': '筛选参数格式无效'}, status=400)
+        if team_id and team_id not in team_ids:
+            return JsonResponse({'code': 403, 'message': '您不是该队伍的教练'}, status=403)
+        # 按条件审核时只处理待审核的记录，驳回时只处理已通过的记录
+        queryset = filter_completions(
+            TaskCompletion.objects.filter(verified=(action != 'verify')), team_id, task_id, completion_date
+        )
+        outcomes, truncated = bulk_set_verified(coach.user, action == 'verify', queryset=queryset, team_ids=team_ids)
+
+    return JsonResponse({
+        'code': 200,
+        'message': f'审核完成，每次最多处理 {MAX_BATCH_SIZE} 条，剩余记录请再次提交' if truncated else '审核完成',
+        'data': {
+            'updated': sum(1 for outcome in outcomes.values() if outcome == 'updated'),
+            # 按条件审核时超出 MAX_BATCH_SIZE 的记录未处理
+            'truncated': truncated,
+            'results': [{'completion_id': completion_id, 'result': outcome} for completion_id, outcome in outcomes.items()],
+        }
+    })
@@ -0,0 +1,51 @@
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+from django.views.decorators.csrf import csrf_exempt
+from django.db.models import Q
+from .models import Team
+from .auth_utils import require_principal
+from .exports import export_response, filtered_queryset
+import logging
+
+# 设置日志
+logger = logging.getLogger('log')
+
+def _coach_export(request, kind):
+    """教练导出所带队伍的数据，队伍、日期和任务类型等筛选条件通过查询参数传入"""
+    principal, error_response = require_principal(request)
+    if error_response:
+        return error_response
+    if not principal.is_coach:
+        return JsonResponse({'code': 403, 'message': '无权导出数据'}, status=403)
+
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in ('csv', 'xlsx'):
+        return JsonResponse({'code': 400, 'message': '无效的format参数'}, status=400)
+
+    # 只能导出自己担任主教练或教练的队伍
+    team_ids = set(Team.objects.filter(
+        Q(head_coach_id=principal.user_id) | Q(coaches__id=principal.user_id)
+    ).values_list('id', flat=True))
+    team_id = request.GET.get('team')
+    if team_id and team_id.isdigit() and int(team_id) not in team_ids:
+        return JsonResponse({'code': 403, 'message': '您不是该队伍的教练，无权导出'}, status=403)
+
+    try:
+        queryset = filtered_queryset(kind, request.GET, team_ids)
+    except ValueError:
+        return JsonResponse({'code': 400, 'message': '筛选参数格式不正确，日期格式为YYYY-MM-DD'}, status=400)
+
+    logger.info(f"教练 {principal.user_id} 导出{kind}，格式 {file_format}")
+    return export_response(kind, queryset, file_format)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def export_task_completions(request):
+    """导出任务完成记录（CSV/XLSX）"""
+    return _coach_export(request, 'completions')
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def export_assessment_scores(request):
+    """导出考核成绩（CSV/XLSX）"""
+    return _coach_export(request, 'scores')
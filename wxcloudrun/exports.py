@@ -0,0 +1,182 @@
+import csv
+import tempfile
+from datetime import datetime
+from urllib.parse import quote
+from django.db.models import Q
+from django.http import FileResponse, StreamingHttpResponse
+from .models import AssessmentScore, TaskCompletion, Team
+
+# 每次从数据库取出的行数，导出过程中内存占用与总行数无关
+CHUNK_SIZE = 2000
+
+# (列标题, values_list 字段)
+COMPLETION_COLUMNS = [
+    ('任务', 'task__title'),
+    ('任务类型', 'task__task_type__name'),
+    ('队员', 'player__name'),
+    ('完成日期', 'completion_date'),
+    ('是否已验证', 'verified'),
+    ('验证人', 'verified_by__username'),
+    ('备注', 'notes'),
+    ('证明', 'proof'),
+    ('提交时间', 'created_at'),
+]
+
+SCORE_COLUMNS = [
+    ('考核', 'assessment__name'),
+    ('考核日期', 'assessment__assessment_date'),
+    ('考核项目', 'assessment_item__name'),
+    ('队员', 'player__name'),
+    ('得分', 'score'),
+    ('最高分值', 'assessment_item__max_score'),
+    ('记录人', 'recorded_by__username'),
+    ('备注', 'notes'),
+]
+
+EXPORTS = {
+    'completions': ('任务完成记录', COMPLETION_COLUMNS, 'completion_date'),
+    'scores': ('考核成绩', SCORE_COLUMNS, 'assessment__assessment_date'),
+}
+
+def _team_player_ids(team_ids):
+    """队伍内队员ID的子查询（队员属于多个队伍时不会产生重复行）"""
+    return Team.players.through.objects.filter(team_id__in=team_ids).values('player_id')
+
+def filter_completions(queryset, team_ids=None, start_date=None, end_date=None, task_type_id=None):
+    """按队伍、完成日期范围和任务类型筛选完成记录"""
+    if team_ids is not None:
+        queryset = queryset.filter(player_id__in=_team_player_ids(team_ids))
+    if start_date:
+        queryset = queryset.filter(completion_date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(completion_date__lte=end_date)
+    if task_type_id:
+        queryset = queryset.filter(task__task_type_id=task_type_id)
+    return queryset
+
+def filter_scores(queryset, team_ids=None, start_date=None, end_date=None):
+    """按队伍和考核日期范围筛选考核成绩"""
+    if team_ids is not None:
+        queryset = queryset.filter(player_id__in=_team_player_ids(team_ids))
+    if start_date:
+        queryset = queryset.filter(assessment__assessment_date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(assessment__assessment_date__lte=end_date)
+    return queryset
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def filtered_queryset(kind, params, team_ids=None):
+    """
+    根据请求参数构建导出的查询集
+
+    Args:
+        kind: 'completions' 或 'scores'
+        params: 包含 team、start_date、end_date、task_type 的字典（如 request.GET）
+        team_ids: 限定的队伍范围，None 表示不限
+
+    Raises:
+        ValueError: 参数格式不正确
+    """
+    if params.get('team'):
+        team_id = int(params['team'])
+        if team_ids is not None and team_id not in team_ids:
+            team_ids = []
+        else:
+            team_ids = [team_id]
+    start_date = _parse_date(params.get('start_date'))
+    end_date = _parse_date(params.get('end_date'))
+
+    if kind == 'completions':
+        task_type_id = int(params['task_type']) if params.get('task_type') else None
+        return filter_completions(TaskCompletion.objects.all(), team_ids, start_date, end_date, task_type_id)
+    return filter_scores(AssessmentScore.objects.all(), team_ids, start_date, end_date)
+
+def _export_rows(kind, queryset):
+    """
+    按导出列逐批读取数据行（不创建模型对象）
+
+    按 (排序字段, id) 键集分页，每批单独查询 CHUNK_SIZE 行。PyMySQL 的默认游标会把整个结果集读入内存，
+    iterator() 在 MySQL 上不能流式读取。
+    """
+    _, columns, order_field = EXPORTS[kind]
+    fields = [field for _, field in columns]
+    queryset = queryset.order_by(order_field, 'id')
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            order_value, last_id = last
+            page = page.filter(
+                Q(**{f'{order_field}__gt': order_value}) | Q(**{order_field: order_value, 'id__gt': last_id})
+            )
+        rows = list(page.values_list(order_field, 'id', *fields)[:CHUNK_SIZE])
+        for row in rows:
+            yield row[2:]
+        if len(rows) < CHUNK_SIZE:
+            return
+        last = rows[-1][:2]
+
+def _format_cell(value):
+    if isinstance(value, bool):
+        return '是' if value else '否'
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+class _Echo:
+    """供 csv.writer 使用的伪文件对象，直接返回写入的内容"""
+    def write(self, value):
+        return value
+
+def _csv_stream(kind, queryset):
+    _, columns, _ = EXPORTS[kind]
+    writer = csv.writer(_Echo())
+    # 带BOM，Excel打开时才能正确识别UTF-8中文
+    yield '\ufeff' + writer.writerow([title for title, _ in columns])
+    for row in _export_rows(kind, queryset):
+        yield writer.writerow([_format_cell(value) for value in row])
+
+def _filename(kind, ext):
+    title = EXPORTS[kind][0]
+    return f"{title}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{ext}"
+
+def export_csv_response(kind, queryset):
+    """以流式响应导出CSV"""
+    response = StreamingHttpResponse(_csv_stream(kind, queryset), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(_filename(kind, 'csv'))}"
+    return response
+
+def export_xlsx_response(kind, queryset):
+    """
+    导出XLSX
+
+    使用 openpyxl 的只写模式逐行写入临时文件，再以文件流返回，不在内存中保留整张表。
+    """
+    from openpyxl import Workbook
+
+    title, columns, _ = EXPORTS[kind]
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append([column_title for column_title, _ in columns])
+    for row in _export_rows(kind, queryset):
+        sheet.append([_format_cell(value) for value in row])
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=_filename(kind, 'xlsx'),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+def export_response(kind, queryset, file_format='csv'):
+    """按格式导出，file_format 为 'csv' 或 'xlsx'"""
+    if file_format == 'xlsx':
+        return export_xlsx_response(kind, queryset)
+    return export_csv_response(kind, queryset)
+
@@ -0,0 +1,235 @@
+import hashlib
+import io
+import logging
+import re
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from .models import ImageAsset, ImageVariant
+from .media_store import content_key, put
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 各格式的文件扩展名和 Content-Type
+FORMATS = {
+    'webp': ('webp', 'image/webp'),
+    'jpeg': ('jpg', 'image/jpeg'),
+    'png': ('png', 'image/png'),
+}
+
+# 处理后的图片路径：<目录>/<哈希前两位>/<原图哈希>_<尺寸>.<扩展名>
+_VARIANT_KEY = re.compile(r'/([0-9a-f]{64})_(\d+)\.(webp|jpg|png)(?:\?|$)')
+
+class ImageProcessingError(Exception):
+    """图片无法解码或超出限制"""
+
+def pipeline_settings():
+    return getattr(settings, 'IMAGE_PIPELINE_SETTINGS', {})
+
+def _read_source(source):
+    """读取上传内容并计算哈希（UploadedFile 按块读取）"""
+    digest = hashlib.sha256()
+    buffer = io.BytesIO()
+    chunks = source.chunks() if hasattr(source, 'chunks') else [source.read() if hasattr(source, 'read') else source]
+    for chunk in chunks:
+        digest.update(chunk)
+        buffer.write(chunk)
+    buffer.seek(0)
+    return digest.hexdigest(), buffer
+
+def _decode(buffer, max_size):
+    """
+    解码一次：按 EXIF 方向旋转，统一为 RGB/RGBA
+
+    JPEG 使用 draft 模式按 1/2、1/4、1/8 缩放解码，只解出不小于最大尺寸的像素。
+    """
+    # Pillow 只在处理图片时加载，不拖慢服务启动
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        image = Image.open(buffer)
+        if image.width * image.height > pipeline_settings().get('MAX_PIXELS', 40_000_000):
+            raise ImageProcessingError('图片像素过多')
+        if image.format == 'JPEG':
+            image.draft('RGB', (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise ImageProcessingError(f'无法识别的图片: {str(e)}')
+
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    return image, has_alpha
+
+def _encode(image, image_format):
+    """编码为指定格式，不写入 EXIF 等元数据"""
+    quality = pipeline_settings().get('QUALITY', {})
+    output = io.BytesIO()
+    if image_format == 'webp':
+        image.save(output, 'WEBP', quality=quality.get('webp', 80), method=4)
+    elif image_format == 'jpeg':
+        image.save(output, 'JPEG', quality=quality.get('jpeg', 85), optimize=True, progressive=True)
+    else:
+        image.save(output, 'PNG', optimize=True)
+    return output.getvalue()
+
+def _fallback_format(has_alpha):
+    """WebP 之外的兼容格式：透明图片用 PNG，否则用 JPEG"""
+    return 'png' if has_alpha else 'jpeg'
+
+def is_static_image(file):
+    """是否为可以处理的静态图片（动图、无法识别的文件原样上传）"""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(file) as image:
+            return not getattr(image, 'is_animated', False)
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        return False
+    finally:
+        file.seek(0)
+
+def process_image(source, folder='images', storage='local', reuse_storages=None):
+    """
+    处理上传的图片：解码一次、去除 EXIF、生成固定尺寸的 WebP 和 JPEG（透明图片为 PNG）版本
+
+    文件以原图内容哈希命名，同一张图片重复上传到同一存储、目录时直接返回已有记录，不再编码和上传；
+    记录丢失但文件仍在时跳过上传。
+
+    Args:
+        source: UploadedFile、文件对象或字节内容
+        folder: 存储目录
+        storage: 'local'（MEDIA_ROOT）或 'cloud'（对象存储）
+        reuse_storages: 可以直接使用已有记录的存储，按优先顺序，默认只有 storage
+
+    Returns:
+        ImageAsset: 已预取 variants
+    """
+    from PIL import Image
+
+    folder = folder.strip('/')
+    reuse_storages = list(reuse_storages or [storage])
+    content_hash, buffer = _read_source(source)
+    existing = {
+        asset.storage: asset
+        for asset in ImageAsset.objects.filter(
+            content_hash=content_hash, folder=folder, storage__in=reuse_storages
+        ).prefetch_related('variants')
+    }
+    for reuse_storage in reuse_storages:
+        if reuse_storage in existing:
+            return existing[reuse_storage]
+
+    config = pipeline_settings()
+    sizes = sorted(config.get('SIZES', (64, 128, 512)), reverse=True)
+    image, has_alpha = _decode(buffer, sizes[0])
+
+    variants = []
+    for size in sizes:
+        # 不放大：原图较小时保留原尺寸
+        if image.width > size or image.height > size:
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+        else:
+            resized = image
+        for image_format in ('webp', _fallback_format(has_alpha)):
+            ext, content_type = FORMATS[image_format]
+            data = _encode(resized, image_format)
+            key = content_key(folder, content_hash, f'.{ext}', suffix=f'_{size}')
+            variants.append(ImageVariant(
+                size=size,
+                format=image_format,
+                url=put(key, data, content_type, storage),
+                width=resized.width,
+                height=resized.height,
+                file_size=len(data),
+            ))
+
+    try:
+        with transaction.atomic():
+            asset = ImageAsset.objects.create(
+                content_hash=content_hash, folder=folder, storage=storage,
+                width=image.width, height=image.height, has_alpha=has_alpha
+            )
+            for variant in variants:
+                variant.asset = asset
+            ImageVariant.objects.bulk_create(variants)
+    except IntegrityError:
+        # 并发上传了同一张图片，文件路径相同，使用先写入的记录
+        asset = ImageAsset.objects.get(content_hash=content_hash, folder=folder, storage=storage)
+    else:
+        asset._prefetched_objects_cache = {'variants': variants}
+    logger.info(f"图片处理完成：{content_hash[:12]}，{len(variants)} 个版本")
+    return asset
+
+def variant_urls(asset):
+    """{尺寸: {格式: URL}}"""
+    urls = {}
+    for variant in asset.variants.all():
+        urls.setdefault(variant.size, {})[variant.format] = variant.url
+    return urls
+
+def primary_url(asset):
+    """保存到模型字段的地址：最大尺寸的兼容格式版本"""
+    largest = max(variant_urls(asset).items())[1]
+    return largest.get('jpeg') or largest.get('png')
+
+def _thumbnail_options(size, image_format):
+    """缩略图的尺寸和可选格式（透明图片没有 JPEG 版本，使用 PNG）"""
+    config = pipeline_settings()
+    size = size or config.get('THUMBNAIL_SIZE', 128)
+    image_format = image_format or config.get('THUMBNAIL_FORMAT', 'jpeg')
+    return size, ['webp'] if image_format == 'webp' else ['jpeg', 'png']
+
+def asset_thumbnail(asset, size=None, image_format=None):
+    """已处理图片的缩略图地址"""
+    size, formats = _thumbnail_options(size, image_format)
+    urls = variant_urls(asset).get(size, {})
+    return next((urls[image_format] for image_format in formats if image_format in urls), None)
+
+def _location(url):
+    """地址中内容哈希之前的部分（存储地址和目录）"""
+    match = _VARIANT_KEY.search(url)
+    return url[:match.start()] if match else url
+
+def thumbnail_urls(urls, size=None, image_format=None):
+    """
+    批量查询图片的缩略图地址（一次查询）
+
+    只有经过处理的图片（地址中带有内容哈希）才有缩略图，其他地址原样返回。
+
+    Args:
+        urls: 图片地址列表（如 Player.avatar）
+        size: 缩略图尺寸，默认 THUMBNAIL_SIZE
+        image_format: 'webp' 或 'jpeg'，默认 THUMBNAIL_FORMAT；透明图片的 'jpeg' 对应 PNG
+
+    Returns:
+        dict: {原地址: 缩略图地址}
+    """
+    size, formats = _thumbnail_options(size, image_format)
+
+    hashes = {}
+    for url in set(filter(None, urls)):
+        match = _VARIANT_KEY.search(url)
+        if match:
+            hashes.setdefault(match.group(1), []).append(url)
+
+    thumbnails = {url: url for url in urls if url}
+    if not hashes:
+        return thumbnails
+
+    candidates = {}
+    for content_hash, url in ImageVariant.objects.filter(
+        asset__content_hash__in=hashes.keys(), size=size, format__in=formats
+    ).values_list('asset__content_hash', 'url'):
+        candidates.setdefault(content_hash, []).append(url)
+
+    for content_hash, originals in hashes.items():
+        if content_hash not in candidates:
+            continue
+        for original in originals:
+            # 同一张图片在多个存储、目录中时，优先使用与原地址相同位置的缩略图
+            location = _location(original)
+            thumbnails[original] = next(
+                (url for url in candidates[content_hash] if _location(url) == location), candidates[content_hash][0]
+            )
+    return thumbnails
@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from .background import renew_lease
+from .models import ImportJob
+from .player_import import import_players
+
+# 设置日志
+logger = logging.getLogger('log')
+
+# 导入任务在事务中写入数据，期间的进度保存在内存中供状态接口读取
+# 任务ID -> (进度, 说明)
+_live_progress = {}
+_lock = threading.Lock()
+_executor = None
+
+def _job_settings():
+    return getattr(settings, 'IMPORT_JOB_SETTINGS', {})
+
+def get_spool_dir():
+    """上传文件的暂存目录"""
+    spool_dir = _job_settings().get('SPOOL_DIR') or os.path.join(settings.BASE_DIR, 'spool', 'imports')
+    os.makedirs(spool_dir, exist_ok=True)
+    return spool_dir
+
+def spool_upload(uploaded_file):
+    """将上传文件分块写入暂存目录，返回文件路径"""
+    ext = os.path.splitext(uploaded_file.name)[1].lower()
+    path = os.path.join(get_spool_dir(), f'{uuid.uuid4().hex}{ext}')
+    with open(path, 'wb') as f:
+        for chunk in uploaded_file.chunks():
+            f.write(chunk)
+    return path
+
+def _lease_seconds():
+    return _job_settings().get('LEASE_SECONDS', 300)
+
+def _lease():
+    """任务租约的到期时间"""
+    return datetime.now() + timedelta(seconds=_lease_seconds())
+
+def _get_executor():
+    """按需创建导入任务线程池"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_job_settings().get('WORKERS', 1),
+                thread_name_prefix='wxcloudrun-import'
+            )
+        return _executor
+
+def claim_stale_jobs():
+    """
+    处理租约已过期的未完成任务
+
+    执行中的任务所在进程已退出（导入在事务中执行，数据已回滚），标记为失败；
+    等待中的任务由本进程续约认领。都是条件更新，多个进程同时恢复时每个任务只会被一个进程处理，
+    其他进程中仍在执行（按时续约）的任务不受影响。
+
+    Returns:
+        tuple: (标记为失败的任务数, 本进程认领的等待中任务ID列表)
+    """
+    now = datetime.now()
+    stale = ImportJob.objects.filter(Q(lease_until__lt=now) | Q(lease_until__isnull=True))
+    interrupted = stale.filter(status='running').update(
+        status='failed', message='服务重启，任务中断，请重新导入', finished_at=now
+    )
+    claimed = [
+        job_id for job_id in stale.filter(status='pending').values_list('id', flat=True)
+        if stale.filter(id=job_id, status='pending').update(lease_until=_lease())
+    ]
+    return interrupted, claimed
+
+def recover_jobs():
+    """恢复上次进程退出前未完成的任务（在线程池中运行）"""
+    try:
+        interrupted, job_ids = claim_stale_jobs()
+        if interrupted:
+            logger.warning(f"{interrupted} 个导入任务因服务重启中断")
+        if job_ids:
+            logger.warning(f"重新提交 {len(job_ids)} 个等待中的导入任务")
+        for job_id in job_ids:
+            _get_executor().submit(run_job, job_id)
+    except Exception as e:
+        logger.error(f"恢复导入任务出错: {str(e)}")
+    finally:
+        connections.close_all()
+
+def replay_jobs():
+    """服务启动时调用（gunicorn post_worker_init），在后台恢复未完成的任务，不阻塞启动"""
+    _get_executor().submit(recover_jobs)
+
+def submit_job(job):
+    """提交导入任务，在当前事务提交后开始执行"""
+    transaction.on_commit(lambda: _get_executor().submit(run_job, job.id))
+
+def create_player_import_job(uploaded_file, user=None):
+    """暂存上传的Excel并创建队员导入任务"""
+    job = ImportJob.objects.create(
+        kind='player_import',
+        file_name=uploaded_file.name,
+        file_path=spool_upload(uploaded_file),
+        lease_until=_lease(),
+        message='等待执行',
+        created_by=user,
+    )
+    submit_job(job)
+    return job
+
+def _set_progress(job_id, percent, message):
+    with _lock:
+        _live_progress[job_id] = (percent, message)
+
+def get_job_progress(job):
+    """任务当前进度：执行中的任务优先使用内存中的实时进度"""
+    if job.status == 'running':
+        live = _live_progress.get(job.id)
+        if live:
+            return live
+    return job.progress, job.message
+
+def run_job(job_id):
+    """执行导入任务（在线程池中运行）"""
+    try:
+        # 只有一个线程能把任务从等待中改为执行中
+        claimed = ImportJob.objects.filter(id=job_id, status='pending').update(
+            status='running', started_at=datetime.now(), lease_until=_lease(), message='开始执行'
+        )
+        if not claimed:
+            return
+
+        job = ImportJob.objects.get(id=job_id)
+        status, progress, message, result = 'failed', 0, '', {}
+        try:
+            with renew_lease(ImportJob.objects.filter(id=job_id, status='running'), _lease_seconds()):
+                import_result = import_players(
+                    job.file_path, progress=lambda percent, text: _set_progress(job_id, percent, text)
+                )
+            result = {
+                'total_rows': import_result.total_rows,
+                'players_created': import_result.players_created,
+                'parents_created': import_result.parents_created,
+                'errors': import_result.errors,
+            }
+            if import_result.success:
+                status, progress = 'succeeded', 100
+                message = f'导入成功：新增队员 {import_result.players_created} 名，新增家长 {import_result.parents_created} 名'
+            else:
+                message = f'导入失败：共 {len(import_result.errors)} 处错误，未导入任何数据'
+        except Exception as e:
+            logger.error(f"导入任务 {job_id} 执行出错: {str(e)}")
+            message = f'导入失败：{str(e)}'[:255]
+
+        ImportJob.objects.filter(id=job_id).update(
+            status=status,
+            progress=progress,
+            message=message,
+            result=json.dumps(result, ensure_ascii=False),
+            finished_at=datetime.now(),
+        )
+
+        try:
+            os.remove(job.file_path)
+        except OSError:
+            pass
+    except Exception as e:
+        logger.error(f"导入任务 {job_id} 状态更新出错: {str(e)}")
+    finally:
+        with _lock:
+            _live_progress.pop(job_id, None)
+        # 线程池中的数据库连接在任务结束后释放
+        connections.close_all()
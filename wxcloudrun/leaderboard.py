@@ -0,0 +1,179 @@
+import logging
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from .models import PersonalAchievement, PlayerAchievement, PlayerPoints
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+def _leaderboard_size():
+    return getattr(settings, 'ACHIEVEMENT_SETTINGS', {}).get('LEADERBOARD_SIZE', 50)
+
+def compute_player_points(player_ids=None):
+    """
+    根据已解锁的成就计算队员积分
+
+    成就积分为已解锁成就的积分之和；集齐某系列全部成就时额外获得该系列的奖励积分。
+
+    Args:
+        player_ids: 队员ID列表，默认计算全部队员
+
+    Returns:
+        dict: {player_id: (成就积分, 系列奖励积分)}，没有任何积分的队员不包含在内
+    """
+    unlocked = PlayerAchievement.objects.filter(progress=100)
+    if player_ids is not None:
+        unlocked = unlocked.filter(player_id__in=player_ids)
+
+    achievement_points = dict(
+        unlocked.values('player_id').order_by().annotate(
+            points=Sum('achievement__points')
+        ).values_list('player_id', 'points')
+    )
+
+    # 分组查询需清除模型默认排序，否则排序字段会被加入 GROUP BY
+    # 有奖励积分的系列：系列ID -> (成就数量, 奖励积分)
+    series = {
+        series_id: (size, bonus)
+        for series_id, size, bonus in PersonalAchievement.objects.filter(
+            series__bonus_points__gt=0
+        ).values('series_id').order_by().annotate(
+            size=Count('id')
+        ).values_list('series_id', 'size', 'series__bonus_points')
+    }
+
+    bonus_points = defaultdict(int)
+    if series:
+        series_counts = unlocked.filter(
+            achievement__series_id__in=series.keys()
+        ).values('player_id', 'achievement__series_id').order_by().annotate(
+            count=Count('achievement_id', distinct=True)
+        ).values_list('player_id', 'achievement__series_id', 'count')
+        for player_id, series_id, count in series_counts:
+            size, bonus = series[series_id]
+            if count >= size:
+                bonus_points[player_id] += bonus
+
+    points = {}
+    for player_id in achievement_points.keys() | bonus_points.keys():
+        total = (achievement_points.get(player_id) or 0, bonus_points.get(player_id, 0))
+        if sum(total) > 0:
+            points[player_id] = total
+    return points
+
+def refresh_player_points(player_ids=None):
+    """
+    重新计算指定队员的积分并写入排行榜
+
+    只读取这些队员的成就记录，积分未变化的队员不会产生写入。
+
+    Args:
+        player_ids: 队员ID列表，默认全量重算
+
+    Returns:
+        int: 发生变化的队员数量
+    """
+    if player_ids is not None:
+        player_ids = set(player_ids)
+        if not player_ids:
+            return 0
+
+    points = compute_player_points(player_ids)
+
+    with transaction.atomic():
+        existing = PlayerPoints.objects.select_for_update()
+        if player_ids is not None:
+            existing = existing.filter(player_id__in=player_ids)
+        existing = {row.player_id: row for row in existing}
+
+        to_create, to_update = [], []
+        for player_id, (achievement_points, bonus_points) in points.items():
+            row = existing.pop(player_id, None)
+            if row is None:
+                to_create.append(PlayerPoints(
+                    player_id=player_id,
+                    achievement_points=achievement_points,
+                    bonus_points=bonus_points,
+                    total_points=achievement_points + bonus_points,
+                ))
+            elif (row.achievement_points, row.bonus_points, row.total_points) != (
+                achievement_points, bonus_points, achievement_points + bonus_points
+            ):
+                row.achievement_points = achievement_points
+                row.bonus_points = bonus_points
+                row.total_points = achievement_points + bonus_points
+                to_update.append(row)
+
+        # 剩余的记录对应积分已清零的队员
+        if existing:
+            PlayerPoints.objects.filter(player_id__in=existing.keys()).delete()
+        if to_update:
+            PlayerPoints.objects.bulk_update(
+                to_update, ['achievement_points', 'bonus_points', 'total_points'], batch_size=1000
+            )
+        if to_create:
+            # 并发刷新同一队员时以先写入者为准，之后的刷新会纠正
+            PlayerPoints.objects.bulk_create(to_create, batch_size=1000, ignore_conflicts=True)
+
+    return len(to_create) + len(to_update) + len(existing)
+
+def refresh_achievement_holders(achievement_id):
+    """成就积分变化后刷新已解锁该成就的队员"""
+    refresh_player_points(
+        PlayerAchievement.objects.filter(
+            achievement_id=achievement_id, progress=100
+        ).values_list('player_id', flat=True)
+    )
+
+def refresh_series_holders(series_id):
+    """系列奖励积分或成员变化后刷新已解锁该系列成就的队员"""
+    refresh_player_points(
+        PlayerAchievement.objects.filter(
+            achievement__series_id=series_id, progress=100
+        ).values_list('player_id', flat=True)
+    )
+
+def verify_player_points():
+    """
+    将排行榜与全量重算结果比对
+
+    Returns:
+        dict: {player_id: (排行榜中的积分, 重算的积分)}，积分为 (成就积分, 奖励积分, 总积分)，只包含不一致的队员
+    """
+    expected = {
+        player_id: (achievement_points, bonus_points, achievement_points + bonus_points)
+        for player_id, (achievement_points, bonus_points) in compute_player_points().items()
+    }
+    stored = {
+        row[0]: row[1:]
+        for row in PlayerPoints.objects.values_list('player_id', 'achievement_points', 'bonus_points', 'total_points')
+    }
+
+    return {
+        player_id: (stored.get(player_id), expected.get(player_id))
+        for player_id in expected.keys() | stored.keys()
+        if stored.get(player_id) != expected.get(player_id)
+    }
+
+def get_leaderboard(team_id=None, school_id=None, limit=None):
+    """
+    获取成就积分排行榜
+
+    直接按总积分索引读取前N名，读取量只与返回数量有关。
+
+    Args:
+        team_id: 只统计该队伍的队员
+        school_id: 只统计该学校的队员
+        limit: 返回数量，默认使用 ACHIEVEMENT_SETTINGS['LEADERBOARD_SIZE']
+
+    Returns:
+        QuerySet: PlayerPoints 列表（已关联队员），按总积分降序
+    """
+    queryset = PlayerPoints.objects.select_related('player')
+    if team_id is not None:
+        queryset = queryset.filter(player__teams__id=team_id)
+    if school_id is not None:
+        queryset = queryset.filter(player__school_id=school_id)
+    return queryset.order_by('-total_points', '-id')[:limit or _leaderboard_size()]
@@ -0,0 +1,90 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from wxcloudrun.utils import cloud_storage
+from wxcloudrun.utils.cloud_storage import CloudStorage, storage_settings
+from wxcloudrun.utils.fake_cos import FakeCOSServer
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))] if ordered else 0
+
+class Command(BaseCommand):
+    help = '压测对象存储上传和删除（默认启动本地模拟服务，可离线运行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200, help='上传文件数量')
+        parser.add_argument('--size', type=int, default=50, help='每个文件大小（KB）')
+        parser.add_argument('--concurrency', type=int, default=4, help='并发线程数')
+        parser.add_argument('--base-url', help='压测指定的存储地址，不指定时启动本地模拟服务')
+        parser.add_argument('--latency', type=float, default=0.0, help='模拟服务每个请求的延迟（毫秒）')
+        parser.add_argument('--fail-rate', type=float, default=0.0, help='模拟服务随机返回503的比例（0-1）')
+        parser.add_argument('--baseline', action='store_true', help='同时压测不使用连接池的 requests.put 作为对比')
+
+    def handle(self, *args, **options):
+        if cloud_storage.requests is None:
+            raise CommandError('requests 库未安装')
+
+        server = None
+        base_url = options['base_url']
+        if not base_url:
+            server = FakeCOSServer(latency=options['latency'] / 1000, fail_rate=options['fail_rate']).start()
+            base_url = server.base_url
+            self.stdout.write(f'已启动本地模拟服务：{base_url}')
+
+        try:
+            with override_settings(CLOUD_STORAGE_SETTINGS={**storage_settings(), 'BASE_URL': base_url}):
+                cloud_storage.reset_session()
+                payload = os.urandom(options['size'] * 1024)
+                if options['baseline']:
+                    self._run('不使用连接池', lambda index: self._bare_upload(base_url, payload, index), options, server)
+                self._run('连接池', lambda index: self._pooled_upload(payload, index), options, server)
+        finally:
+            cloud_storage.reset_session()
+            if server:
+                server.stop()
+
+    def _pooled_upload(self, payload, index):
+        url = CloudStorage.upload_file(payload, f'bench_{index}.bin', folder='benchmark')
+        if url:
+            CloudStorage.delete_file(url)
+        return url is not None
+
+    def _bare_upload(self, base_url, payload, index):
+        requests = cloud_storage.requests
+        url = f'{base_url}/benchmark/bench_{index}.bin'
+        try:
+            response = requests.put(url, data=payload, headers={'Content-Type': 'application/octet-stream'})
+            requests.delete(url)
+        except requests.RequestException:
+            return False
+        return response.status_code == 200
+
+    def _run(self, name, upload, options, server):
+        connections_before = server.connections if server else 0
+        timings = []
+
+        def timed(index):
+            start = time.perf_counter()
+            ok = upload(index)
+            timings.append(time.perf_counter() - start)
+            return ok
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            succeeded = sum(executor.map(timed, range(options['count'])))
+        elapsed = time.perf_counter() - start
+
+        megabytes = succeeded * options['size'] / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f'[{name}] 成功 {succeeded}/{options["count"]}，耗时 {elapsed:.2f} 秒，'
+            f'{succeeded / elapsed:.1f} 个/秒，{megabytes / elapsed:.1f} MB/秒'
+        ))
+        self.stdout.write(
+            f'  单次上传+删除 p50 {_percentile(timings, 50) * 1000:.1f} ms，'
+            f'p95 {_percentile(timings, 95) * 1000:.1f} ms'
+        )
+        if server:
+            self.stdout.write(f'  新建连接 {server.connections - connections_before} 个')
@@ -0,0 +1,91 @@
+import random
+import time
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from wxcloudrun.models import School, EnrollmentYear, Player, Task, TaskCompletion
+from wxcloudrun.streak_service import calculate_task_streaks
+from wxcloudrun.task_utils import summarize_streaks
+
+class _Rollback(Exception):
+    """用于在基准测试结束后回滚模拟数据"""
+
+class Command(BaseCommand):
+    help = '对比逐个队员查询计算与批量计算连续完成次数的耗时（模拟数据在事务中写入，结束后回滚）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, nargs='+', default=[50, 500, 5000],
+                            help='模拟的队员数量，可指定多个')
+        parser.add_argument('--days', type=int, default=60, help='模拟的历史天数')
+        parser.add_argument('--seed', type=int, default=42, help='随机种子')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        for player_count in options['players']:
+            try:
+                with transaction.atomic():
+                    self.run_benchmark(player_count, options['days'])
+                    raise _Rollback()
+            except _Rollback:
+                pass
+
+    def run_benchmark(self, player_count, days):
+        task, players = self.create_fixtures(player_count, days)
+
+        # 原有方式：每名队员单独查询完成记录后计算
+        start = time.perf_counter()
+        loop_results = {}
+        for player in players:
+            completion_dates = TaskCompletion.objects.filter(
+                task=task, player=player, verified=True
+            ).values_list('completion_date', flat=True)
+            loop_results[player.id] = summarize_streaks(task.period, completion_dates)[0]
+        loop_elapsed = time.perf_counter() - start
+
+        # 批量方式：一次查询后统一计算
+        start = time.perf_counter()
+        bulk_streaks = calculate_task_streaks([task.id], [player.id for player in players])
+        bulk_results = {
+            player.id: bulk_streaks.get((task.id, player.id), (0, 0, None))[0]
+            for player in players
+        }
+        bulk_elapsed = time.perf_counter() - start
+
+        if loop_results != bulk_results:
+            self.stdout.write(self.style.ERROR(f'{player_count} 名队员：两种计算结果不一致'))
+            return
+
+        speedup = loop_elapsed / bulk_elapsed if bulk_elapsed else float('inf')
+        self.stdout.write(
+            f'{player_count:>6} 名队员：逐个计算 {loop_elapsed * 1000:.1f}ms，'
+            f'批量计算 {bulk_elapsed * 1000:.1f}ms，加速 {speedup:.1f}x'
+        )
+
+    def create_fixtures(self, player_count, days):
+        """生成模拟的队员、每日任务及已验证完成记录"""
+        today = date.today()
+        user = User.objects.create(username=f'benchmark_{time.time_ns()}')
+        school = School.objects.create(name=f'benchmark_{time.time_ns()}')
+        enrollment_year = EnrollmentYear.objects.create(year=-time.time_ns() % 100000000)
+        task = Task.objects.create(
+            title='benchmark', description='', period='daily',
+            start_date=today - timedelta(days=days), created_by=user
+        )
+        players = Player.objects.bulk_create([
+            Player(name=f'benchmark_{i}', school=school, enrollment_year=enrollment_year)
+            for i in range(player_count)
+        ])
+        if players and players[0].pk is None:
+            players = list(Player.objects.filter(school=school))
+
+        completions = [
+            TaskCompletion(task=task, player=player, completion_date=today - timedelta(days=offset),
+                           notes='', verified=True)
+            for player in players
+            for offset in range(days)
+            # 随机缺勤以产生多段连续记录
+            if random.random() < 0.85
+        ]
+        TaskCompletion.objects.bulk_create(completions, batch_size=2000)
+        return task, players
@@ -0,0 +1,170 @@
+import json
+import re
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Avg, Count, Max, Min, Q
+from wxcloudrun.models import (
+    AssessmentScore, PersonalAchievement, Player, PlayerAchievement, Task, TaskCompletion, Team
+)
+
+def _first_id(model):
+    # 库中没有数据时使用不存在的ID，执行计划不受影响
+    return model.objects.values_list('id', flat=True).first() or 1
+
+def hot_queries():
+    """
+    各热点查询的代表性写法
+
+    Returns:
+        list: [(名称, 查询集, 需要走索引的表)]
+    """
+    today = date.today()
+    task_id = _first_id(Task)
+    player_id = _first_id(Player)
+    team_id = _first_id(Team)
+    player_ids = list(Player.objects.values_list('id', flat=True)[:50]) or [player_id]
+    task_ids = list(Task.objects.values_list('id', flat=True)[:50]) or [task_id]
+
+    return [
+        ('task_views.complete_task 一次性任务是否已完成',
+         TaskCompletion.objects.filter(task_id=task_id, player_id=player_id, verified=True),
+         ['task_completion']),
+        ('task_views.complete_task 周期任务当天是否已完成',
+         TaskCompletion.objects.filter(task_id=task_id, player_id=player_id, completion_date=today, verified=True),
+         ['task_completion']),
+        ('task_views 任务当天已验证完成人数',
+         TaskCompletion.objects.filter(task_id=task_id, verified=True, completion_date=today).values('player').distinct(),
+         ['task_completion']),
+        ('task_views.get_team_task_stats 队伍活跃任务',
+         Task.objects.filter(teams=team_id, status='active', start_date__lte=today).filter(
+             Q(end_date__isnull=True) | Q(end_date__gte=today)
+         ),
+         ['task']),
+        ('task_views.get_player_task_history 日期范围内的完成记录',
+         TaskCompletion.objects.filter(player_id=player_id, completion_date__range=(today.replace(day=1), today)),
+         ['task_completion']),
+        ('task_board 相关完成记录',
+         TaskCompletion.objects.filter(task_id__in=task_ids, player_id__in=player_ids).filter(
+             Q(task__period='once') | Q(completion_date=today)
+         ).values('task_id', 'player_id', 'completion_date', 'verified'),
+         ['task_completion']),
+        ('streak_service 已验证完成记录',
+         TaskCompletion.objects.filter(task_id__in=task_ids, verified=True, player_id__in=player_ids).values_list(
+             'task_id', 'player_id', 'completion_date'
+         ),
+         ['task_completion']),
+        ('player_views 已验证完成的任务数',
+         TaskCompletion.objects.filter(player_id=player_id, verified=True).values('task').distinct(),
+         ['task_completion']),
+        ('player_views 已解锁成就数',
+         PlayerAchievement.objects.filter(player_id=player_id, progress=100),
+         ['player_achievement']),
+        ('player_views 考核平均成绩',
+         AssessmentScore.objects.filter(player_id=player_id).values('player_id').order_by().annotate(avg=Avg('score')),
+         ['assessment_score']),
+        ('achievement_service 加载自动成就规则',
+         PersonalAchievement.objects.filter(criteria_type__in=['auto_task', 'auto_assessment'], is_public=True).only(
+             'id', 'name', 'criteria_type', 'criteria_value', 'updated_at'
+         ),
+         ['personal_achievement']),
+        ('achievement_service 队员完成任务数统计',
+         TaskCompletion.objects.filter(verified=True, player_id__in=player_ids).values('player_id').order_by().annotate(
+             task_count=Count('task_id', distinct=True)
+         ),
+         ['task_completion']),
+        ('achievement_service 队员成绩统计',
+         AssessmentScore.objects.filter(player_id__in=player_ids).values('player_id').order_by().annotate(
+             score_count=Count('id'), min_score=Min('score'), max_score=Max('score')
+         ),
+         ['assessment_score']),
+    ]
+
+def _sqlite_scans(plan):
+    """SQLite：返回 (全表扫描的表, 使用的索引)"""
+    full_scans, indexes = set(), set()
+    for line in plan.splitlines():
+        match = re.search(r'\b(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS \w+)?(.*)$', line)
+        if not match:
+            continue
+        action, table, rest = match.groups()
+        index = re.search(r'USING (?:COVERING )?INDEX (\w+)', rest)
+        if index:
+            indexes.add(index.group(1))
+        elif 'PRIMARY KEY' in rest:
+            indexes.add(f'{table}(主键)')
+        elif action == 'SCAN':
+            full_scans.add(table)
+    return full_scans, indexes
+
+def _mysql_scans(plan):
+    """MySQL（FORMAT=JSON）：返回 (全表扫描的表, 使用的索引)"""
+    full_scans, indexes = set(), set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            if 'table_name' in node and 'access_type' in node:
+                if node['access_type'] == 'ALL':
+                    full_scans.add(node['table_name'])
+                if node.get('key'):
+                    indexes.add(node['key'])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(json.loads(plan))
+    return full_scans, indexes
+
+def _postgresql_scans(plan):
+    """PostgreSQL：返回 (全表扫描的表, 使用的索引)"""
+    full_scans = set(re.findall(r'Seq Scan on (\w+)', plan))
+    indexes = set(re.findall(r'Index (?:Only )?Scan (?:Backward )?using (\w+)', plan))
+    indexes.update(re.findall(r'Bitmap Index Scan on (\w+)', plan))
+    return full_scans, indexes
+
+def explain(queryset):
+    """
+    获取查询的执行计划并分析
+
+    直接执行 EXPLAIN 语句：QuerySet.explain() 在 SQLite 上只返回执行计划的第一行。
+
+    Returns:
+        tuple: (执行计划文本, 全表扫描的表集合, 使用的索引集合)
+    """
+    prefixes = {
+        'sqlite': ('EXPLAIN QUERY PLAN ', _sqlite_scans),
+        'mysql': ('EXPLAIN FORMAT=JSON ', _mysql_scans),
+        'postgresql': ('EXPLAIN ', _postgresql_scans),
+    }
+    if connection.vendor not in prefixes:
+        raise CommandError(f'不支持分析 {connection.vendor} 的执行计划')
+    prefix, analyze = prefixes[connection.vendor]
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        plan = '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    return (plan,) + analyze(plan)
+
+class Command(BaseCommand):
+    help = '用EXPLAIN检查任务、队员和成就相关的热点查询是否都使用了索引，有全表扫描时命令失败'
+
+    def handle(self, *args, **options):
+        # 表中数据很少时优化器可能直接选择全表扫描，应在有代表性数据的库上运行
+        failures = []
+        for name, queryset, tables in hot_queries():
+            plan, full_scans, indexes = explain(queryset)
+            scanned = sorted(full_scans & set(tables))
+            if scanned:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"[全表扫描] {name}：{', '.join(scanned)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"[OK] {name}：{', '.join(sorted(indexes)) or '-'}"))
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f'{len(failures)} 个热点查询未使用索引')
+        self.stdout.write(self.style.SUCCESS('所有热点查询均使用了索引'))
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from wxcloudrun.media_store import (
+    BACKENDS, get_backend, is_content_addressed, referenced_urls, store_settings
+)
+from wxcloudrun.models import ImageAsset, ImageVariant
+
+class Command(BaseCommand):
+    help = '查找并清理不再被队员头像、成就徽章和封面引用的内容寻址媒体文件（默认只列出，不删除）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true', help='删除未引用的文件，不指定时只列出')
+        parser.add_argument('--storage', action='append', choices=sorted(BACKENDS), help='只检查指定存储，可重复指定')
+        parser.add_argument('--grace-hours', type=float, help='最近这段时间内上传的文件不清理，默认 GC_GRACE_HOURS')
+
+    def handle(self, *args, **options):
+        config = store_settings()
+        grace_hours = options['grace_hours'] if options['grace_hours'] is not None else config.get('GC_GRACE_HOURS', 24)
+        cutoff = datetime.now() - timedelta(hours=grace_hours)
+
+        urls = referenced_urls()
+        self.stdout.write(f'被引用的文件：{len(urls)} 个')
+
+        for storage in options['storage'] or sorted(BACKENDS):
+            backend = get_backend(storage)
+            referenced = {key for key in map(backend.key_from_url, urls) if key}
+            scanned, recent, orphans = 0, 0, []
+            try:
+                for prefix in config.get('GC_PREFIXES', []):
+                    for key, modified, size in backend.list(prefix):
+                        # 只管理以内容哈希命名的文件，旧的随机文件名不处理
+                        if not is_content_addressed(key):
+                            continue
+                        scanned += 1
+                        if key in referenced:
+                            continue
+                        if modified is None or modified > cutoff:
+                            recent += 1
+                            continue
+                        orphans.append((key, size))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'[{storage}] 列出文件失败：{str(e)}'))
+                continue
+
+            total_size = sum(size for _, size in orphans)
+            self.stdout.write(
+                f'[{storage}] 检查 {scanned} 个文件，未引用 {len(orphans)} 个（{total_size / 1024 / 1024:.1f} MB），'
+                f'最近上传而跳过 {recent} 个'
+            )
+            if options['verbosity'] > 1 or not options['delete']:
+                for key, size in orphans:
+                    self.stdout.write(f'  {key}（{size} 字节）')
+            if options['delete'] and orphans:
+                self._delete(backend, orphans)
+
+    def _delete(self, backend, orphans):
+        deleted_urls = []
+        failed = 0
+        for key, _ in orphans:
+            if backend.delete(key):
+                deleted_urls.append(backend.url(key))
+            else:
+                failed += 1
+
+        # 图片任一版本的文件被删除后删除整条图片记录，重新上传同一张图片时会重新生成
+        asset_ids = set()
+        for start in range(0, len(deleted_urls), 500):
+            asset_ids.update(
+                ImageVariant.objects.filter(url__in=deleted_urls[start:start + 500]).values_list('asset_id', flat=True)
+            )
+        with transaction.atomic():
+            ImageAsset.objects.filter(id__in=asset_ids).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'[{backend.name}] 已删除 {len(deleted_urls)} 个文件和 {len(asset_ids)} 条图片记录'
+        ))
+        if failed:
+            self.stdout.write(self.style.ERROR(f'[{backend.name}] {failed} 个文件删除失败'))
@@ -6,7 +6,7 @@ from wxcloudrun.models import (
     AchievementCategory, AchievementSeries, PersonalAchievement
 )
 from django.conf import settings
-from wxcloudrun.utils.cloud_storage import CloudStorage
+from wxcloudrun import media_store
 
 class Command(BaseCommand):
     help = '初始化青少年棒球俱乐部成就系统的示例数据'
@@ -29,7 +29,15 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.SUCCESS('成就系统初始化完成！'))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'初始化失败：{str(e)}'))
-    
+
+    def _upload_image(self, img_file, folder):
+        """以内容哈希命名上传示例图片，失败时返回None"""
+        try:
+            return media_store.save(img_file, folder, '.png', content_type='image/png')
+        except IOError as e:
+            self.stdout.write(self.style.WARNING(f'图片上传失败：{str(e)}'))
+            return None
+
     def create_categories(self):
         """创建成就类别"""
         self.stdout.write('创建成就类别...')
@@ -81,7 +89,7 @@ class Command(BaseCommand):
             sample_image_path = os.path.join(settings.BASE_DIR, 'static', 'sample_images', f"category_{cat_data['name']}.png")
             if os.path.exists(sample_image_path):
                 with open(sample_image_path, 'rb') as img_file:
-                    cover_url = CloudStorage.upload_file(img_file, folder=f"categories/{cat_data['name'].lower()}")
+                    cover_url = self._upload_image(img_file, f"categories/{cat_data['name'].lower()}")
                     if cover_url:
                         cat_data['cover_image'] = cover_url
             
@@ -168,7 +176,7 @@ class Command(BaseCommand):
             sample_image_path = os.path.join(settings.BASE_DIR, 'static', 'sample_images', f"series_{series_item['name']}.png")
             if os.path.exists(sample_image_path):
                 with open(sample_image_path, 'rb') as img_file:
-                    cover_url = CloudStorage.upload_file(img_file, folder=f"series/{series_item['name'].lower()}")
+                    cover_url = self._upload_image(img_file, f"series/{series_item['name'].lower()}")
                     if cover_url:
                         series_item['cover_image'] = cover_url
             
@@ -377,10 +385,7 @@ class Command(BaseCommand):
                 )
                 if os.path.exists(sample_image_path):
                     with open(sample_image_path, 'rb') as img_file:
-                        badge_url = CloudStorage.upload_file(
-                            img_file, 
-                            folder=f"badges/{ach_data['name'].lower()}"
-                        )
+                        badge_url = self._upload_image(img_file, f"badges/{ach_data['name'].lower()}")
                         if badge_url:
                             ach_data[image_type] = badge_url
             
@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# 只在用到时才导入的重量级依赖（数据导入导出、图片处理、统计），启动时导入则命令失败
+LAZY_MODULES = ['pandas', 'numpy', 'openpyxl', 'PIL']
+
+def parse_importtime(output):
+    """
+    解析 python -X importtime 的输出
+
+    Returns:
+        list: [(模块名, 嵌套层级, 自身耗时us, 累计耗时us)]，按导入完成顺序，层级0为直接导入的模块
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            # 模块名前每两个空格表示一层嵌套
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return rows
+
+class Command(BaseCommand):
+    help = '在新进程中导入WSGI入口，统计各模块的导入耗时（python -X importtime）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='wxcloudrun.wsgi', help='要导入的模块，默认 wxcloudrun.wsgi')
+        parser.add_argument('--top', type=int, default=30, help='显示累计耗时最高的模块数量')
+        parser.add_argument('--forbid', action='append',
+                            help=f"启动时不应导入的模块，导入则命令失败，可重复指定，默认 {' '.join(LAZY_MODULES)}")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f"import {options['module']}"],
+            env=env,
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        rows = parse_importtime(result.stderr)
+        if result.returncode != 0:
+            errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+            raise CommandError(f"导入 {options['module']} 失败：\n" + '\n'.join(errors[-20:]))
+
+        # 按顶层包汇总各模块的自身耗时，各包之间不重复计算
+        packages = {}
+        for name, _, self_us, _ in rows:
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + self_us
+        total_us = sum(cumulative_us for _, depth, _, cumulative_us in rows if depth == 0)
+
+        self.stdout.write(f"导入 {options['module']} 共 {len(rows)} 个模块，累计 {total_us / 1000:.1f} ms")
+
+        self.stdout.write('\n按顶层包统计（自身耗时合计）：')
+        for package, cumulative_us in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'{cumulative_us / 1000:>10.1f} ms  {package}')
+
+        self.stdout.write('\n累计耗时最高的模块：')
+        for name, _, self_us, cumulative_us in sorted(rows, key=lambda row: -row[3])[:options['top']]:
+            self.stdout.write(f'{cumulative_us / 1000:>10.1f} ms  (自身 {self_us / 1000:.1f} ms)  {name}')
+
+        imported = {name for name, _, _, _ in rows}
+        modules = options['forbid'] or LAZY_MODULES
+        forbidden = [
+            module for module in modules
+            if module in imported or any(name.startswith(module + '.') for name in imported)
+        ]
+        if forbidden:
+            raise CommandError(f"启动时导入了不应加载的模块：{', '.join(forbidden)}")
+        self.stdout.write(self.style.SUCCESS(f"启动时未导入：{', '.join(modules)}"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from wxcloudrun.streak_service import rebuild_task_streaks
+
+class Command(BaseCommand):
+    help = '根据任务完成记录重建任务连续完成记录'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task', type=int, action='append', dest='task_ids',
+                            help='只重建指定任务ID，可重复指定')
+
+    def handle(self, *args, **options):
+        try:
+            self.stdout.write('开始重建任务连续完成记录...')
+            count = rebuild_task_streaks(options.get('task_ids'))
+            self.stdout.write(self.style.SUCCESS(f'重建完成，共 {count} 条记录'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'重建失败：{str(e)}'))
@@ -0,0 +1,19 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand
+from wxcloudrun.team_dashboard import rebuild_daily_stats
+
+class Command(BaseCommand):
+    help = '根据任务完成记录回填或重建队伍每日任务统计'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--team', type=int, action='append', help='只重建指定队伍，可重复指定')
+        parser.add_argument('--since', help='只重建该日期（YYYY-MM-DD）及之后的统计')
+
+    def handle(self, *args, **options):
+        try:
+            since = datetime.strptime(options['since'], '%Y-%m-%d').date() if options['since'] else None
+            self.stdout.write('开始重建队伍每日任务统计...')
+            count = rebuild_daily_stats(options['team'], since)
+            self.stdout.write(self.style.SUCCESS(f'重建完成，共写入 {count} 行统计'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'重建失败：{str(e)}'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from wxcloudrun.leaderboard import verify_player_points, refresh_player_points
+
+class Command(BaseCommand):
+    help = '将成就积分排行榜与全量重算结果比对，可选修复（存在未修复的不一致或校验出错时命令失败）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='发现不一致时全量重算排行榜')
+
+    def handle(self, *args, **options):
+        try:
+            self.stdout.write('开始校验成就积分排行榜...')
+            mismatches = verify_player_points()
+            if not mismatches:
+                self.stdout.write(self.style.SUCCESS('排行榜与重算结果一致'))
+                return
+
+            for player_id, (stored, expected) in sorted(mismatches.items()):
+                self.stdout.write(f'队员(ID:{player_id}) 排行榜: {stored}，重算: {expected}')
+            self.stdout.write(self.style.ERROR(f'共 {len(mismatches)} 名队员积分不一致'))
+
+            if not options['fix']:
+                raise CommandError(f'{len(mismatches)} 名队员的排行榜积分与重算结果不一致，可使用 --fix 修复')
+
+            count = refresh_player_points()
+            self.stdout.write(self.style.SUCCESS(f'已重算排行榜，更新 {count} 名队员'))
+            remaining = verify_player_points()
+            if remaining:
+                raise CommandError(f'重算后仍有 {len(remaining)} 名队员积分不一致')
+        except CommandError:
+            raise
+        except Exception as e:
+            raise CommandError(f'校验失败：{str(e)}')
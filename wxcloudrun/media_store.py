@@ -0,0 +1,249 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+from datetime import datetime, timezone
+from django.conf import settings
+from .metrics import media_store_writes
+from .utils.cloud_storage import CloudStorage
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 以内容哈希命名的文件：<目录>/<哈希前两位>/<SHA-256>[_<尺寸>].<扩展名>
+CONTENT_ADDRESSED = re.compile(r'(?:^|/)([0-9a-f]{2})/(\1[0-9a-f]{62})(?:_\d+)?(?:\.\w+)?$')
+
+# 保存媒体文件URL的字段，清理未引用文件时以这些字段为准
+REFERENCE_FIELDS = [
+    ('Player', 'avatar'),
+    ('PersonalAchievement', 'badge_image'),
+    ('PersonalAchievement', 'badge_image_locked'),
+    ('PersonalAchievement', 'badge_animation'),
+    ('AchievementCategory', 'cover_image'),
+    ('AchievementSeries', 'cover_image'),
+    ('TeamAchievement', 'badge_image'),
+]
+
+def store_settings():
+    return getattr(settings, 'MEDIA_STORE_SETTINGS', {})
+
+def immutable_cache_control():
+    """内容哈希命名的文件内容不会变化，可以长期缓存"""
+    return f"public, max-age={store_settings().get('CACHE_MAX_AGE', 31536000)}, immutable"
+
+def content_key(folder, content_hash, ext='', suffix=''):
+    """按内容哈希生成对象键"""
+    return f'{folder.strip("/")}/{content_hash[:2]}/{content_hash}{suffix}{ext}'
+
+def is_content_addressed(key):
+    return CONTENT_ADDRESSED.search(key) is not None
+
+class LocalBackend:
+    """保存到 MEDIA_ROOT，通过 MEDIA_URL 访问"""
+    name = 'local'
+
+    def _path(self, key):
+        return os.path.join(settings.MEDIA_ROOT, *key.split('/'))
+
+    def url(self, key):
+        return f'{settings.MEDIA_URL}{key}'
+
+    def key_from_url(self, url):
+        return url[len(settings.MEDIA_URL):] if url and url.startswith(settings.MEDIA_URL) else None
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def open(self, key):
+        return open(self._path(key), 'rb')
+
+    def touch(self, key, content_type):
+        """更新修改时间，文件已被删除时返回False"""
+        try:
+            os.utime(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def write(self, key, file, content_type):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再改名，读取方不会看到写了一半的文件
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                file.seek(0)
+                for chunk in iter(lambda: file.read(64 * 1024), b''):
+                    f.write(chunk)
+                # 落盘后再改名，本地文件同时作为后台上传的暂存文件，进程崩溃后仍可重新上传
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self.url(key)
+
+    def list(self, prefix):
+        """(对象键, 修改时间, 大小)"""
+        root = self._path(prefix.strip('/'))
+        for directory, _, file_names in os.walk(root):
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                key = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+                stat = os.stat(path)
+                yield key, datetime.fromtimestamp(stat.st_mtime), stat.st_size
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+class CloudBackend:
+    """保存到对象存储"""
+    name = 'cloud'
+
+    def url(self, key):
+        return f'{CloudStorage.base_url()}/{key}'
+
+    def key_from_url(self, url):
+        prefix = f'{CloudStorage.base_url()}/'
+        return url[len(prefix):] if url and url.startswith(prefix) else None
+
+    def exists(self, key):
+        return CloudStorage.file_exists(self.url(key))
+
+    def touch(self, key, content_type):
+        return CloudStorage.touch_file(self.url(key), content_type, cache_control=immutable_cache_control())
+
+    def write(self, key, file, content_type):
+        folder, file_name = key.rsplit('/', 1)
+        url = CloudStorage.upload_file(
+            file, file_name, folder, content_type=content_type, cache_control=immutable_cache_control()
+        )
+        if not url:
+            raise IOError(f'上传 {key} 失败')
+        return url
+
+    def list(self, prefix):
+        for key, last_modified, size in CloudStorage.list_files(prefix.strip('/') + '/'):
+            # COS 返回 UTC 时间，转换为本地时间（USE_TZ=False）
+            modified = None
+            if last_modified:
+                modified = datetime.strptime(last_modified[:19], '%Y-%m-%dT%H:%M:%S')
+                modified = modified.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+            yield key, modified, size
+
+    def delete(self, key):
+        return CloudStorage.delete_file(self.url(key))
+
+BACKENDS = {
+    'local': LocalBackend(),
+    'cloud': CloudBackend(),
+}
+
+def get_backend(storage):
+    return BACKENDS[storage]
+
+def put(key, content, content_type, storage='cloud'):
+    """
+    按给定的内容寻址键保存文件，已存在时跳过上传
+
+    Args:
+        key: 对象键（由 content_key 生成）
+        content: 字节内容或文件对象
+        content_type: 文件类型
+        storage: 'local' 或 'cloud'
+
+    Returns:
+        str: 文件URL
+    """
+    backend = get_backend(storage)
+    # 存在性无法确定（请求失败）时照常上传，相同内容覆盖不影响已有引用；
+    # 已存在时更新修改时间，新的引用保存前清理任务按宽限期跳过该文件，更新失败时重新上传
+    if backend.exists(key) and backend.touch(key, content_type):
+        media_store_writes.inc(storage=storage, result='deduplicated')
+        return backend.url(key)
+    file = content if hasattr(content, 'read') else io.BytesIO(content)
+    url = backend.write(key, file, content_type)
+    media_store_writes.inc(storage=storage, result='stored')
+    return url
+
+def _spool(source):
+    """
+    读取上传内容的同时计算哈希
+
+    内容写入 SpooledTemporaryFile，较小的文件留在内存，较大的文件转存到磁盘，
+    上传时从中流式读取，原始上传只需读取一次。
+
+    Returns:
+        tuple: (SHA-256, 暂存文件)
+    """
+    digest = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=store_settings().get('SPOOL_MAX_MEMORY', 1024 * 1024))
+    if hasattr(source, 'chunks'):
+        chunks = source.chunks()
+    elif hasattr(source, 'read'):
+        source.seek(0)
+        chunks = iter(lambda: source.read(64 * 1024), b'')
+    else:
+        chunks = [source]
+    for chunk in chunks:
+        digest.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return digest.hexdigest(), spool
+
+def save(source, folder, ext='', content_type=None, storage='cloud'):
+    """
+    以内容哈希命名保存文件，相同内容只保存一份
+
+    Args:
+        source: UploadedFile、文件对象或字节内容
+        folder: 存储目录
+        ext: 扩展名（含'.'）
+        content_type: 文件类型
+        storage: 'local' 或 'cloud'
+
+    Returns:
+        str: 不可变的文件URL
+    """
+    content_hash, spool = _spool(source)
+    with spool:
+        return put(content_key(folder, content_hash, ext.lower()), spool, content_type or 'application/octet-stream', storage)
+
+def referenced_urls():
+    """
+    所有被记录引用的媒体文件URL
+
+    引用了处理后图片的任一版本时，该图片的所有版本（缩略图等）都视为被引用。
+    """
+    from django.apps import apps
+    from .models import ImageVariant
+
+    urls = set()
+    for model_name, field in REFERENCE_FIELDS:
+        model = apps.get_model('wxcloudrun', model_name)
+        urls.update(
+            model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            .values_list(field, flat=True).iterator(chunk_size=2000)
+        )
+    # 尚未上传完成的后台上传任务仍需要本地暂存文件
+    urls.update(
+        apps.get_model('wxcloudrun', 'UploadJobFile').objects
+        .filter(job__status__in=('pending', 'running')).values_list('local_url', flat=True)
+    )
+
+    direct = list(urls)
+    asset_ids = set()
+    for start in range(0, len(direct), 500):
+        asset_ids.update(ImageVariant.objects.filter(url__in=direct[start:start + 500]).values_list('asset_id', flat=True))
+    asset_ids = list(asset_ids)
+    for start in range(0, len(asset_ids), 500):
+        urls.update(ImageVariant.objects.filter(asset_id__in=asset_ids[start:start + 500]).values_list('url', flat=True))
+    return urls
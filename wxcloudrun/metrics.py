@@ -0,0 +1,224 @@
+import glob
+import json
+import os
+import threading
+import time
+from django.conf import settings
+
+# 请求耗时直方图的分桶上限（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def metrics_settings():
+    return getattr(settings, 'METRICS_SETTINGS', {})
+
+class Metric:
+    """指标：按标签值分别计数"""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._values.items()}
+
+    def _copy(self, value):
+        return value
+
+class Counter(Metric):
+    """只增不减的计数器"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Histogram(Metric):
+    """直方图：各分桶的计数、总和与总数"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [各分桶计数..., 总和, 总数]
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[index] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    def _copy(self, value):
+        return list(value)
+
+class Registry:
+    """
+    进程内指标注册表
+
+    配置了 MULTIPROC_DIR 时，各 gunicorn 进程定期把自己的指标写入该目录下的文件，
+    导出时合并所有进程的文件，已退出进程的计数也会保留。
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        # 进程号 + 启动时间，进程号被复用时不会覆盖旧进程的文件
+        self._file_id = f'{os.getpid()}_{int(time.time() * 1000)}'
+        self._file_pid = os.getpid()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        """{指标名: {标签值元组: 值}}"""
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def _multiproc_dir(self):
+        return metrics_settings().get('MULTIPROC_DIR')
+
+    def _file_path(self, directory):
+        # fork 出的子进程使用自己的文件
+        if os.getpid() != self._file_pid:
+            self._file_pid = os.getpid()
+            self._file_id = f'{os.getpid()}_{int(time.time() * 1000)}'
+        return os.path.join(directory, f'metrics_{self._file_id}.json')
+
+    def flush(self, force=False):
+        """把本进程的指标写入多进程目录（未配置时不做任何事）"""
+        directory = self._multiproc_dir()
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < metrics_settings().get('FLUSH_INTERVAL', 5):
+            return
+        self._last_flush = now
+
+        data = {
+            name: [[list(key), value] for key, value in values.items()]
+            for name, values in self.snapshot().items()
+        }
+        os.makedirs(directory, exist_ok=True)
+        path = self._file_path(directory)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        # 原子替换，读取方不会读到写了一半的文件
+        os.replace(tmp_path, path)
+
+    def collect(self):
+        """本进程或全部进程合并后的指标"""
+        directory = self._multiproc_dir()
+        if not directory:
+            return self.snapshot()
+
+        self.flush(force=True)
+        merged = {name: {} for name in self._metrics}
+        for path in glob.glob(os.path.join(directory, 'metrics_*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, samples in data.items():
+                metric = self._metrics.get(name)
+                if metric is None:
+                    continue
+                values = merged[name]
+                for key, value in samples:
+                    key = tuple(key)
+                    if metric.kind == 'histogram':
+                        current = values.get(key)
+                        values[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        values[key] = values.get(key, 0) + value
+        return merged
+
+    def render(self):
+        """Prometheus 文本格式"""
+        lines = []
+        collected = self.collect()
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key, value in sorted(collected.get(name, {}).items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.kind == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, value):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_labels(labels + [("le", _number(bound))])} {cumulative}')
+                    lines.append(f'{name}_bucket{_labels(labels + [("le", "+Inf")])} {value[-1]}')
+                    lines.append(f'{name}_sum{_labels(labels)} {_number(value[-2])}')
+                    lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+                else:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = [
+        (name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for name, value in pairs
+    ]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'http_requests_total', '按视图、方法和状态码统计的请求数', ['view', 'method', 'status']
+)
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', '按视图统计的请求耗时（秒）', ['view']
+)
+db_queries = registry.counter('db_queries_total', '按视图统计的SQL数量', ['view'])
+db_query_duration = registry.counter('db_query_duration_seconds_total', '按视图统计的数据库耗时（秒）', ['view'])
+cache_requests = registry.counter(
+    'cache_requests_total', '进程内缓存的读取次数，result 为 hit/miss', ['cache', 'result']
+)
+jwt_verifications = registry.counter(
+    'jwt_verifications_total', 'token验证次数，result 为 cached/verified/expired/invalid', ['result']
+)
+storage_requests = registry.counter(
+    'cloud_storage_requests_total', '对象存储请求数，result 为状态码或 error', ['operation', 'result']
+)
+storage_request_duration = registry.histogram(
+    'cloud_storage_request_duration_seconds', '对象存储请求耗时（秒，含重试）', ['operation']
+)
+media_store_writes = registry.counter(
+    'media_store_writes_total', '内容寻址文件的写入次数，result 为 stored/deduplicated', ['storage', 'result']
+)
+upload_jobs = registry.counter(
+    'upload_jobs_total', '后台上传任务的执行次数，result 为 succeeded/retried/failed', ['result']
+)
+
+def record_cache(cache, hit):
+    """记录一次缓存读取"""
+    cache_requests.inc(cache=cache, result='hit' if hit else 'miss')
@@ -0,0 +1,123 @@
+import jwt
+import logging
+import time
+from django.conf import settings
+from .auth_utils import authenticate_token, get_bearer_token
+from .metrics import (
+    db_queries, db_query_duration, http_request_duration, http_requests, metrics_settings, registry
+)
+from .query_budget import (
+    QueryBudgetExceeded, QueryRecorder, budget_settings, check_budget, endpoint_stats, get_budget
+)
+
+# 设置日志
+logger = logging.getLogger('log')
+
+class JWTAuthenticationMiddleware:
+    """
+    小程序接口的token认证中间件
+
+    每个请求只验证一次Authorization中的Bearer token，结果挂在请求上供视图使用：
+    request.principal 为验证通过的身份（未携带或验证失败时为None），
+    request.auth_error 为验证失败时的异常。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.principal = None
+        request.auth_error = None
+
+        token = get_bearer_token(request)
+        if token:
+            try:
+                request.principal = authenticate_token(token)
+            except jwt.InvalidTokenError as e:
+                logger.info(f"token验证失败 {request.path}: {str(e)}")
+                request.auth_error = e
+
+        return self.get_response(request)
+
+class MetricsMiddleware:
+    """
+    记录各视图的请求数、耗时和SQL负载（见 wxcloudrun.metrics）
+
+    放在 QueryBudgetMiddleware 之前，SQL统计取自其记录的 request.query_stats。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        # 未匹配到路由的请求统一记为 unmatched，避免任意路径产生大量标签
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        http_requests.inc(view=view, method=request.method, status=response.status_code)
+        http_request_duration.observe(duration, view=view)
+
+        query_stats = getattr(request, 'query_stats', None)
+        if query_stats is not None:
+            db_queries.inc(query_stats.count, view=view)
+            db_query_duration.inc(query_stats.duration, view=view)
+
+        # 按 FLUSH_INTERVAL 间隔写入多进程指标文件；磁盘已满或目录不可写时只记录错误，不影响请求
+        try:
+            registry.flush()
+        except Exception as e:
+            logger.error(f"写入监控指标文件出错: {str(e)}")
+        return response
+
+class QueryBudgetMiddleware:
+    """
+    统计每个请求的SQL数量和数据库耗时
+
+    同一SQL形状重复执行过多（N+1）或SQL数量超出视图预算（QUERY_BUDGET）时记录警告，
+    RAISE 开启时直接抛出异常；统计结果按视图定期汇总到日志，DEBUG 模式、内部地址或已登录的请求
+    同时写入 Server-Timing 响应头。request.query_stats 为本次请求的 QueryRecorder。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = budget_settings()
+        if not config.get('ENABLED', True):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        request.query_stats = recorder
+        start = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        # 未匹配到路由的请求统一记为 unmatched，随机路径不会让统计无限增长
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unmatched'
+        problems = check_budget(recorder, get_budget(view_name), config.get('MAX_REPEATED', 10))
+        endpoint_stats.add(view_name, recorder, bool(problems))
+
+        if config.get('SERVER_TIMING', True) and self._timing_allowed(request):
+            response['Server-Timing'] = (
+                f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+                f'total;dur={total * 1000:.1f}'
+            )
+
+        if problems:
+            message = f"{request.method} {request.path} ({view_name})：" + '；'.join(problems)
+            if config.get('RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def _timing_allowed(self, request):
+        """数据库耗时只返回给调试环境、内部地址和已登录的请求，不对公开请求暴露"""
+        if settings.DEBUG or request.META.get('REMOTE_ADDR') in metrics_settings().get('ALLOWED_IPS', []):
+            return True
+        user = getattr(request, 'user', None)
+        return getattr(request, 'principal', None) is not None or bool(user and user.is_authenticated)
@@ -0,0 +1,62 @@
+# Generated by Django 3.2.8 on 2026-10-17 10:12
+
+from collections import defaultdict
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_task_streaks(apps, schema_editor):
+    """根据已有完成记录初始化连续完成记录"""
+    from wxcloudrun.task_utils import summarize_streaks
+
+    Task = apps.get_model('wxcloudrun', 'Task')
+    TaskCompletion = apps.get_model('wxcloudrun', 'TaskCompletion')
+    TaskStreak = apps.get_model('wxcloudrun', 'TaskStreak')
+
+    periods = dict(Task.objects.values_list('id', 'period'))
+    completion_dates = defaultdict(list)
+    for task_id, player_id, completion_date in TaskCompletion.objects.filter(
+        verified=True
+    ).values_list('task_id', 'player_id', 'completion_date').iterator():
+        completion_dates[(task_id, player_id)].append(completion_date)
+
+    streaks = []
+    for (task_id, player_id), dates in completion_dates.items():
+        current_streak, longest_streak, last_date = summarize_streaks(periods[task_id], dates)
+        streaks.append(TaskStreak(
+            task_id=task_id,
+            player_id=player_id,
+            current_streak=current_streak,
+            longest_streak=longest_streak,
+            last_completion_date=last_date,
+        ))
+    TaskStreak.objects.bulk_create(streaks, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wxcloudrun', '0022_task_task_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStreak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('current_streak', models.PositiveIntegerField(default=0, verbose_name='当前连续次数')),
+                ('longest_streak', models.PositiveIntegerField(default=0, verbose_name='最长连续次数')),
+                ('last_completion_date', models.DateField(blank=True, null=True, verbose_name='最近完成日期')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_streaks', to='wxcloudrun.player', verbose_name='队员')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='streaks', to='wxcloudrun.task', verbose_name='关联任务')),
+            ],
+            options={
+                'verbose_name': '任务连续记录',
+                'verbose_name_plural': '任务连续记录',
+                'db_table': 'task_streak',
+                'unique_together': {('task', 'player')},
+            },
+        ),
+        migrations.RunPython(build_task_streaks, migrations.RunPython.noop),
+    ]
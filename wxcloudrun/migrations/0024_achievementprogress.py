@@ -0,0 +1,57 @@
+# Generated by Django 3.2.8 on 2026-10-17 14:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_progress_records(apps, schema_editor):
+    """将成就记录中未解锁的进度迁移到独立的进度表"""
+    PlayerAchievement = apps.get_model('wxcloudrun', 'PlayerAchievement')
+    AchievementProgress = apps.get_model('wxcloudrun', 'AchievementProgress')
+
+    in_progress = PlayerAchievement.objects.filter(progress__lt=100, awarded_by__isnull=True)
+    AchievementProgress.objects.bulk_create([
+        AchievementProgress(player_id=player_id, achievement_id=achievement_id, progress=progress)
+        for player_id, achievement_id, progress in in_progress.values_list('player_id', 'achievement_id', 'progress')
+    ], batch_size=1000)
+    in_progress.delete()
+
+
+def restore_progress_records(apps, schema_editor):
+    """回滚时将进度写回成就记录"""
+    PlayerAchievement = apps.get_model('wxcloudrun', 'PlayerAchievement')
+    AchievementProgress = apps.get_model('wxcloudrun', 'AchievementProgress')
+
+    PlayerAchievement.objects.bulk_create([
+        PlayerAchievement(player_id=player_id, achievement_id=achievement_id, progress=progress)
+        for player_id, achievement_id, progress in AchievementProgress.objects.values_list(
+            'player_id', 'achievement_id', 'progress'
+        )
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wxcloudrun', '0023_taskstreak'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AchievementProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('progress', models.IntegerField(default=0, verbose_name='完成进度')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('achievement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_records', to='wxcloudrun.personalachievement', verbose_name='成就')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='achievement_progress', to='wxcloudrun.player', verbose_name='队员')),
+            ],
+            options={
+                'verbose_name': '成就进度',
+                'verbose_name_plural': '成就进度',
+                'db_table': 'achievement_progress',
+                'unique_together': {('player', 'achievement')},
+            },
+        ),
+        migrations.RunPython(move_progress_records, restore_progress_records),
+    ]
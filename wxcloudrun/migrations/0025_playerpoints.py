@@ -0,0 +1,75 @@
+# Generated by Django 3.2.8 on 2026-10-17 16:05
+
+from collections import defaultdict
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def build_player_points(apps, schema_editor):
+    """根据已解锁的成就初始化队员积分"""
+    PersonalAchievement = apps.get_model('wxcloudrun', 'PersonalAchievement')
+    PlayerAchievement = apps.get_model('wxcloudrun', 'PlayerAchievement')
+    PlayerPoints = apps.get_model('wxcloudrun', 'PlayerPoints')
+
+    unlocked = PlayerAchievement.objects.filter(progress=100)
+    achievement_points = dict(
+        unlocked.values('player_id').order_by().annotate(points=Sum('achievement__points')).values_list('player_id', 'points')
+    )
+
+    series = {
+        series_id: (size, bonus)
+        for series_id, size, bonus in PersonalAchievement.objects.filter(
+            series__bonus_points__gt=0
+        ).values('series_id').order_by().annotate(size=Count('id')).values_list('series_id', 'size', 'series__bonus_points')
+    }
+    bonus_points = defaultdict(int)
+    for player_id, series_id, count in unlocked.filter(
+        achievement__series_id__in=series.keys()
+    ).values('player_id', 'achievement__series_id').order_by().annotate(
+        count=Count('achievement_id', distinct=True)
+    ).values_list('player_id', 'achievement__series_id', 'count'):
+        size, bonus = series[series_id]
+        if count >= size:
+            bonus_points[player_id] += bonus
+
+    rows = []
+    for player_id in set(achievement_points) | set(bonus_points):
+        points = achievement_points.get(player_id) or 0
+        bonus = bonus_points.get(player_id, 0)
+        if points + bonus > 0:
+            rows.append(PlayerPoints(
+                player_id=player_id,
+                achievement_points=points,
+                bonus_points=bonus,
+                total_points=points + bonus,
+            ))
+    PlayerPoints.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wxcloudrun', '0024_achievementprogress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerPoints',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('achievement_points', models.PositiveIntegerField(default=0, verbose_name='成就积分')),
+                ('bonus_points', models.PositiveIntegerField(default=0, verbose_name='系列奖励积分')),
+                ('total_points', models.PositiveIntegerField(db_index=True, default=0, verbose_name='总积分')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='points', to='wxcloudrun.player', verbose_name='队员')),
+            ],
+            options={
+                'verbose_name': '队员积分',
+                'verbose_name_plural': '队员积分',
+                'db_table': 'player_points',
+                'ordering': ['-total_points'],
+            },
+        ),
+        migrations.RunPython(build_player_points, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.8 on 2026-10-17 17:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('wxcloudrun', '0025_playerpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('player_import', '队员导入')], default='player_import', max_length=20, verbose_name='任务类型')),
+                ('status', models.CharField(choices=[('pending', '等待中'), ('running', '执行中'), ('succeeded', '已完成'), ('failed', '失败')], db_index=True, default='pending', max_length=20, verbose_name='状态')),
+                ('file_name', models.CharField(blank=True, max_length=255, verbose_name='文件名')),
+                ('file_path', models.CharField(blank=True, max_length=500, verbose_name='暂存路径')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='进度')),
+                ('message', models.CharField(blank=True, max_length=255, verbose_name='状态说明')),
+                ('result', models.TextField(blank=True, verbose_name='执行结果')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='结束时间')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='创建人')),
+            ],
+            options={
+                'verbose_name': '导入任务',
+                'verbose_name_plural': '导入任务',
+                'db_table': 'import_job',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.8 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wxcloudrun', '0026_importjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assessmentscore',
+            index=models.Index(fields=['player', 'score'], name='as_player_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='personalachievement',
+            index=models.Index(fields=['criteria_type', 'is_public'], name='pach_criteria_public_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playerachievement',
+            index=models.Index(fields=['player', 'progress'], name='pa_player_progress_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'start_date', 'end_date'], name='task_status_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskcompletion',
+            index=models.Index(fields=['task', 'player', 'completion_date', 'verified'], name='tc_task_player_date_ver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskcompletion',
+            index=models.Index(fields=['player', 'verified', 'task'], name='tc_player_verified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskcompletion',
+            index=models.Index(fields=['task', 'completion_date', 'verified'], name='tc_task_date_verified_idx'),
+        ),
+    ]
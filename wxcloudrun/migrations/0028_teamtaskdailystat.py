@@ -0,0 +1,40 @@
+# Generated by Django 3.2.8 on 2026-10-17 19:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wxcloudrun', '0027_completion_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamTaskDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('completed_count', models.PositiveIntegerField(default=0, verbose_name='提交人数')),
+                ('verified_count', models.PositiveIntegerField(default=0, verbose_name='已验证人数')),
+                ('pending_count', models.PositiveIntegerField(default=0, verbose_name='待验证人数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='wxcloudrun.task', verbose_name='任务')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='wxcloudrun.team', verbose_name='队伍')),
+            ],
+            options={
+                'verbose_name': '队伍每日任务统计',
+                'verbose_name_plural': '队伍每日任务统计',
+                'db_table': 'team_task_daily_stat',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='teamtaskdailystat',
+            index=models.Index(fields=['team', 'date'], name='team_daily_stat_date_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='teamtaskdailystat',
+            unique_together={('team', 'task', 'date')},
+        ),
+    ]
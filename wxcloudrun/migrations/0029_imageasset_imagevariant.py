@@ -0,0 +1,49 @@
+# Generated by Django 3.2.8 on 2026-10-17 19:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wxcloudrun', '0028_teamtaskdailystat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True, verbose_name='原图SHA-256')),
+                ('width', models.PositiveIntegerField(verbose_name='原图宽度')),
+                ('height', models.PositiveIntegerField(verbose_name='原图高度')),
+                ('has_alpha', models.BooleanField(default=False, verbose_name='是否透明')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '图片',
+                'verbose_name_plural': '图片',
+                'db_table': 'image_asset',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.PositiveSmallIntegerField(verbose_name='边长上限')),
+                ('format', models.CharField(max_length=10, verbose_name='格式')),
+                ('url', models.CharField(max_length=500, verbose_name='URL')),
+                ('width', models.PositiveIntegerField(verbose_name='宽度')),
+                ('height', models.PositiveIntegerField(verbose_name='高度')),
+                ('file_size', models.PositiveIntegerField(verbose_name='文件大小')),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='wxcloudrun.imageasset', verbose_name='图片')),
+            ],
+            options={
+                'verbose_name': '图片版本',
+                'verbose_name_plural': '图片版本',
+                'db_table': 'image_variant',
+                'unique_together': {('asset', 'size', 'format')},
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.8 on 2026-10-17 20:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('wxcloudrun', '0029_imageasset_imagevariant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', '等待中'), ('running', '上传中'), ('succeeded', '已完成'), ('failed', '失败')], db_index=True, default='pending', max_length=20, verbose_name='状态')),
+                ('file_name', models.CharField(blank=True, max_length=255, verbose_name='文件名')),
+                ('host', models.CharField(db_index=True, max_length=255, verbose_name='暂存文件所在实例')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='尝试次数')),
+                ('message', models.CharField(blank=True, max_length=255, verbose_name='状态说明')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='结束时间')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='创建人')),
+            ],
+            options={
+                'verbose_name': '上传任务',
+                'verbose_name_plural': '上传任务',
+                'db_table': 'upload_job',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UploadJobFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=500, verbose_name='对象键')),
+                ('content_type', models.CharField(max_length=100, verbose_name='文件类型')),
+                ('local_url', models.CharField(db_index=True, max_length=500, verbose_name='临时地址')),
+                ('final_url', models.CharField(blank=True, max_length=500, verbose_name='正式地址')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='files', to='wxcloudrun.uploadjob', verbose_name='上传任务')),
+            ],
+            options={
+                'verbose_name': '上传文件',
+                'verbose_name_plural': '上传文件',
+                'db_table': 'upload_job_file',
+            },
+        ),
+    ]
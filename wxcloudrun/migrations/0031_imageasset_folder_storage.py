@@ -0,0 +1,59 @@
+# Generated by Django 3.2.8 on 2026-10-17 22:10
+
+from urllib.parse import urlparse
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_location(apps, schema_editor):
+    """根据已有版本的地址补充图片的存储位置和目录"""
+    ImageAsset = apps.get_model('wxcloudrun', 'ImageAsset')
+    ImageVariant = apps.get_model('wxcloudrun', 'ImageVariant')
+
+    first_urls = {}
+    for asset_id, url in ImageVariant.objects.order_by('id').values_list('asset_id', 'url'):
+        first_urls.setdefault(asset_id, url)
+
+    for asset in ImageAsset.objects.filter(id__in=first_urls.keys()):
+        url = first_urls[asset.id]
+        if url.startswith(settings.MEDIA_URL):
+            asset.storage = 'local'
+            path = url[len(settings.MEDIA_URL):]
+        else:
+            asset.storage = 'cloud'
+            path = urlparse(url).path.lstrip('/')
+        # <目录>/<哈希前两位>/<文件名>
+        parts = path.rsplit('/', 2)
+        if len(parts) == 3 and parts[0]:
+            asset.folder = parts[0]
+        asset.save(update_fields=['storage', 'folder'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wxcloudrun', '0030_uploadjob_uploadjobfile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageasset',
+            name='folder',
+            field=models.CharField(default='images', max_length=100, verbose_name='存储目录'),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='storage',
+            field=models.CharField(choices=[('local', '本地'), ('cloud', '对象存储')], default='local', max_length=10, verbose_name='存储位置'),
+        ),
+        migrations.RunPython(fill_location, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='imageasset',
+            name='content_hash',
+            field=models.CharField(db_index=True, max_length=64, verbose_name='原图SHA-256'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='imageasset',
+            unique_together={('content_hash', 'folder', 'storage')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.8 on 2026-10-17 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wxcloudrun', '0031_imageasset_folder_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadjob',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='租约到期时间'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wxcloudrun', '0032_uploadjob_lease_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='租约到期时间'),
+        ),
+    ]
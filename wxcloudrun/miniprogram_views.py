@@ -3,6 +3,9 @@ from django.contrib.auth import authenticate
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from .models import Parent, Coach, School, EnrollmentYear, Player
+from .auth_utils import require_principal, get_owned_player_ids, parent_owns_player
+from django.db.models import Count
+from .reference_data import reference_data_response
 import json
 import jwt
 from datetime import datetime, timedelta
@@ -17,6 +20,12 @@ def generate_token(user_id, user_type):
     }
     return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
 
+def _get_owned_players(parent_id):
+    """家长绑定的队员（一次查询，含学校和入学年份）"""
+    return Player.objects.filter(
+        id__in=get_owned_player_ids(parent_id)
+    ).select_related('school', 'enrollment_year').order_by('id')
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def parent_register(request):
@@ -95,17 +104,8 @@ def parent_register(request):
 @require_http_methods(["GET"])
 def get_schools(request):
     try:
-        schools = School.objects.all()
-        school_list = [{
-            'id': school.id,
-            'name': school.name
-        } for school in schools]
-
-        return JsonResponse({
-            'code': 200,
-            'message': '获取成功',
-            'data': school_list
-        })
+        # 序列化结果按数据版本缓存，客户端携带 If-None-Match 时可直接返回304
+        return reference_data_response(request, 'schools')
     except Exception as e:
         return JsonResponse({
             'code': 500,
@@ -116,17 +116,8 @@ def get_schools(request):
 @require_http_methods(["GET"])
 def get_enrollment_years(request):
     try:
-        years = EnrollmentYear.objects.all()
-        year_list = [{
-            'id': year.id,
-            'year': year.year
-        } for year in years]
-
-        return JsonResponse({
-            'code': 200,
-            'message': '获取成功',
-            'data': year_list
-        })
+        # 序列化结果按数据版本缓存，客户端携带 If-None-Match 时可直接返回304
+        return reference_data_response(request, 'enrollment_years')
     except Exception as e:
         return JsonResponse({
             'code': 500,
@@ -136,23 +127,9 @@ def get_enrollment_years(request):
 def search_players(request):
     try:
         # 验证token
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return JsonResponse({
-                'code': 401,
-                'message': '未登录'
-            }, status=401)
-
-        # 解析token
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            if payload.get('user_type') != 'parent':
-                raise jwt.InvalidTokenError
-        except jwt.InvalidTokenError:
-            return JsonResponse({
-                'code': 401,
-                'message': '无效的token'
-            }, status=401)
+        principal, error_response = require_principal(request, 'parent')
+        if error_response:
+            return error_response
 
         # 获取请求数据
         name = request.GET.get('name', '')
@@ -197,24 +174,10 @@ def search_players(request):
 def unbind_player(request):
     try:
         # 验证token
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return JsonResponse({
-                'code': 401,
-                'message': '未登录'
-            }, status=401)
-
-        # 解析token
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            if payload.get('user_type') != 'parent':
-                raise jwt.InvalidTokenError
-            parent_id = payload.get('user_id')
-        except jwt.InvalidTokenError:
-            return JsonResponse({
-                'code': 401,
-                'message': '无效的token'
-            }, status=401)
+        principal, error_response = require_principal(request, 'parent')
+        if error_response:
+            return error_response
+        parent_id = principal.user_id
 
         # 获取请求数据
         data = json.loads(request.body)
@@ -227,19 +190,17 @@ def unbind_player(request):
             }, status=400)
 
         try:
-            # 获取家长和队员
-            parent = Parent.objects.get(id=parent_id)
-            player = Player.objects.get(id=player_id)
-
             # 检查队员是否属于当前家长
-            if parent not in player.parents.all():
+            if not parent_owns_player(parent_id, player_id):
+                if not Player.objects.filter(id=player_id).exists():
+                    raise Player.DoesNotExist
                 return JsonResponse({
                     'code': 403,
                     'message': '无权解绑该队员'
                 }, status=403)
 
-            # 解绑队员
-            player.parents.remove(parent)
+            # 解绑队员（触发 m2m_changed，使绑定关系缓存失效）
+            Parent(id=parent_id).players.remove(player_id)
 
             # 获取更新后的家长信息
             players = [{
@@ -247,7 +208,7 @@ def unbind_player(request):
                 'name': p.name,
                 'school': p.school.name,
                 'enrollment_year': p.enrollment_year.year
-            } for p in parent.players.all()]
+            } for p in _get_owned_players(parent_id)]
 
             return JsonResponse({
                 'code': 200,
@@ -257,11 +218,6 @@ def unbind_player(request):
                 }
             })
 
-        except Parent.DoesNotExist:
-            return JsonResponse({
-                'code': 404,
-                'message': '家长不存在'
-            }, status=404)
         except Player.DoesNotExist:
             return JsonResponse({
                 'code': 404,
@@ -284,24 +240,10 @@ def unbind_player(request):
 def bind_player(request):
     try:
         # 验证token
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return JsonResponse({
-                'code': 401,
-                'message': '未登录'
-            }, status=401)
-
-        # 解析token
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            if payload.get('user_type') != 'parent':
-                raise jwt.InvalidTokenError
-            parent_id = payload.get('user_id')
-        except jwt.InvalidTokenError:
-            return JsonResponse({
-                'code': 401,
-                'message': '无效的token'
-            }, status=401)
+        principal, error_response = require_principal(request, 'parent')
+        if error_response:
+            return error_response
+        parent_id = principal.user_id
 
         # 获取请求数据
         data = json.loads(request.body)
@@ -314,26 +256,26 @@ def bind_player(request):
             }, status=400)
 
         try:
-            # 获取家长和队员
+            # 获取家长和队员（含已绑定的家长数量）
             parent = Parent.objects.get(id=parent_id)
-            player = Player.objects.get(id=player_id)
+            player = Player.objects.annotate(parent_count=Count('parents')).get(id=player_id)
 
             # 检查家长已绑定的队员数量
-            if parent.players.count() >= 3:
+            if len(get_owned_player_ids(parent_id)) >= 3:
                 return JsonResponse({
                     'code': 400,
                     'message': '每位家长最多只能绑定3个队员'
                 }, status=400)
 
             # 检查队员已绑定的家长数量
-            if player.parents.count() >= 6:
+            if player.parent_count >= 6:
                 return JsonResponse({
                     'code': 400,
                     'message': '每位队员最多可以被6位家长绑定'
                 }, status=400)
 
-            # 绑定队员
-            player.parents.add(parent)
+            # 绑定队员（触发 m2m_changed，使绑定关系缓存失效）
+            parent.players.add(player)
 
             # 获取更新后的家长信息
             players = [{
@@ -341,7 +283,7 @@ def bind_player(request):
                 'name': p.name,
                 'school': p.school.name,
                 'enrollment_year': p.enrollment_year.year
-            } for p in parent.players.all()]
+            } for p in _get_owned_players(parent_id)]
 
             return JsonResponse({
                 'code': 200,
@@ -514,17 +456,12 @@ def coach_login(request):
 def parent_dashboard(request):
     try:
         # 验证token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return JsonResponse({'code': 401, 'message': '未提供有效凭证'}, status=401)
-        
-        token = auth_header.split(' ')[1]
-        payload = verify_token(token)
-        if not payload or payload.get('type') != 'parent':
+        principal = request.principal
+        if not principal or not principal.is_parent:
             return JsonResponse({'code': 403, 'message': '无访问权限'}, status=403)
 
         # 获取家长信息
-        parent = Parent.objects.get(id=payload['user_id'])
+        parent = Parent.objects.get(id=principal.user_id)
         
         # 获取关联队员的最新训练数据
         players_data = []
@@ -560,24 +497,10 @@ def parent_dashboard(request):
 def add_player(request):
     try:
         # 验证token
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return JsonResponse({
-                'code': 401,
-                'message': '未登录'
-            }, status=401)
-
-        # 解析token
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            if payload.get('user_type') != 'parent':
-                raise jwt.InvalidTokenError
-            parent_id = payload.get('user_id')
-        except jwt.InvalidTokenError:
-            return JsonResponse({
-                'code': 401,
-                'message': '无效的token'
-            }, status=401)
+        principal, error_response = require_principal(request, 'parent')
+        if error_response:
+            return error_response
+        parent_id = principal.user_id
 
         # 获取请求数据
         data = json.loads(request.body)
@@ -659,24 +582,10 @@ def add_player(request):
 def update_player(request):
     try:
         # 验证token
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return JsonResponse({
-                'code': 401,
-                'message': '未登录'
-            }, status=401)
-
-        # 解析token
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            if payload.get('user_type') != 'parent':
-                raise jwt.InvalidTokenError
-            parent_id = payload.get('user_id')
-        except jwt.InvalidTokenError:
-            return JsonResponse({
-                'code': 401,
-                'message': '无效的token'
-            }, status=401)
+        principal, error_response = require_principal(request, 'parent')
+        if error_response:
+            return error_response
+        parent_id = principal.user_id
 
         # 获取请求数据
         data = json.loads(request.body)
@@ -707,17 +616,17 @@ def update_player(request):
             }, status=400)
 
         try:
-            # 获取家长和队员
-            parent = Parent.objects.get(id=parent_id)
-            player = Player.objects.get(id=player_id)
-            
             # 验证权限：检查队员是否属于当前家长
-            if parent not in player.parents.all():
+            if not parent_owns_player(parent_id, player_id):
+                if not Player.objects.filter(id=player_id).exists():
+                    raise Player.DoesNotExist
                 return JsonResponse({
                     'code': 403,
                     'message': '您没有权限更新该队员信息'
                 }, status=403)
             
+            player = Player.objects.select_related('school', 'enrollment_year').get(id=player_id)
+            
             # 更新字段
             if 'name' in fields_to_update:
                 player.name = fields_to_update['name']
@@ -763,8 +672,8 @@ def update_player(request):
                 'avatar_url': player.avatar
             }
             
-            # 直接从数据库重新查询所有关联的队员
-            all_players = Player.objects.filter(parents=parent)
+            # 家长绑定的全部队员
+            all_players = _get_owned_players(parent_id)
             
             players = [{
                 'id': p.id,
@@ -784,11 +693,6 @@ def update_player(request):
                 }
             })
 
-        except Parent.DoesNotExist:
-            return JsonResponse({
-                'code': 404,
-                'message': '家长信息不存在'
-            }, status=404)
         except Player.DoesNotExist:
             return JsonResponse({
                 'code': 404,
@@ -812,47 +716,20 @@ def parent_logout(request):
     """家长退出登录的接口"""
     try:
         # 验证token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return JsonResponse({
-                'code': 401,
-                'message': '无效的token格式'
-            }, status=401)
+        principal, error_response = require_principal(request, 'parent')
+        if error_response:
+            return error_response
         
-        token = auth_header.split(' ')[1]
+        # 注意: 由于使用JWT，服务端实际上不需要额外操作来使token失效
+        # JWT的登出主要靠客户端删除存储的token
         
-        try:
-            # 解码token - 修改这里使用与其他函数相同的SECRET_KEY
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            
-            # 验证用户类型
-            if payload.get('user_type') != 'parent':
-                return JsonResponse({
-                    'code': 401,
-                    'message': '用户类型错误'
-                }, status=401)
-            
-            # 注意: 由于使用JWT，服务端实际上不需要额外操作来使token失效
-            # JWT的登出主要靠客户端删除存储的token
-            
-            return JsonResponse({
-                'code': 200,
-                'message': '退出成功'
-            })
-            
-        except jwt.ExpiredSignatureError:
-            return JsonResponse({
-                'code': 401,
-                'message': 'token已过期'
-            }, status=401)
-        except jwt.InvalidTokenError:
-            return JsonResponse({
-                'code': 401,
-                'message': '无效的token'
-            }, status=401)
+        return JsonResponse({
+            'code': 200,
+            'message': '退出成功'
+        })
             
     except Exception as e:
         return JsonResponse({
             'code': 500,
             'message': f'服务器错误: {str(e)}'
-        }, status=500)
\ No newline at end of file
+        }, status=500)
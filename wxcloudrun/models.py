@@ -206,6 +206,10 @@ class Task(models.Model):
         db_table = 'task'
         verbose_name = '任务'
         verbose_name_plural = '任务'
+        indexes = [
+            # 活跃任务查询：status + 开始/结束日期范围
+            models.Index(fields=['status', 'start_date', 'end_date'], name='task_status_dates_idx'),
+        ]
         
     def __str__(self):
         return self.title
@@ -232,47 +236,8 @@ class Task(models.Model):
         
     def get_task_streak(self, player):
         """获取指定队员的连续完成天数"""
-        if self.period == 'once':
-            # 一次性任务没有连续概念
-            completion = self.taskcompletion_set.filter(player=player, verified=True).first()
-            return 1 if completion else 0
-            
-        # 查询队员最近的完成记录，按日期倒序排列
-        completions = self.taskcompletion_set.filter(
-            player=player,
-            verified=True
-        ).order_by('-completion_date')
-        
-        if not completions:
-            return 0
-            
-        streak = 0
-        last_date = None
-        
-        for completion in completions:
-            current_date = completion.completion_date
-            
-            # 第一次循环，初始化last_date
-            if last_date is None:
-                last_date = current_date
-                streak = 1
-                continue
-                
-            # 检查日期是否连续
-            date_diff = (last_date - current_date).days
-            
-            if self.period == 'daily' and date_diff == 1:
-                streak += 1
-            elif self.period == 'weekly' and date_diff <= 7 and current_date.weekday() == last_date.weekday():
-                streak += 1
-            elif self.period == 'monthly' and current_date.month == (last_date.month - 1) % 12:
-                streak += 1
-            else:
-                break
-                
-            last_date = current_date
-            
-        return streak
+        current_streak = self.streaks.filter(player=player).values_list('current_streak', flat=True).first()
+        return current_streak or 0
 
 class TaskCompletion(models.Model):
     """任务完成记录"""
@@ -292,10 +257,58 @@ class TaskCompletion(models.Model):
         verbose_name_plural = '任务完成记录'
         unique_together = ['task', 'player', 'completion_date']
         ordering = ['-completion_date']
+        indexes = [
+            # 队员某任务（某天）是否已验证完成，查询只需读索引
+            models.Index(fields=['task', 'player', 'completion_date', 'verified'], name='tc_task_player_date_ver_idx'),
+            # 按队员统计已验证完成的不同任务
+            models.Index(fields=['player', 'verified', 'task'], name='tc_player_verified_idx'),
+            # 按任务统计某天已验证完成的队员
+            models.Index(fields=['task', 'completion_date', 'verified'], name='tc_task_date_verified_idx'),
+        ]
     
     def __str__(self):
         return f"{self.player.name} - {self.task.title} - {self.completion_date}"
 
+class TaskStreak(models.Model):
+    """任务连续完成记录（按任务和队员维护，随完成记录增量更新）"""
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='streaks', verbose_name='关联任务')
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='task_streaks', verbose_name='队员')
+    current_streak = models.PositiveIntegerField(default=0, verbose_name='当前连续次数')
+    longest_streak = models.PositiveIntegerField(default=0, verbose_name='最长连续次数')
+    last_completion_date = models.DateField(null=True, blank=True, verbose_name='最近完成日期')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'task_streak'
+        verbose_name = '任务连续记录'
+        verbose_name_plural = '任务连续记录'
+        unique_together = ['task', 'player']
+
+    def __str__(self):
+        return f"{self.player.name} - {self.task.title} - {self.current_streak}"
+
+class TeamTaskDailyStat(models.Model):
+    """队伍每日任务完成汇总（按队伍、任务、日期维护，随完成记录增量更新）"""
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='daily_stats', verbose_name='队伍')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='daily_stats', verbose_name='任务')
+    date = models.DateField(verbose_name='日期')
+    completed_count = models.PositiveIntegerField(default=0, verbose_name='提交人数')
+    verified_count = models.PositiveIntegerField(default=0, verbose_name='已验证人数')
+    pending_count = models.PositiveIntegerField(default=0, verbose_name='待验证人数')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'team_task_daily_stat'
+        verbose_name = '队伍每日任务统计'
+        verbose_name_plural = '队伍每日任务统计'
+        unique_together = ['team', 'task', 'date']
+        indexes = [
+            models.Index(fields=['team', 'date'], name='team_daily_stat_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.team.name} - {self.task.title} - {self.date}"
+
 class Assessment(models.Model):
     """考核模型"""
     name = models.CharField(max_length=100, verbose_name='考核名称')
@@ -352,6 +365,10 @@ class AssessmentScore(models.Model):
         verbose_name_plural = '考核成绩'
         ordering = ['assessment', 'player', 'assessment_item']
         unique_together = ['assessment', 'assessment_item', 'player']
+        indexes = [
+            # 按队员汇总成绩（平均分、最高/最低分），查询只需读索引
+            models.Index(fields=['player', 'score'], name='as_player_score_idx'),
+        ]
 
 # 成就管理模块 - 优化版
 class AchievementCategory(models.Model):
@@ -479,6 +496,10 @@ class PersonalAchievement(models.Model):
         verbose_name = '个人成就'
         verbose_name_plural = '个人成就'
         ordering = ['category', 'difficulty', '-rarity', 'name']
+        indexes = [
+            # 加载自动成就规则
+            models.Index(fields=['criteria_type', 'is_public'], name='pach_criteria_public_idx'),
+        ]
         
     def __str__(self):
         return self.name
@@ -541,6 +562,9 @@ class PlayerAchievement(models.Model):
         verbose_name_plural = '队员成就记录'
         ordering = ['-awarded_date']
         unique_together = ['player', 'achievement'] # 一个队员只能获得同一个成就一次
+        indexes = [
+            models.Index(fields=['player', 'progress'], name='pa_player_progress_idx'),
+        ]
         
     def __str__(self):
         return f"{self.player.name} - {self.achievement.name}"
@@ -551,6 +575,39 @@ class PlayerAchievement(models.Model):
         self.save()
         return True
 
+class AchievementProgress(models.Model):
+    """队员自动成就的进度（未解锁部分，与已解锁的成就记录分开存储）"""
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='achievement_progress', verbose_name='队员')
+    achievement = models.ForeignKey(PersonalAchievement, on_delete=models.CASCADE, related_name='progress_records', verbose_name='成就')
+    progress = models.IntegerField(default=0, verbose_name='完成进度')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        db_table = 'achievement_progress'
+        verbose_name = '成就进度'
+        verbose_name_plural = '成就进度'
+        unique_together = ['player', 'achievement']
+        
+    def __str__(self):
+        return f"{self.player.name} - {self.achievement.name} - {self.progress}%"
+
+class PlayerPoints(models.Model):
+    """队员成就积分（排行榜物化表，随成就解锁增量更新）"""
+    player = models.OneToOneField(Player, on_delete=models.CASCADE, related_name='points', verbose_name='队员')
+    achievement_points = models.PositiveIntegerField(default=0, verbose_name='成就积分')
+    bonus_points = models.PositiveIntegerField(default=0, verbose_name='系列奖励积分')
+    total_points = models.PositiveIntegerField(default=0, db_index=True, verbose_name='总积分')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        db_table = 'player_points'
+        verbose_name = '队员积分'
+        verbose_name_plural = '队员积分'
+        ordering = ['-total_points']
+        
+    def __str__(self):
+        return f"{self.player.name} - {self.total_points}"
+
 class TeamAchievement(models.Model):
     """队伍成就"""
     team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='achievements', verbose_name='队伍')
@@ -573,3 +630,132 @@ class TeamAchievement(models.Model):
         
     def __str__(self):
         return f"{self.team.name} - {self.name}"
+
+class ImportJob(models.Model):
+    """后台导入任务"""
+    KIND_CHOICES = [
+        ('player_import', '队员导入'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', '等待中'),
+        ('running', '执行中'),
+        ('succeeded', '已完成'),
+        ('failed', '失败'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='player_import', verbose_name='任务类型')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name='状态')
+    file_name = models.CharField(max_length=255, blank=True, verbose_name='文件名')
+    file_path = models.CharField(max_length=500, blank=True, verbose_name='暂存路径')
+    lease_until = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='租约到期时间')
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name='进度')
+    message = models.CharField(max_length=255, blank=True, verbose_name='状态说明')
+    result = models.TextField(blank=True, verbose_name='执行结果')  # JSON格式
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='创建人')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='结束时间')
+    
+    class Meta:
+        db_table = 'import_job'
+        verbose_name = '导入任务'
+        verbose_name_plural = '导入任务'
+        ordering = ['-created_at']
+        
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.file_name}"
+    
+    def get_result(self):
+        """获取执行结果"""
+        try:
+            return json.loads(self.result) if self.result else {}
+        except json.JSONDecodeError:
+            return {}
+
+class ImageAsset(models.Model):
+    """经过处理的上传图片（同一存储、目录下按原图内容哈希去重）"""
+    STORAGE_CHOICES = [
+        ('local', '本地'),
+        ('cloud', '对象存储'),
+    ]
+
+    content_hash = models.CharField(max_length=64, db_index=True, verbose_name='原图SHA-256')
+    folder = models.CharField(max_length=100, default='images', verbose_name='存储目录')
+    storage = models.CharField(max_length=10, choices=STORAGE_CHOICES, default='local', verbose_name='存储位置')
+    width = models.PositiveIntegerField(verbose_name='原图宽度')
+    height = models.PositiveIntegerField(verbose_name='原图高度')
+    has_alpha = models.BooleanField(default=False, verbose_name='是否透明')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        db_table = 'image_asset'
+        verbose_name = '图片'
+        verbose_name_plural = '图片'
+        unique_together = ['content_hash', 'folder', 'storage']
+
+    def __str__(self):
+        return self.content_hash
+
+class ImageVariant(models.Model):
+    """图片的各尺寸、格式版本"""
+    asset = models.ForeignKey(ImageAsset, on_delete=models.CASCADE, related_name='variants', verbose_name='图片')
+    size = models.PositiveSmallIntegerField(verbose_name='边长上限')
+    format = models.CharField(max_length=10, verbose_name='格式')
+    url = models.CharField(max_length=500, verbose_name='URL')
+    width = models.PositiveIntegerField(verbose_name='宽度')
+    height = models.PositiveIntegerField(verbose_name='高度')
+    file_size = models.PositiveIntegerField(verbose_name='文件大小')
+
+    class Meta:
+        db_table = 'image_variant'
+        verbose_name = '图片版本'
+        verbose_name_plural = '图片版本'
+        unique_together = ['asset', 'size', 'format']
+
+    def __str__(self):
+        return f"{self.asset_id} - {self.size} - {self.format}"
+
+class UploadJob(models.Model):
+    """后台上传任务：文件先保存到本地并返回临时地址，再由后台线程上传到对象存储"""
+    STATUS_CHOICES = [
+        ('pending', '等待中'),
+        ('running', '上传中'),
+        ('succeeded', '已完成'),
+        ('failed', '失败'),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name='状态')
+    file_name = models.CharField(max_length=255, blank=True, verbose_name='文件名')
+    host = models.CharField(max_length=255, db_index=True, verbose_name='暂存文件所在实例')
+    lease_until = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='租约到期时间')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='尝试次数')
+    message = models.CharField(max_length=255, blank=True, verbose_name='状态说明')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='创建人')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='结束时间')
+
+    class Meta:
+        db_table = 'upload_job'
+        verbose_name = '上传任务'
+        verbose_name_plural = '上传任务'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.file_name} - {self.get_status_display()}"
+
+class UploadJobFile(models.Model):
+    """上传任务中的单个文件（处理后的图片有多个版本）"""
+    job = models.ForeignKey(UploadJob, on_delete=models.CASCADE, related_name='files', verbose_name='上传任务')
+    key = models.CharField(max_length=500, verbose_name='对象键')
+    content_type = models.CharField(max_length=100, verbose_name='文件类型')
+    local_url = models.CharField(max_length=500, db_index=True, verbose_name='临时地址')
+    final_url = models.CharField(max_length=500, blank=True, verbose_name='正式地址')
+
+    class Meta:
+        db_table = 'upload_job_file'
+        verbose_name = '上传文件'
+        verbose_name_plural = '上传文件'
+
+    def __str__(self):
+        return self.key
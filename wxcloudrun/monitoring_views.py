@@ -0,0 +1,44 @@
+import hmac
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_http_methods
+from django.views.decorators.csrf import csrf_exempt
+from .auth_utils import get_bearer_token
+from .metrics import metrics_settings, registry
+import logging
+
+# 设置日志
+logger = logging.getLogger('log')
+
+@csrf_exempt
+@require_http_methods(["GET", "HEAD"])
+def health(request):
+    """存活检查：进程能处理请求即返回200，不访问数据库"""
+    return JsonResponse({'code': 200, 'message': 'ok'})
+
+@csrf_exempt
+@require_http_methods(["GET", "HEAD"])
+def health_ready(request):
+    """就绪检查：数据库可用时返回200，否则返回503"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception as e:
+        logger.error(f"就绪检查失败：数据库不可用 {str(e)}")
+        return JsonResponse({'code': 503, 'message': '数据库不可用'}, status=503)
+    return JsonResponse({'code': 200, 'message': 'ok'})
+
+def _metrics_allowed(request):
+    token = metrics_settings().get('TOKEN')
+    if token:
+        return hmac.compare_digest(get_bearer_token(request) or '', token)
+    return request.META.get('REMOTE_ADDR') in metrics_settings().get('ALLOWED_IPS', [])
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def metrics(request):
+    """Prometheus 文本格式的监控指标（内部接口）"""
+    if not _metrics_allowed(request):
+        return JsonResponse({'code': 403, 'message': '无权访问'}, status=403)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,244 @@
+import logging
+from collections import defaultdict, deque
+from django.db import connection, transaction
+from django.db.models import Max
+from .models import EnrollmentYear, Parent, Player, School
+from .auth_utils import invalidate_owned_players
+
+# 设置日志
+logger = logging.getLogger('log')
+
+REQUIRED_COLUMNS = ['队员姓名', '学校', '入学年份', '家长姓名', '家长电话']
+
+# 单条 IN 查询的参数数量上限（兼容 SQLite 的变量个数限制）
+QUERY_BATCH_SIZE = 900
+
+class PlayerImportResult:
+    """Excel队员导入结果"""
+
+    def __init__(self, total_rows=0):
+        self.total_rows = total_rows
+        self.players_created = 0
+        self.parents_created = 0
+        # [(Excel行号, 错误信息)]
+        self.errors = []
+
+    @property
+    def success(self):
+        return not self.errors
+
+def _batches(items, size=QUERY_BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _clean_text(series):
+    """去除首尾空白，空值和空字符串均视为缺失"""
+    text = series.astype(str).str.strip()
+    return text.where(series.notna() & (text != ''))
+
+def _clean_phone(series):
+    """手机号规范为字符串：Excel中的数字列会被读成整数或浮点数（如 13800000000.0）"""
+    import pandas as pd
+    text = _clean_text(series)
+    numeric = pd.to_numeric(series, errors='coerce')
+    integral = numeric.notna() & (numeric == numeric.round())
+    return text.mask(integral, numeric[integral].astype('int64').astype(str))
+
+def read_player_sheet(excel_file):
+    """读取Excel并检查必要的列"""
+    # pandas 导入耗时且占用内存较多，只在导入Excel时加载
+    import pandas as pd
+    df = pd.read_excel(excel_file)
+    for col in REQUIRED_COLUMNS:
+        if col not in df.columns:
+            raise ValueError(f'Excel文件缺少必要的列：{col}')
+    return df.reset_index(drop=True)
+
+def validate_player_sheet(df):
+    """
+    校验整张表并转换为可直接写入的数据
+
+    Returns:
+        tuple: (整理后的DataFrame, [(Excel行号, 错误信息)])
+    """
+    import pandas as pd
+
+    rows = pd.DataFrame(index=df.index)
+    rows['name'] = _clean_text(df['队员姓名'])
+    rows['school'] = _clean_text(df['学校'])
+    rows['parent_name'] = _clean_text(df['家长姓名'])
+    rows['phone'] = _clean_phone(df['家长电话'])
+    rows['notes'] = _clean_text(df['备注']).fillna('') if '备注' in df.columns else ''
+
+    years = pd.to_numeric(df['入学年份'], errors='coerce')
+    valid_years = years.notna() & (years == years.round())
+    rows['year'] = years.where(valid_years)
+
+    # 学校和入学年份一次性取出，按名称/年份映射为ID
+    schools = dict(School.objects.values_list('name', 'id'))
+    enrollment_years = dict(EnrollmentYear.objects.values_list('year', 'id'))
+    rows['school_id'] = rows['school'].map(schools)
+    rows['enrollment_year_id'] = rows['year'].map(lambda year: enrollment_years.get(int(year)) if pd.notna(year) else None)
+
+    errors = []
+
+    def flag(mask, message):
+        for index in rows.index[mask]:
+            errors.append((index + 2, message(index)))
+
+    flag(rows['name'].isna(), lambda i: '队员姓名不能为空')
+    flag(rows['name'].str.len() > 50, lambda i: f'队员姓名过长：{rows.at[i, "name"]}')
+    flag(rows['school'].isna(), lambda i: '学校不能为空')
+    flag(rows['school'].notna() & rows['school_id'].isna(),
+         lambda i: f'学校 "{rows.at[i, "school"]}" 不存在，请先在系统中添加该学校')
+    flag(df['入学年份'].isna(), lambda i: '入学年份不能为空')
+    flag(df['入学年份'].notna() & ~valid_years, lambda i: f'入学年份格式不正确：{df.at[i, "入学年份"]}')
+    flag(valid_years & rows['enrollment_year_id'].isna(),
+         lambda i: f'入学年份 {int(rows.at[i, "year"])} 不存在，请先在系统中添加该年份')
+    flag(rows['phone'].str.len() > 20, lambda i: f'家长电话过长：{rows.at[i, "phone"]}')
+    flag(rows['parent_name'].str.len() > 50, lambda i: f'家长姓名过长：{rows.at[i, "parent_name"]}')
+
+    errors.sort(key=lambda error: error[0])
+    return rows, errors
+
+def _upsert_parents(rows):
+    """
+    按手机号批量创建家长，已有家长只补全空白的姓名
+
+    Returns:
+        tuple: ({手机号: 家长ID}, 新建家长数量)
+    """
+    import pandas as pd
+
+    parent_rows = rows[rows['phone'].notna()]
+    # 同一手机号取第一个非空的家长姓名
+    names = parent_rows.groupby('phone', sort=False)['parent_name'].first()
+
+    existing = {}
+    for phones in _batches(names.index):
+        existing.update({parent.phone: parent for parent in Parent.objects.filter(phone__in=phones)})
+
+    new_parents = []
+    named_parents = []
+    for phone, name in names.items():
+        name = name if pd.notna(name) else ''
+        parent = existing.get(phone)
+        if parent is None:
+            new_parents.append(Parent(phone=phone, name=name))
+        elif not parent.name and name:
+            parent.name = name
+            named_parents.append(parent)
+
+    Parent.objects.bulk_create(new_parents, batch_size=1000)
+    if named_parents:
+        Parent.objects.bulk_update(named_parents, ['name'], batch_size=1000)
+
+    parent_ids = {}
+    for phones in _batches(names.index):
+        parent_ids.update(Parent.objects.filter(phone__in=phones).values_list('phone', 'id'))
+    return parent_ids, len(new_parents)
+
+def _assign_player_ids(players, after_id):
+    """
+    为批量插入的队员补全主键
+
+    MySQL 的批量插入不返回主键，按插入顺序回查本次新建的记录，
+    以 (姓名, 学校, 入学年份) 对应到插入的对象上。
+    """
+    pending = defaultdict(deque)
+    for player in players:
+        pending[(player.name, player.school_id, player.enrollment_year_id)].append(player)
+
+    created = Player.objects.filter(id__gt=after_id).order_by('id').values_list(
+        'id', 'name', 'school_id', 'enrollment_year_id'
+    )
+    for player_id, name, school_id, year_id in created.iterator(chunk_size=2000):
+        queue = pending.get((name, school_id, year_id))
+        if queue:
+            queue.popleft().id = player_id
+
+    if any(queue for queue in pending.values()):
+        raise RuntimeError('无法确认新建队员的ID，导入已取消')
+
+def _report(progress, percent, message):
+    if progress is not None:
+        progress(percent, message)
+
+def import_player_rows(rows, progress=None):
+    """
+    在一个事务中写入校验通过的队员数据
+
+    Args:
+        rows: validate_player_sheet 整理后的数据
+        progress: 进度回调 progress(百分比, 说明)
+
+    Returns:
+        tuple: (新建队员数量, 新建家长数量)
+    """
+    import pandas as pd
+
+    with transaction.atomic():
+        parent_ids, parents_created = _upsert_parents(rows)
+        _report(progress, 40, '家长信息已写入')
+
+        after_id = Player.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        players = [
+            Player(
+                name=row.name,
+                school_id=int(row.school_id),
+                enrollment_year_id=int(row.enrollment_year_id),
+                notes=row.notes,
+            )
+            for row in rows.itertuples()
+        ]
+        for start in range(0, len(players), 1000):
+            Player.objects.bulk_create(players[start:start + 1000])
+            _report(progress, 40 + 50 * min(start + 1000, len(players)) // len(players),
+                    f'已写入队员 {min(start + 1000, len(players))}/{len(players)}')
+        if not connection.features.can_return_rows_from_bulk_insert:
+            _assign_player_ids(players, after_id)
+
+        # 队员与家长的关联一次批量写入
+        Through = Player.parents.through
+        links = [
+            Through(player_id=player.id, parent_id=parent_ids[phone])
+            for player, phone in zip(players, rows['phone'])
+            if pd.notna(phone)
+        ]
+        Through.objects.bulk_create(links, batch_size=1000, ignore_conflicts=True)
+
+        # 批量写入关联表不会触发 m2m_changed
+        invalidate_owned_players({link.parent_id for link in links})
+
+    return len(players), parents_created
+
+def import_players(excel_file, progress=None):
+    """
+    从Excel批量导入队员
+
+    先校验整张表，有任何错误时不写入数据并返回逐行错误；
+    全部通过后在一个事务中批量创建家长、队员和关联关系。
+
+    Args:
+        excel_file: 上传的Excel文件或文件路径
+        progress: 进度回调 progress(百分比, 说明)，写入阶段在事务内调用
+
+    Returns:
+        PlayerImportResult
+
+    Raises:
+        ValueError: Excel缺少必要的列
+    """
+    df = read_player_sheet(excel_file)
+    result = PlayerImportResult(len(df))
+    _report(progress, 10, f'已读取 {len(df)} 行')
+
+    rows, result.errors = validate_player_sheet(df)
+    if result.errors:
+        return result
+    _report(progress, 20, '校验通过，开始写入')
+
+    result.players_created, result.parents_created = import_player_rows(rows, progress)
+    logger.info(f"Excel导入完成：新增队员 {result.players_created} 名，新增家长 {result.parents_created} 名")
+    return result
@@ -0,0 +1,140 @@
+import atexit
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+
+# 设置日志
+logger = logging.getLogger('log')
+
+class QueryBudgetExceeded(Exception):
+    """请求的SQL数量超出预算，或同一条SQL重复执行过多（N+1）"""
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+def sql_shape(sql):
+    """
+    SQL的形状：参数已是占位符，只需把长度不同的 IN 列表和SQL中的数字常量归一，
+    同一段代码循环执行的查询得到相同的形状
+    """
+    return _NUMBER.sub('N', _IN_LIST.sub('IN (...)', sql))
+
+class QueryRecorder:
+    """
+    记录一段代码执行的SQL数量、耗时和形状
+
+    作为 connection.execute_wrapper 使用，只统计不改变执行结果。
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    def repeated(self, threshold):
+        """执行次数超过 threshold 的SQL形状，按次数降序"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    @contextmanager
+    def record(self):
+        """在所有数据库连接上记录SQL"""
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+def budget_settings():
+    return getattr(settings, 'QUERY_BUDGET', {})
+
+def get_budget(view_name):
+    """某个视图的SQL数量上限，BUDGETS 中未配置时使用默认值"""
+    config = budget_settings()
+    return config.get('BUDGETS', {}).get(view_name, config.get('DEFAULT_MAX_QUERIES', 50))
+
+def check_budget(recorder, max_queries, max_repeated):
+    """
+    检查是否超出预算
+
+    Returns:
+        list: 问题描述，未超出时为空
+    """
+    problems = []
+    if max_queries is not None and recorder.count > max_queries:
+        problems.append(f'SQL数量 {recorder.count} 超出预算 {max_queries}')
+    if max_repeated is not None:
+        for shape, count in recorder.repeated(max_repeated)[:3]:
+            problems.append(f'同一SQL执行 {count} 次（疑似N+1）：{shape[:300]}')
+    return problems
+
+@contextmanager
+def assert_query_budget(max_queries=None, max_repeated=None):
+    """
+    调试和测试用：代码块内的SQL超出预算时抛出 QueryBudgetExceeded
+
+    用法：
+        with assert_query_budget(max_queries=10, max_repeated=3):
+            client.get('/api/player/tasks/', ...)
+    """
+    recorder = QueryRecorder()
+    with recorder.record():
+        yield recorder
+    problems = check_budget(recorder, max_queries, max_repeated)
+    if problems:
+        raise QueryBudgetExceeded('；'.join(problems))
+
+class EndpointStats:
+    """按视图汇总的请求SQL统计，定期写入日志"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 视图名 -> [请求数, SQL总数, 单次最大SQL数, 数据库总耗时, 超出预算次数]
+        self._stats = {}
+
+    def add(self, view_name, recorder, over_budget):
+        summary = None
+        interval = budget_settings().get('SUMMARY_INTERVAL', 100)
+        with self._lock:
+            stats = self._stats.setdefault(view_name, [0, 0, 0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += recorder.count
+            stats[2] = max(stats[2], recorder.count)
+            stats[3] += recorder.duration
+            stats[4] += 1 if over_budget else 0
+            if interval and stats[0] >= interval:
+                summary = list(stats)
+                del self._stats[view_name]
+        if summary:
+            self._log(view_name, summary)
+
+    def flush(self):
+        """写出所有尚未输出的统计"""
+        with self._lock:
+            stats, self._stats = self._stats, {}
+        for view_name, summary in stats.items():
+            self._log(view_name, summary)
+
+    def _log(self, view_name, summary):
+        requests, queries, max_queries, duration, over_budget = summary
+        logger.info(
+            f"SQL统计 {view_name}：{requests} 次请求，平均 {queries / requests:.1f} 条SQL，"
+            f"最多 {max_queries} 条，平均数据库耗时 {duration * 1000 / requests:.1f} ms，"
+            f"超出预算 {over_budget} 次"
+        )
+
+endpoint_stats = EndpointStats()
+# 进程退出时输出剩余的统计
+atexit.register(endpoint_stats.flush)
@@ -0,0 +1,128 @@
+import hashlib
+import threading
+import uuid
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.http import parse_etags
+from .models import School, EnrollmentYear
+from .metrics import record_cache
+
+def _load_schools():
+    return [{'id': school_id, 'name': name} for school_id, name in School.objects.values_list('id', 'name')]
+
+def _load_enrollment_years():
+    return [{'id': year_id, 'year': year} for year_id, year in EnrollmentYear.objects.values_list('id', 'year')]
+
+# 基础数据名称 -> 查询函数
+LOADERS = {
+    'schools': _load_schools,
+    'enrollment_years': _load_enrollment_years,
+}
+
+def _settings():
+    return getattr(settings, 'REFERENCE_DATA_CACHE', {})
+
+def _shared_cache():
+    """共享缓存（未配置时返回None）"""
+    alias = _settings().get('ALIAS')
+    if not alias:
+        return None
+    from django.core.cache import caches
+    return caches[alias]
+
+# 基础数据名称 -> (版本, 响应内容, ETag)
+_entries = {}
+# 未配置共享缓存时使用的进程内版本号
+_local_versions = {}
+_lock = threading.Lock()
+
+def _version_key(name):
+    return f'reference_data:version:{name}'
+
+def _current_version(name):
+    """
+    当前数据版本
+
+    共享缓存中的版本为随机值，版本键被淘汰后重新生成的值不会与旧版本重复。
+    """
+    shared = _shared_cache()
+    if shared is None:
+        return _local_versions.get(name, 0)
+
+    version = shared.get(_version_key(name))
+    if version is None:
+        shared.add(_version_key(name), uuid.uuid4().hex, None)
+        version = shared.get(_version_key(name))
+    return version
+
+def _get_entry(name):
+    """获取当前版本的序列化数据，只有缓存全部未命中时才查询数据库"""
+    version = _current_version(name)
+    entry = _entries.get(name)
+    if entry is not None and entry[0] == version:
+        record_cache('reference_data', True)
+        return entry
+
+    shared = _shared_cache()
+    payload_key = f'reference_data:{name}:{version}'
+    cached = shared.get(payload_key) if shared is not None else None
+    record_cache('reference_data', cached is not None)
+    if cached is not None:
+        content, etag = cached
+    else:
+        content = JsonResponse({
+            'code': 200,
+            'message': '获取成功',
+            'data': LOADERS[name]()
+        }).content
+        etag = '"%s"' % hashlib.md5(content).hexdigest()
+        if shared is not None:
+            shared.set(payload_key, (content, etag), _settings().get('TIMEOUT', 86400))
+
+    entry = (version, content, etag)
+    with _lock:
+        _entries[name] = entry
+    return entry
+
+def reference_data_response(request, name):
+    """
+    返回基础数据，支持 If-None-Match 条件请求
+
+    ETag 与客户端缓存一致时直接返回304，不查询数据库。
+    """
+    _, content, etag = _get_entry(name)
+    cache_control = f"max-age={_settings().get('MAX_AGE', 300)}, must-revalidate"
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        client_etags = parse_etags(if_none_match)
+        if '*' in client_etags or etag in client_etags or f'W/{etag}' in client_etags:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            response['Cache-Control'] = cache_control
+            return response
+
+    response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+def _bump_version(name):
+    shared = _shared_cache()
+    with _lock:
+        _entries.pop(name, None)
+        if shared is None:
+            _local_versions[name] = _local_versions.get(name, 0) + 1
+    if shared is not None:
+        shared.set(_version_key(name), uuid.uuid4().hex, None)
+
+def invalidate_reference_data(name):
+    """
+    基础数据变化后更新版本号
+
+    在事务中调用时，提交后会再更新一次，避免提交前读到的旧数据以新版本号缓存。
+    """
+    _bump_version(name)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump_version(name))
@@ -153,6 +153,11 @@ SIMPLEUI_CONFIG = {
                 'name': '家长信息',
                 'icon': 'fas fa-user-friends',
                 'url': 'wxcloudrun/parent/'
+            },
+            {
+                'name': '导入任务',
+                'icon': 'fas fa-file-import',
+                'url': 'wxcloudrun/importjob/'
             }
         ]
     },
@@ -177,6 +182,8 @@ SIMPLEUI_CONFIG = {
 SIMPLEUI_HOME_INFO = False
 
 MIDDLEWARE = [
+    'wxcloudrun.middleware.MetricsMiddleware',
+    'wxcloudrun.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -184,6 +191,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'wxcloudrun.middleware.JWTAuthenticationMiddleware',
 ]
 
 ROOT_URLCONF = 'wxcloudrun.urls'
@@ -332,6 +340,8 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 # 添加 WhiteNoise 中间件
 MIDDLEWARE = [
+    'wxcloudrun.middleware.MetricsMiddleware',
+    'wxcloudrun.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # 新增
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -340,6 +350,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'wxcloudrun.middleware.JWTAuthenticationMiddleware',
 ]
 
 APPEND_SLASH = False
@@ -359,11 +370,117 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 # JWT配置
 JWT_SECRET_KEY = SECRET_KEY  # 这里应该用生成token时相同的密钥
+JWT_CACHE_SIZE = 1024  # 已验证token的缓存数量（LRU），0表示不缓存
+
+# 家长绑定队员集合的缓存配置
+PARENT_PLAYER_CACHE = {
+    'ALIAS': None,     # 共享缓存（CACHES中的别名），为None时只使用进程内缓存
+    'LOCAL_TTL': 5,    # 进程内缓存的有效秒数（其他进程中解除的绑定最迟在这段时间后生效）
+    'TIMEOUT': 3600,   # 共享缓存的过期秒数
+}
+
+# 后台导入任务配置（任务在 gunicorn 进程内的线程池中执行）
+IMPORT_JOB_SETTINGS = {
+    'WORKERS': 1,                                           # 同时执行的导入任务数量
+    'SPOOL_DIR': os.path.join(BASE_DIR, 'spool', 'imports'),  # 上传文件暂存目录
+    # 任务租约秒数：执行中的进程定期续约，进程退出后租约过期的任务在服务启动时恢复
+    'LEASE_SECONDS': 300,
+}
+
+# 学校、入学年份等基础数据接口的缓存配置
+REFERENCE_DATA_CACHE = {
+    'ALIAS': None,     # 共享缓存（CACHES中的别名），为None时只使用进程内缓存
+    'MAX_AGE': 300,    # 响应头 Cache-Control 的 max-age 秒数
+    'TIMEOUT': 86400,  # 共享缓存中序列化数据的过期秒数
+}
+
+# 请求SQL预算：统计每个请求的SQL数量和数据库耗时，检测N+1查询
+QUERY_BUDGET = {
+    'ENABLED': True,
+    'DEFAULT_MAX_QUERIES': 50,  # 未单独配置的视图的SQL数量上限
+    'MAX_REPEATED': 10,         # 同一SQL形状在一个请求中的最多执行次数，超出视为N+1
+    'RAISE': False,             # 超出预算时抛出异常（开发调试时开启），否则只记录警告
+    'SERVER_TIMING': True,      # 在 Server-Timing 响应头中输出SQL数量和耗时（仅 DEBUG、内部地址或已登录的请求）
+    'SUMMARY_INTERVAL': 100,    # 每个视图每处理多少次请求在日志中输出一次汇总
+    # 视图名（URL name，admin 为 'admin:...'）-> SQL数量上限
+    'BUDGETS': {
+        'get_schools': 2,
+        'get_enrollment_years': 2,
+        'get_player_tasks': 15,
+        'get_parent_players': 15,
+        'batch_complete_tasks': 20,
+    },
+}
+
+# 监控指标（/internal/metrics/，Prometheus 文本格式）
+METRICS_SETTINGS = {
+    # 多进程模式：各 gunicorn 进程把指标写入该目录，导出时合并；为空时只导出当前进程的指标
+    'MULTIPROC_DIR': os.environ.get('METRICS_MULTIPROC_DIR', ''),
+    'FLUSH_INTERVAL': 5,  # 多进程模式下各进程写入指标文件的最短间隔（秒）
+    # 访问指标接口需要的 Bearer token，为空时只允许 ALLOWED_IPS 中的地址访问
+    'TOKEN': os.environ.get('METRICS_TOKEN', ''),
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+}
+
+# 教练看板配置
+TEAM_DASHBOARD_SETTINGS = {
+    'DEFAULT_WEEKS': 4,        # 默认统计最近几周
+    'MAX_WEEKS': 12,           # 最多统计几周
+    'AT_RISK_MIN_STREAK': 2,   # 连续完成达到该次数后中断的队员列为需要关注
+}
+
+# 批量打卡（小程序离线缓存的打卡联网后一次提交）
+CHECKIN_SYNC_SETTINGS = {
+    'MAX_BATCH_SIZE': 100,    # 单次最多提交的打卡数量
+    'MAX_OFFLINE_DAYS': 7,    # 最多可补传几天前的打卡
+}
+
+# 对象存储（微信云存储 COS）客户端
+CLOUD_STORAGE_SETTINGS = {
+    'BASE_URL': os.environ.get('CLOUD_STORAGE_BASE_URL', ''),  # 为空时使用默认存储桶地址，本地测试可指向模拟服务
+    'CONNECT_TIMEOUT': 3,     # 建立连接超时（秒）
+    'READ_TIMEOUT': 30,       # 读取响应超时（秒）
+    'MAX_RETRIES': 3,         # 5xx 和连接错误的最多重试次数
+    'BACKOFF_FACTOR': 0.5,    # 指数退避：第 n 次重试前等待 BACKOFF_FACTOR * 2^(n-1) 秒
+    'POOL_MAXSIZE': 10,       # 每个主机保持的最多连接数
+    'MULTIPART_THRESHOLD': 8 * 1024 * 1024,  # 超过该大小（字节）的文件使用分块上传
+    'PART_SIZE': 2 * 1024 * 1024,            # 分块大小（字节），COS 要求除最后一块外不小于 1MB
+    'MULTIPART_CONCURRENCY': 3,              # 并行上传的分块数
+    'PART_RESUME_ATTEMPTS': 2,               # 分块重试后仍失败时，续传缺失分块的最多轮数
+}
+
+# 上传图片处理（头像、徽章）：生成固定尺寸的 WebP 和 JPEG 版本
+IMAGE_PIPELINE_SETTINGS = {
+    'SIZES': (64, 128, 512),             # 各版本的边长上限（像素），按比例缩放，不放大
+    'QUALITY': {'webp': 80, 'jpeg': 85},  # 编码质量
+    'MAX_PIXELS': 40_000_000,            # 原图最多像素数，超出时拒绝处理
+    'THUMBNAIL_SIZE': 128,               # 列表接口返回的缩略图尺寸
+    'THUMBNAIL_FORMAT': 'jpeg',          # 列表接口返回的缩略图格式（'webp' 或 'jpeg'）
+}
+
+# 内容寻址的媒体文件（以内容哈希命名，相同内容只保存一份，URL 不变可长期缓存）
+MEDIA_STORE_SETTINGS = {
+    'CACHE_MAX_AGE': 31536000,        # Cache-Control 的 max-age（秒）
+    'SPOOL_MAX_MEMORY': 1024 * 1024,  # 计算哈希时暂存在内存中的最大字节数，超出后转存到临时文件
+    # 清理未引用文件时扫描的目录
+    'GC_PREFIXES': ['avatars', 'badges', 'categories', 'series'],
+    'GC_GRACE_HOURS': 24,             # 最近这段时间内上传的文件不清理（可能尚未保存到记录中）
+}
+
+# 后台上传：文件先保存到本地（MEDIA_ROOT，即暂存目录）并返回临时地址，由后台线程上传到对象存储后替换为正式地址
+UPLOAD_OFFLOAD_SETTINGS = {
+    'ASYNC_BY_DEFAULT': False,  # 请求未指定 async 参数时是否使用后台上传
+    'WORKERS': 2,               # 后台上传线程数
+    'MAX_ATTEMPTS': 3,          # 上传失败后的最多尝试次数
+    'RETRY_DELAY': 30,          # 失败后重试的等待秒数
+    # 任务租约秒数：上传期间定期续约，执行任务的进程退出后，租约过期的任务在服务启动或提交上传时由任一进程接手重新执行
+    # （暂存目录需为各实例共享的持久存储，否则接手的进程找不到暂存文件，任务记为失败）
+    'LEASE_SECONDS': 600,
+}
 
 # 添加成就系统相关配置
 ACHIEVEMENT_SETTINGS = {
-    'AUTO_CHECK_ENABLED': True,  # 开启自动检查成就
-    'AUTO_CHECK_INTERVAL': 60,   # 自动检查间隔（分钟）
+    'AUTO_CHECK_ENABLED': True,  # 开启自动检查成就（由任务完成、考核成绩等事件触发，在后台队列中执行）
     'NOTIFICATION_ENABLED': True, # 开启成就解锁通知
     'PROGRESS_TRACKING': True,   # 跟踪成就进度
     'LEADERBOARD_SIZE': 50,      # 成就排行榜显示数量
@@ -0,0 +1,138 @@
+from django.db.models.signals import post_init, post_save, post_delete, pre_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+from .models import (
+    TaskCompletion, AssessmentScore, PlayerAchievement, PersonalAchievement, AchievementSeries, Player, Parent,
+    School, EnrollmentYear, Task, Team, AchievementCategory, TeamAchievement
+)
+from .auth_utils import invalidate_owned_players
+from .reference_data import invalidate_reference_data
+from .streak_service import record_completion, refresh_task_streak
+from .achievement_service import enqueue_task_completion_event, enqueue_assessment_score_event
+from .background import submit_on_commit
+from .leaderboard import refresh_player_points, refresh_achievement_holders, refresh_series_holders
+from .team_dashboard import refresh_daily_stats, rebuild_daily_stats
+from .upload_offload import resolve_urls
+
+def _streak_state(instance):
+    """影响连续完成记录的字段（只读取已加载的字段，不触发延迟加载查询）"""
+    return tuple(instance.__dict__.get(field) for field in ('task_id', 'player_id', 'verified', 'completion_date'))
+
+@receiver(post_init, sender=TaskCompletion)
+def remember_completion_state(sender, instance, **kwargs):
+    """记录从数据库加载时的状态，保存时据此判断审核状态或日期是否变化"""
+    instance._streak_state = _streak_state(instance) if instance.pk else None
+
+@receiver(post_save, sender=TaskCompletion)
+def update_streak_on_completion_save(sender, instance, created, **kwargs):
+    """完成记录新增、审核通过或驳回、修改日期时更新连续完成记录"""
+    previous, current = instance._streak_state, _streak_state(instance)
+    instance._streak_state = current
+    # 新增的待审核记录不影响连续次数
+    if created and not instance.verified:
+        return
+    if not created and previous is not None:
+        # 只修改备注、证明等字段，或修改待审核记录的日期，不影响连续次数
+        if previous == current or not (previous[2] or instance.verified):
+            return
+        # 改到了其他任务或队员名下，原组合需要重新计算
+        if previous[2] and previous[:2] != current[:2]:
+            refresh_task_streak(Task.objects.get(id=previous[0]), previous[1])
+    record_completion(instance)
+    # 已验证的完成记录可能解锁任务类成就
+    enqueue_task_completion_event(instance)
+
+@receiver(post_delete, sender=TaskCompletion)
+def update_streak_on_completion_delete(sender, instance, **kwargs):
+    """删除完成记录后重新计算连续完成记录"""
+    if instance.verified:
+        refresh_task_streak(instance.task, instance.player_id)
+
+@receiver(post_save, sender=TaskCompletion)
+@receiver(post_delete, sender=TaskCompletion)
+def update_daily_stats_on_completion_change(sender, instance, **kwargs):
+    """完成记录新增、审核或删除后在后台刷新队伍当天的任务汇总"""
+    submit_on_commit(refresh_daily_stats, instance.task_id, instance.completion_date)
+
+@receiver(m2m_changed, sender=Team.players.through)
+@receiver(m2m_changed, sender=Task.teams.through)
+def rebuild_daily_stats_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """队伍成员或任务分配变化后在后台重建相关队伍的任务汇总"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Team):
+        team_ids = (instance.pk,)
+    elif pk_set is not None:
+        team_ids = tuple(sorted(pk_set))
+    else:
+        # 从队员或任务一侧 clear() 时不提供受影响的队伍
+        team_ids = None
+    submit_on_commit(rebuild_daily_stats, team_ids)
+
+@receiver(post_save, sender=AssessmentScore)
+def check_achievements_on_score_save(sender, instance, **kwargs):
+    """考核成绩录入或修改后检查考核类成就"""
+    enqueue_assessment_score_event(instance)
+
+@receiver(post_save, sender=PlayerAchievement)
+@receiver(post_delete, sender=PlayerAchievement)
+def update_points_on_player_achievement_change(sender, instance, **kwargs):
+    """成就颁发、撤销或修改进度后刷新队员的排行榜积分"""
+    refresh_player_points([instance.player_id])
+
+@receiver(post_save, sender=PersonalAchievement)
+def update_points_on_achievement_save(sender, instance, **kwargs):
+    """成就积分或所属系列变化后在后台刷新相关队员的积分"""
+    submit_on_commit(refresh_achievement_holders, instance.id)
+    if instance.series_id:
+        # 系列新增成就后，已集齐的队员可能失去系列奖励
+        submit_on_commit(refresh_series_holders, instance.series_id)
+
+@receiver(post_save, sender=AchievementSeries)
+def update_points_on_series_save(sender, instance, **kwargs):
+    """系列奖励积分变化后在后台刷新相关队员的积分"""
+    submit_on_commit(refresh_series_holders, instance.id)
+
+@receiver(m2m_changed, sender=Player.parents.through)
+def invalidate_owned_players_on_bind(sender, instance, action, reverse, pk_set, **kwargs):
+    """家长与队员绑定关系变化后使家长的队员集合缓存失效"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # 从家长一侧修改（parent.players）
+        invalidate_owned_players([instance.pk])
+    elif pk_set is not None:
+        invalidate_owned_players(pk_set)
+    else:
+        # player.parents.clear() 不提供受影响的家长
+        invalidate_owned_players()
+
+@receiver(pre_delete, sender=Player)
+def invalidate_owned_players_on_player_delete(sender, instance, **kwargs):
+    """删除队员会级联删除绑定关系但不触发 m2m_changed，需手动使缓存失效"""
+    invalidate_owned_players(list(instance.parents.values_list('id', flat=True)))
+
+@receiver(post_delete, sender=Parent)
+def invalidate_owned_players_on_parent_delete(sender, instance, **kwargs):
+    """删除家长后清除其队员集合缓存"""
+    invalidate_owned_players([instance.pk])
+
+@receiver(post_save, sender=School)
+@receiver(post_delete, sender=School)
+def invalidate_schools(sender, **kwargs):
+    """学校变化后使学校列表缓存失效"""
+    invalidate_reference_data('schools')
+
+@receiver(post_save, sender=EnrollmentYear)
+@receiver(post_delete, sender=EnrollmentYear)
+def invalidate_enrollment_years(sender, **kwargs):
+    """入学年份变化后使入学年份列表缓存失效"""
+    invalidate_reference_data('enrollment_years')
+
+@receiver(pre_save, sender=Player)
+@receiver(pre_save, sender=PersonalAchievement)
+@receiver(pre_save, sender=AchievementCategory)
+@receiver(pre_save, sender=AchievementSeries)
+@receiver(pre_save, sender=TeamAchievement)
+def resolve_uploaded_urls(sender, instance, **kwargs):
+    """保存时把后台上传已完成的临时地址替换为对象存储地址"""
+    resolve_urls(instance)
@@ -0,0 +1,181 @@
+import logging
+from datetime import datetime
+from django.db import transaction
+from .models import Task, TaskCompletion, TaskStreak
+from .task_utils import is_consecutive, summarize_streaks_bulk
+
+# 设置日志
+logger = logging.getLogger('log')
+
+def get_task_streaks(task_ids, player_ids):
+    """
+    批量读取连续完成次数
+
+    Args:
+        task_ids: 任务ID列表
+        player_ids: 队员ID列表
+
+    Returns:
+        dict: {(task_id, player_id): 当前连续次数}，无记录的组合视为0
+    """
+    rows = TaskStreak.objects.filter(
+        task_id__in=task_ids,
+        player_id__in=player_ids
+    ).values_list('task_id', 'player_id', 'current_streak')
+    return {(task_id, player_id): streak for task_id, player_id, streak in rows}
+
+def calculate_task_streaks(task_ids, player_ids=None):
+    """
+    批量计算连续完成情况
+
+    一次查询取出所有相关的已验证完成日期，再对整个队伍/全部队员统一计算。
+
+    Args:
+        task_ids: 任务ID列表
+        player_ids: 队员ID列表，默认计算全部队员
+
+    Returns:
+        dict: {(task_id, player_id): (当前连续次数, 最长连续次数, 最近完成日期)}
+    """
+    periods = dict(Task.objects.filter(id__in=task_ids).values_list('id', 'period'))
+
+    completions = TaskCompletion.objects.filter(task_id__in=periods.keys(), verified=True)
+    if player_ids is not None:
+        completions = completions.filter(player_id__in=player_ids)
+    rows = completions.values_list('task_id', 'player_id', 'completion_date').iterator(chunk_size=2000)
+
+    return summarize_streaks_bulk(rows, periods)
+
+def refresh_task_streak(task, player_id):
+    """根据完整的已验证完成记录重新计算某任务某队员的连续完成情况"""
+    current_streak, longest_streak, last_date = calculate_task_streaks(
+        [task.id], [player_id]
+    ).get((task.id, player_id), (0, 0, None))
+
+    TaskStreak.objects.update_or_create(
+        task=task,
+        player_id=player_id,
+        defaults={
+            'current_streak': current_streak,
+            'longest_streak': longest_streak,
+            'last_completion_date': last_date,
+        }
+    )
+    return current_streak
+
+def refresh_task_streaks(pairs):
+    """
+    批量重新计算多组 (任务, 队员) 的连续完成记录
+
+    用于批量审核等不触发 post_save 信号的场景，一次查询完成记录，批量写入。
+
+    Args:
+        pairs: [(task_id, player_id)]
+
+    Returns:
+        int: 更新的记录数量
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    task_ids = {task_id for task_id, _ in pairs}
+    player_ids = {player_id for _, player_id in pairs}
+    summaries = calculate_task_streaks(task_ids, player_ids)
+
+    with transaction.atomic():
+        existing = {
+            (streak.task_id, streak.player_id): streak
+            for streak in TaskStreak.objects.select_for_update().filter(task_id__in=task_ids, player_id__in=player_ids)
+        }
+        now = datetime.now()
+        created, updated = [], []
+        for task_id, player_id in pairs:
+            current_streak, longest_streak, last_date = summaries.get((task_id, player_id), (0, 0, None))
+            streak = existing.get((task_id, player_id))
+            if streak is None:
+                streak = TaskStreak(task_id=task_id, player_id=player_id)
+                created.append(streak)
+            else:
+                updated.append(streak)
+            streak.current_streak = current_streak
+            streak.longest_streak = longest_streak
+            streak.last_completion_date = last_date
+            streak.updated_at = now
+
+        TaskStreak.objects.bulk_create(created, batch_size=1000)
+        # bulk_update 不会自动更新 auto_now 字段
+        TaskStreak.objects.bulk_update(
+            updated, ['current_streak', 'longest_streak', 'last_completion_date', 'updated_at'], batch_size=1000
+        )
+    return len(pairs)
+
+def record_completion(completion):
+    """
+    完成记录新增或状态变化时更新连续完成记录
+
+    新的已验证记录晚于最近完成日期时直接在原记录上累加，
+    其余情况（审核驳回、补录历史日期、删除等）回退为重新计算。
+    """
+    task = completion.task
+
+    with transaction.atomic():
+        streak = TaskStreak.objects.select_for_update().filter(
+            task=task,
+            player_id=completion.player_id
+        ).first()
+
+        if completion.verified and (
+            streak is None
+            or streak.last_completion_date is None
+            or completion.completion_date > streak.last_completion_date
+        ):
+            if streak is None:
+                streak = TaskStreak(task=task, player_id=completion.player_id)
+
+            if task.period == 'once':
+                streak.current_streak = 1
+            elif streak.last_completion_date and streak.current_streak and is_consecutive(
+                task.period, completion.completion_date, streak.last_completion_date
+            ):
+                streak.current_streak += 1
+            else:
+                streak.current_streak = 1
+
+            streak.longest_streak = max(streak.longest_streak, streak.current_streak)
+            streak.last_completion_date = completion.completion_date
+            streak.save()
+            return streak.current_streak
+
+        return refresh_task_streak(task, completion.player_id)
+
+def rebuild_task_streaks(task_ids=None):
+    """
+    根据完成记录全量重建连续完成记录
+
+    Args:
+        task_ids: 需要重建的任务ID列表，默认重建全部任务
+
+    Returns:
+        int: 重建的记录数量
+    """
+    if not task_ids:
+        task_ids = list(Task.objects.values_list('id', flat=True))
+
+    streaks = [
+        TaskStreak(
+            task_id=task_id,
+            player_id=player_id,
+            current_streak=current_streak,
+            longest_streak=longest_streak,
+            last_completion_date=last_date,
+        )
+        for (task_id, player_id), (current_streak, longest_streak, last_date)
+        in calculate_task_streaks(task_ids).items()
+    ]
+
+    with transaction.atomic():
+        TaskStreak.objects.filter(task_id__in=task_ids).delete()
+        TaskStreak.objects.bulk_create(streaks, batch_size=1000)
+
+    logger.info(f"连续完成记录重建完成，共 {len(streaks)} 条")
+    return len(streaks)
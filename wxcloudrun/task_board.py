@@ -0,0 +1,167 @@
+from collections import defaultdict
+from datetime import date
+from django.db.models import Q
+import logging
+
+from .models import Task, TaskCompletion, Team
+from .streak_service import get_task_streaks
+
+logger = logging.getLogger('log')
+
+
+def _completion_status(completion):
+    """将完成记录转换为接口使用的状态字符串"""
+    if not completion:
+        return 'incomplete'
+    return 'completed' if completion['verified'] else 'pending'
+
+
+def build_player_task_board(player, status_filter=None):
+    """
+    构建队员任务看板数据
+
+    队员所在队伍、任务、队伍成员、相关完成记录及连续完成次数均以固定数量的查询一次性加载，
+    之后在内存中组装每个任务的数据，查询次数不随任务数量或队伍人数增长。
+
+    Args:
+        player: Player对象
+        status_filter: 任务状态筛选，默认只返回活跃任务
+
+    Returns:
+        list: 与 get_player_tasks 接口一致的任务数据列表（已排序）
+    """
+    today = date.today()
+
+    # 查询1：队员所在的队伍
+    player_team_ids = set(player.teams.values_list('id', flat=True))
+
+    # 查询2：这些队伍的所有任务
+    tasks = list(
+        Task.objects.filter(teams__in=player_team_ids)
+        .filter(status=status_filter or 'active')
+        .select_related('task_type')
+        .distinct()
+    )
+    if not tasks:
+        return []
+    task_ids = [task.id for task in tasks]
+
+    # 查询3：任务与队伍的关联关系（含队伍名称）
+    task_teams = defaultdict(list)
+    team_names = {}
+    task_team_rows = Task.teams.through.objects.filter(
+        task_id__in=task_ids
+    ).values_list('task_id', 'team_id', 'team__name').order_by('team__name', 'team_id')
+    for task_id, team_id, team_name in task_team_rows:
+        task_teams[task_id].append(team_id)
+        team_names[team_id] = team_name
+
+    # 查询4：队员所在队伍的全部成员
+    team_members = defaultdict(list)
+    member_names = {}
+    member_rows = Team.players.through.objects.filter(
+        team_id__in=player_team_ids
+    ).values_list('team_id', 'player_id', 'player__name').order_by('player_id')
+    for team_id, member_id, member_name in member_rows:
+        team_members[team_id].append(member_id)
+        member_names[member_id] = member_name
+    team_member_sets = {team_id: set(members) for team_id, members in team_members.items()}
+
+    # 查询5：相关完成记录，一次性任务取全部记录，周期性任务取当天记录
+    completion_rows = TaskCompletion.objects.filter(
+        task_id__in=task_ids,
+        player_id__in=member_names.keys() | {player.id},
+    ).filter(
+        Q(task__period='once') | Q(completion_date=today)
+    ).values(
+        'task_id', 'player_id', 'completion_date', 'verified', 'notes', 'proof'
+    ).order_by('-completion_date')
+
+    # (task_id, player_id) -> 当前有效的完成记录（一次性任务为最近一次，周期性任务为当天）
+    current_completions = {}
+    # task_id -> 已验证完成的队员ID集合
+    verified_players = defaultdict(set)
+
+    for row in completion_rows:
+        key = (row['task_id'], row['player_id'])
+        if key not in current_completions:
+            current_completions[key] = row
+        if row['verified']:
+            verified_players[row['task_id']].add(row['player_id'])
+
+    # 查询6：当前队员在各任务上的连续完成次数
+    streaks = get_task_streaks(task_ids, [player.id])
+
+    # 准备返回的数据
+    tasks_data = []
+    for task in tasks:
+        # 检查任务是否在有效期内
+        is_active = not (task.end_date and task.end_date < today)
+
+        task_completion = current_completions.get((task.id, player.id))
+
+        # 获取与当前队员相关的队伍中的情况
+        relevant_team_ids = [team_id for team_id in task_teams[task.id] if team_id in player_team_ids]
+        team_total = 0
+        completed_count = 0
+        for team_id in relevant_team_ids:
+            members = team_member_sets.get(team_id, set())
+            team_total += len(members)
+            completed_count += len(verified_players[task.id] & members)
+
+        team_progress = round((completed_count / team_total) * 100) if team_total > 0 else 0
+
+        # 获取任务连续完成天数
+        streak = streaks.get((task.id, player.id), 0) if is_active else 0
+
+        # 组装任务数据
+        task_data = {
+            'id': task.id,
+            'title': task.title,
+            'description': task.description,
+            'period': task.period,
+            'start_date': task.start_date.strftime('%Y-%m-%d'),
+            'end_date': task.end_date.strftime('%Y-%m-%d') if task.end_date else None,
+            'points': task.points,
+            'status': task.status,
+            'require_proof': task.require_proof,
+            'team_names': [team_names[team_id] for team_id in task_teams[task.id]],
+            'task_type': {
+                'name': task.task_type.name,
+                'icon': task.task_type.icon,
+                'color': task.task_type.color
+            } if task.task_type else None,
+            'player_completion': {
+                'status': _completion_status(task_completion),
+                'completion_date': task_completion['completion_date'].strftime('%Y-%m-%d') if task_completion else None,
+                'comment': task_completion['notes'] if task_completion else None,
+                'attachment': task_completion['proof'] if task_completion else None
+            },
+            'team_progress': {
+                'percentage': team_progress,
+                'completed': completed_count,
+                'total': team_total
+            },
+            'streak': streak,
+            'active': is_active
+        }
+
+        # 第一个相关队伍（按队伍名称排序）的成员完成情况
+        team_completions = []
+        if relevant_team_ids:
+            for member_id in team_members.get(relevant_team_ids[0], []):
+                team_completions.append({
+                    'player_id': member_id,
+                    'player_name': member_names[member_id],
+                    'status': _completion_status(current_completions.get((task.id, member_id)))
+                })
+        task_data['team_completions'] = team_completions
+        tasks_data.append(task_data)
+
+    # 按照完成状态和截止日期排序
+    tasks_data.sort(key=lambda x: (
+        x['player_completion']['status'] == 'completed',  # 未完成的排前面
+        x['end_date'] if x['end_date'] else '9999-12-31'  # 截止日期近的排前面
+    ))
+
+    return tasks_data
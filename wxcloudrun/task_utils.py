@@ -4,6 +4,66 @@ import logging
 
 logger = logging.getLogger('log')
 
+def is_consecutive(period, later_date, earlier_date):
+    """
+    判断两次完成日期在指定周期下是否连续
+    
+    Args:
+        period: 任务频率（daily/weekly/monthly）
+        later_date: 较晚的完成日期
+        earlier_date: 较早的完成日期
+    
+    Returns:
+        bool: 是否连续
+    """
+    date_diff = (later_date - earlier_date).days
+    
+    if period == 'daily':
+        return date_diff == 1
+    if period == 'weekly':
+        return date_diff <= 7 and earlier_date.weekday() == later_date.weekday()
+    if period == 'monthly':
+        # 按年月序号比较，12月到次年1月也算连续
+        return (later_date.year * 12 + later_date.month) - (earlier_date.year * 12 + earlier_date.month) == 1
+    return False
+
+def summarize_streaks(period, completion_dates):
+    """
+    根据已验证的完成日期计算连续完成情况
+    
+    Args:
+        period: 任务频率
+        completion_dates: 完成日期列表，顺序不限
+    
+    Returns:
+        tuple: (当前连续次数, 最长连续次数, 最近完成日期)
+    """
+    dates = sorted(set(completion_dates), reverse=True)
+    if not dates:
+        return 0, 0, None
+    
+    # 一次性任务没有连续概念
+    if period == 'once':
+        return 1, 1, dates[0]
+    
+    current_streak = None
+    longest_streak = 0
+    run = 1
+    for later_date, earlier_date in zip(dates, dates[1:]):
+        if is_consecutive(period, later_date, earlier_date):
+            run += 1
+            continue
+        if current_streak is None:
+            current_streak = run
+        longest_streak = max(longest_streak, run)
+        run = 1
+    
+    if current_streak is None:
+        current_streak = run
+    longest_streak = max(longest_streak, run)
+    
+    return current_streak, longest_streak, dates[0]
+
 def get_player_max_streak(player):
     """
     获取队员在所有任务中的最大连续完成天数
@@ -15,26 +75,95 @@ def get_player_max_streak(player):
         int: 最大连续完成天数
     """
     try:
-        from .models import Task, TaskCompletion
-        
-        # 获取队员完成的所有任务记录
-        completions = TaskCompletion.objects.filter(
-            player=player, 
-            verified=True
-        ).order_by('completion_date')
-        
-        if not completions.exists():
-            return 0
+        from .models import TaskStreak
         
-        # 获取队员所有任务的连续天数
-        streaks = []
-        for task in Task.objects.filter(taskcompletion__player=player).distinct():
-            task_streak = task.get_task_streak(player) if hasattr(task, 'get_task_streak') else 0
-            streaks.append(task_streak)
-        
-        # 返回最大连续天数
-        return max(streaks) if streaks else 0
+        max_streak = TaskStreak.objects.filter(player=player).aggregate(
+            max_streak=Max('current_streak')
+        )['max_streak']
+        return max_streak or 0
     
     except Exception as e:
         logger.error(f"计算最大连续天数出错: {str(e)}")
         return 0
+
+def summarize_streaks_bulk(rows, periods):
+    """
+    批量计算多个任务、多个队员的连续完成情况
+    
+    将所有完成日期按（任务, 队员）分组并按日期倒序排列后，
+    通过相邻日期差值判断是否连续，再按游程（run-length）统计每段连续的长度，
+    一次性得到所有组合的结果，与 summarize_streaks 的逐个计算结果一致。
+    
+    Args:
+        rows: (任务ID, 队员ID, 完成日期) 的可迭代对象，只应包含已验证的记录
+        periods: {任务ID: 任务频率}
+    
+    Returns:
+        dict: {(任务ID, 队员ID): (当前连续次数, 最长连续次数, 最近完成日期)}
+    """
+    import numpy as np
+    
+    rows = list(rows)
+    if not rows:
+        return {}
+    
+    task_ids, player_ids, completion_dates = zip(*rows)
+    task_ids = np.array(task_ids, dtype=np.int64)
+    player_ids = np.array(player_ids, dtype=np.int64)
+    # 以公历序数转换日期，避免逐个构造 datetime64 对象
+    epoch = date(1970, 1, 1).toordinal()
+    ordinals = np.fromiter((d.toordinal() for d in completion_dates), dtype=np.int64, count=len(rows))
+    days = (ordinals - epoch).astype('datetime64[D]')
+    
+    # 按任务、队员升序，日期倒序排列
+    order = np.lexsort((-ordinals, player_ids, task_ids))
+    task_ids, player_ids, days = task_ids[order], player_ids[order], days[order]
+    
+    # 去除同一组合下的重复日期
+    same_group = np.zeros(len(days), dtype=bool)
+    same_group[1:] = (task_ids[1:] == task_ids[:-1]) & (player_ids[1:] == player_ids[:-1])
+    keep = np.ones(len(days), dtype=bool)
+    keep[1:] = ~(same_group[1:] & (days[1:] == days[:-1]))
+    task_ids, player_ids, days, same_group = task_ids[keep], player_ids[keep], days[keep], same_group[keep]
+    
+    # 每条记录所属任务的频率
+    period_codes = {'daily': 1, 'weekly': 2, 'monthly': 3}
+    unique_tasks, task_index = np.unique(task_ids, return_inverse=True)
+    task_periods = np.array([period_codes.get(periods.get(int(task_id)), 0) for task_id in unique_tasks])
+    row_periods = task_periods[task_index]
+    
+    # 相邻两条记录（较晚 -> 较早）是否连续，规则与 is_consecutive 一致
+    day_diff = np.zeros(len(days), dtype=np.int64)
+    day_diff[1:] = (days[:-1] - days[1:]).astype(np.int64)
+    # 自1970年1月起的月份序号，跨年时同样相差1
+    months = days.astype('datetime64[M]').astype(np.int64)
+    month_match = np.zeros(len(days), dtype=bool)
+    month_match[1:] = months[:-1] - months[1:] == 1
+    
+    consecutive = same_group & (
+        ((row_periods == 1) & (day_diff == 1))
+        | ((row_periods == 2) & (day_diff == 7))
+        | ((row_periods == 3) & month_match)
+    )
+    
+    # 游程统计：每段连续记录的长度
+    run_ids = np.cumsum(~consecutive) - 1
+    run_lengths = np.bincount(run_ids)
+    
+    # 每个组合的起始位置
+    group_starts = np.flatnonzero(~same_group)
+    first_run = run_ids[group_starts]
+    
+    # 组合内最长的连续段
+    longest = np.maximum.reduceat(run_lengths, first_run)
+    current = run_lengths[first_run]
+    
+    # 一次性任务没有连续概念
+    is_once = row_periods[group_starts] == 0
+    current = np.where(is_once, 1, current)
+    longest = np.where(is_once, 1, longest)
+    
+    return dict(zip(
+        zip(task_ids[group_starts].tolist(), player_ids[group_starts].tolist()),
+        zip(current.tolist(), longest.tolist(), days[group_starts].tolist())
+    ))
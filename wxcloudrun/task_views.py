@@ -2,11 +2,14 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 import json
-import jwt
 from django.utils import timezone
 from datetime import datetime, timedelta, date
 from .models import Task, TaskCompletion, Player, Team, Coach
-from django.conf import settings
+from .task_board import build_player_task_board
+from .streak_service import get_task_streaks
+from .auth_utils import require_principal, parent_owns_player, get_owned_player_ids
+from .checkin_sync import CREATED, sync_completions, sync_settings
+from .image_pipeline import thumbnail_urls
 from django.db.models import Count, Q, Subquery, OuterRef, Exists
 import logging
 
@@ -15,39 +18,23 @@ logger = logging.getLogger('log')
 
 def verify_token_and_get_player(request, player_id=None):
     """验证token并获取队员信息"""
-    auth_header = request.headers.get('Authorization')
-    logger.info(f"Auth header: {auth_header[:20] if auth_header else 'None'}")
-    
-    if not auth_header or not auth_header.startswith('Bearer '):
-        logger.error(f"无效的token格式: {auth_header}")
-        return None, JsonResponse({'code': 401, 'message': '无效的token格式'}, status=401)
-    
-    token = auth_header.split(' ')[1]
+    principal, error_response = require_principal(request, 'parent')
+    if error_response:
+        return None, error_response
     
-    try:
-        # 使用JWT_SECRET_KEY而非SECRET_KEY
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=['HS256'])
-        logger.info(f"Token decoded for user_id: {payload.get('user_id')}, type: {payload.get('user_type')}")
-        
-        if payload.get('user_type') != 'parent':
-            logger.error(f"用户类型错误: {payload.get('user_type')}")
-            return None, JsonResponse({'code': 401, 'message': '用户类型错误'}, status=401)
-            
-        parent_id = payload.get('user_id')
-    except jwt.ExpiredSignatureError:
-        logger.error("Token已过期")
-        return None, JsonResponse({'code': 401, 'message': 'token已过期'}, status=401)
-    except jwt.InvalidTokenError as e:
-        logger.error(f"无效的token: {str(e)}")
-        return None, JsonResponse({'code': 401, 'message': '无效的token'}, status=401)
+    parent_id = principal.user_id
     
     # 如果没有提供player_id，返回parent_id
     if not player_id:
         return parent_id, None
     
     # 验证队员是否属于该家长
+    if not parent_owns_player(parent_id, player_id):
+        logger.error(f"无权访问队员ID {player_id}")
+        return None, JsonResponse({'code': 403, 'message': '无权访问该队员信息'}, status=403)
+    
     try:
-        player = Player.objects.get(id=player_id, parents__id=parent_id)
+        player = Player.objects.get(id=player_id)
         return player, None
     except Player.DoesNotExist:
         logger.error(f"无权访问队员ID {player_id}")
@@ -70,125 +57,8 @@ def get_player_tasks(request):
     # 获取任务状态筛选
     status_filter = request.GET.get('status')
     
-    # 获取队员所在的所有队伍
-    teams = player.teams.all()
-    
-    # 查询这些队伍的所有任务
-    tasks = Task.objects.filter(teams__in=teams).distinct()  # 使用distinct避免重复
-    
-    if status_filter:
-        tasks = tasks.filter(status=status_filter)
-    else:
-        # 默认只返回活跃任务
-        tasks = tasks.filter(status='active')
-    
-    # 获取当前日期
-    today = date.today()
-    
-    # 准备返回的数据
-    tasks_data = []
-    for task in tasks:
-        # 检查任务是否在有效期内
-        is_active = True
-        if task.end_date and task.end_date < today:
-            is_active = False
-        
-        # 获取队员今天的完成情况(针对周期性任务)或整体完成情况(一次性任务)
-        task_completion = None
-        if task.period == 'once':
-            task_completion = TaskCompletion.objects.filter(
-                task=task, 
-                player=player
-            ).order_by('-completion_date').first()
-        else:
-            task_completion = TaskCompletion.objects.filter(
-                task=task, 
-                player=player, 
-                completion_date=today
-            ).first()
-        
-        # 获取团队进度
-        team_total = 0
-        completed_count = 0
-        
-        # 获取与当前队员相关的队伍中的情况
-        relevant_teams = task.teams.filter(id__in=player.teams.values_list('id', flat=True))
-        for team in relevant_teams:
-            team_total += team.players.count()
-            if task.period == 'once':
-                completed_count += TaskCompletion.objects.filter(
-                    task=task,
-                    verified=True,
-                    player__in=team.players.all()
-                ).values('player').distinct().count()
-            else:
-                completed_count += TaskCompletion.objects.filter(
-                    task=task,
-                    verified=True,
-                    completion_date=today,
-                    player__in=team.players.all()
-                ).values('player').distinct().count()
-        
-        team_progress = round((completed_count / team_total) * 100) if team_total > 0 else 0
-        
-        # 获取任务连续完成天数
-        streak = task.get_task_streak(player) if is_active else 0
-        
-        # 组装任务数据
-        task_data = {
-            'id': task.id,
-            'title': task.title,
-            'description': task.description,
-            'period': task.period,
-            'start_date': task.start_date.strftime('%Y-%m-%d'),
-            'end_date': task.end_date.strftime('%Y-%m-%d') if task.end_date else None,
-            'points': task.points,
-            'status': task.status,
-            'require_proof': task.require_proof,
-            'team_names': [team.name for team in task.teams.all()],
-            'task_type': {
-                'name': task.task_type.name,
-                'icon': task.task_type.icon,
-                'color': task.task_type.color
-            } if hasattr(task, 'task_type') and task.task_type else None,
-            'player_completion': {
-                'status': 'completed' if task_completion and task_completion.verified else 'pending' if task_completion else 'incomplete',
-                'completion_date': task_completion.completion_date.strftime('%Y-%m-%d') if task_completion else None,
-                'comment': task_completion.notes if task_completion else None,
-                'attachment': task_completion.proof if task_completion else None
-            },
-            'team_progress': {
-                'percentage': team_progress,
-                'completed': completed_count,
-                'total': team_total
-            },
-            'streak': streak,
-            'active': is_active
-        }
-        
-        team_completions = []
-        first_team = relevant_teams.first()
-        if first_team:
-            for member in first_team.players.all():
-                completion_record = TaskCompletion.objects.filter(
-                    task=task,
-                    player=member,
-                    completion_date=today if task.period != 'once' else None
-                ).order_by('-completion_date').first()
-                teammate_status = 'completed' if completion_record and completion_record.verified else 'pending' if completion_record else 'incomplete'
-                team_completions.append({
-                    'player_id': member.id,
-                    'player_name': member.name,
-                    'status': teammate_status
-                })
-        task_data['team_completions'] = team_completions
-        tasks_data.append(task_data)
-    
-    # 按照完成状态和截止日期排序
-    tasks_data.sort(key=lambda x: (
-        x['player_completion']['status'] == 'completed',  # 未完成的排前面
-        x['end_date'] if x['end_date'] else '9999-12-31'  # 截止日期近的排前面
-    ))
+    # 以固定数量的查询构建任务看板
+    tasks_data = build_player_task_board(player, status_filter)
     
     return JsonResponse({
         'code': 200,
@@ -347,6 +217,45 @@ def complete_task(request):
     except Exception as e:
         return JsonResponse({'code': 500, 'message': f'服务器错误: {str(e)}'}, status=500)
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def batch_complete_tasks(request):
+    """
+    批量打卡（小程序离线缓存的打卡联网后一次提交）
+
+    请求体：completions 列表，每条包含 player_id、task_id，可选 completed_at（客户端打卡时间，
+    毫秒时间戳或ISO格式）、notes、attachment 和 client_id（客户端幂等键）。
+    同一队员同一任务同一天重复提交时返回已有记录，客户端可安全重试。
+    """
+    principal, error_response = require_principal(request, 'parent')
+    if error_response:
+        return error_response
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'code': 400, 'message': '无效的请求数据格式'}, status=400)
+
+    completions = data.get('completions') if isinstance(data, dict) else None
+    max_batch_size = sync_settings().get('MAX_BATCH_SIZE', 100)
+    if not isinstance(completions, list) or not completions or len(completions) > max_batch_size:
+        return JsonResponse({'code': 400, 'message': f'completions应为1到{max_batch_size}条打卡'}, status=400)
+
+    try:
+        results = sync_completions(get_owned_player_ids(principal.user_id), completions)
+    except Exception as e:
+        logger.error(f"批量打卡出错: {str(e)}")
+        return JsonResponse({'code': 500, 'message': f'服务器错误: {str(e)}'}, status=500)
+
+    return JsonResponse({
+        'code': 200,
+        'message': '同步完成',
+        'data': {
+            'created': sum(1 for result in results if result['result'] == CREATED),
+            'results': results,
+        }
+    })
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_task_details(request):
@@ -399,6 +308,10 @@ def get_task_details(request):
     
     team_members = team.players.all()
     
+    # 一次性读取所有队员的连续完成天数和头像缩略图
+    member_streaks = get_task_streaks([task.id], [member.id for member in team_members])
+    member_thumbnails = thumbnail_urls([member.avatar for member in team_members])
+    
     # 获取队员完成情况
     team_completions = []
     
@@ -417,11 +330,13 @@ def get_task_details(request):
             ).first()
         
         # 获取队员的连续完成天数
-        member_streak = task.get_task_streak(member)
+        member_streak = member_streaks.get((task.id, member.id), 0)
         
         member_data = {
             'player_id': member.id,
             'player_name': member.name,
+            'avatar_url': member.avatar,
+            'avatar_thumbnail': member_thumbnails.get(member.avatar),
             'streak': member_streak,
             'jersey_number': member.jersey_number,
             'status': 'completed' if completion and completion.verified else 'pending' if completion else 'incomplete',
@@ -508,6 +423,14 @@ def get_team_task_stats(request):
         Q(end_date__isnull=True) | Q(end_date__gte=today)
     )
     
+    # 一次性读取队员在所有活跃任务上的连续完成天数
+    players = list(team.players.all())
+    player_streak_map = get_task_streaks(
+        [task.id for task in active_tasks],
+        [p.id for p in players]
+    )
+    player_thumbnails = thumbnail_urls([p.avatar for p in players])
+    
     # 获取每个任务的统计数据
     tasks_stats = []
     
@@ -549,11 +472,10 @@ def get_team_task_stats(request):
             ).exists()
         
         # 队员任务连续完成天数
-        streak = task.get_task_streak(player)
+        streak = player_streak_map.get((task.id, player.id), 0)
         
         # 排名数据 - 按连续完成天数排序
-        players = team.players.all()
-        player_streaks = [(p, task.get_task_streak(p)) for p in players]
+        player_streaks = [(p, player_streak_map.get((task.id, p.id), 0)) for p in players]
         player_streaks.sort(key=lambda x: x[1], reverse=True)
         
         # 取连续天数前三的队员
@@ -564,6 +486,7 @@ def get_team_task_stats(request):
                 'player_id': p.id,
                 'player_name': p.name,
                 'avatar_url': p.avatar,
+                'avatar_thumbnail': player_thumbnails.get(p.avatar),
                 'jersey_number': p.jersey_number,
                 'streak': p_streak
             })
@@ -738,17 +661,12 @@ def assign_task_to_team(request):
             }, status=400)
         
         # 验证token
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return JsonResponse({'code': 401, 'message': '未登录'}, status=401)
-        
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            if payload.get('user_type') != 'coach':
-                return JsonResponse({'code': 403, 'message': '无权分配任务'}, status=403)
-            coach_id = payload.get('user_id')
-        except (jwt.InvalidTokenError, Coach.DoesNotExist):
-            return JsonResponse({'code': 401, 'message': '无效的token或教练不存在'}, status=401)
+        principal, error_response = require_principal(request)
+        if error_response:
+            return error_response
+        if not principal.is_coach:
+            return JsonResponse({'code': 403, 'message': '无权分配任务'}, status=403)
+        coach_id = principal.user_id
         
         # 验证任务和队伍是否存在
         try:
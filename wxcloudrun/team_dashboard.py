@@ -0,0 +1,276 @@
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from .models import Task, TaskCompletion, TaskStreak, Team, TeamTaskDailyStat
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+def _dashboard_settings():
+    return getattr(settings, 'TEAM_DASHBOARD_SETTINGS', {})
+
+def _team_members(team_ids):
+    """{队伍ID: 队员ID集合}"""
+    members = defaultdict(set)
+    for team_id, player_id in Team.players.through.objects.filter(
+        team_id__in=team_ids
+    ).values_list('team_id', 'player_id'):
+        members[team_id].add(player_id)
+    return members
+
+def _aggregate(completion_rows, task_teams, members):
+    """
+    按 (队伍, 任务, 日期) 汇总完成记录
+
+    只统计任务所属队伍中的队员的记录。
+
+    Args:
+        completion_rows: [(task_id, player_id, completion_date, verified)]
+        task_teams: {任务ID: 队伍ID列表}
+        members: {队伍ID: 队员ID集合}
+
+    Returns:
+        dict: {(team_id, task_id, date): [提交人数, 已验证人数]}
+    """
+    counts = defaultdict(lambda: [0, 0])
+    for task_id, player_id, completion_date, verified in completion_rows:
+        for team_id in task_teams.get(task_id, ()):
+            if player_id in members.get(team_id, ()):
+                entry = counts[(team_id, task_id, completion_date)]
+                entry[0] += 1
+                if verified:
+                    entry[1] += 1
+    return counts
+
+def _stat_objects(counts):
+    return [
+        TeamTaskDailyStat(
+            team_id=team_id,
+            task_id=task_id,
+            date=stat_date,
+            completed_count=completed,
+            verified_count=verified,
+            pending_count=completed - verified,
+        )
+        for (team_id, task_id, stat_date), (completed, verified) in counts.items()
+    ]
+
+def refresh_daily_stats(task_id, stat_date):
+    """
+    重新计算某任务某天在各队伍的汇总（完成记录新增、审核或删除后调用）
+
+    任务行加锁，同一任务的刷新和重建依次执行。
+    """
+    return refresh_daily_stats_bulk([task_id], [stat_date])
+
+def refresh_daily_stats_bulk(task_ids, dates):
+    """
+    重新计算多个任务在多个日期的汇总（批量审核等场景一次完成）
+
+    Args:
+        task_ids: 任务ID列表
+        dates: 日期列表，重新计算 task_ids × dates 的全部组合
+
+    Returns:
+        int: 写入的汇总行数
+    """
+    with transaction.atomic():
+        task_ids = list(Task.objects.select_for_update().filter(id__in=task_ids).values_list('id', flat=True))
+        if not task_ids:
+            return 0
+
+        task_teams = defaultdict(list)
+        for task_id, team_id in Task.teams.through.objects.filter(task_id__in=task_ids).values_list('task_id', 'team_id'):
+            task_teams[task_id].append(team_id)
+        team_ids = {team_id for team_ids_of_task in task_teams.values() for team_id in team_ids_of_task}
+
+        rows = TaskCompletion.objects.filter(
+            task_id__in=task_ids, completion_date__in=dates
+        ).values_list('task_id', 'player_id', 'completion_date', 'verified')
+        counts = _aggregate(rows, task_teams, _team_members(team_ids))
+
+        TeamTaskDailyStat.objects.filter(task_id__in=task_ids, date__in=dates).delete()
+        TeamTaskDailyStat.objects.bulk_create(_stat_objects(counts), batch_size=1000)
+    return len(counts)
+
+def rebuild_daily_stats(team_ids=None, since=None):
+    """
+    根据完成记录重建汇总（回填和队伍成员、任务分配变化后使用）
+
+    Args:
+        team_ids: 需要重建的队伍ID列表，默认全部队伍
+        since: 只重建该日期及之后的汇总，默认全部日期
+
+    Returns:
+        int: 写入的汇总行数
+    """
+    links = Task.teams.through.objects.all()
+    if team_ids is not None:
+        links = links.filter(team_id__in=team_ids)
+    task_teams = defaultdict(list)
+    for task_id, team_id in links.values_list('task_id', 'team_id'):
+        task_teams[task_id].append(team_id)
+    scope_team_ids = {team_id for team_ids_of_task in task_teams.values() for team_id in team_ids_of_task}
+
+    with transaction.atomic():
+        # 任务行加锁，避免与增量刷新交错
+        list(Task.objects.select_for_update().filter(id__in=task_teams.keys()).values_list('id', flat=True))
+
+        completions = TaskCompletion.objects.filter(task_id__in=task_teams.keys())
+        if since:
+            completions = completions.filter(completion_date__gte=since)
+        rows = completions.values_list('task_id', 'player_id', 'completion_date', 'verified').iterator(chunk_size=2000)
+        counts = _aggregate(rows, task_teams, _team_members(scope_team_ids))
+
+        stale = TeamTaskDailyStat.objects.all()
+        if team_ids is not None:
+            stale = stale.filter(team_id__in=team_ids)
+        if since:
+            stale = stale.filter(date__gte=since)
+        stale.delete()
+        TeamTaskDailyStat.objects.bulk_create(_stat_objects(counts), batch_size=1000)
+
+    logger.info(f"队伍每日任务统计已重建：{len(counts)} 行")
+    return len(counts)
+
+def _streak_broken(period, last_date, today):
+    """上次完成之后已错过一个周期，连续记录中断"""
+    if period == 'daily':
+        return (today - last_date).days > 1
+    if period == 'weekly':
+        return (today - last_date).days > 7
+    if period == 'monthly':
+        return (today.year - last_date.year) * 12 + today.month - last_date.month > 1
+    return False
+
+def _task_active_on(task, day):
+    return task['task__start_date'] <= day and (task['task__end_date'] is None or task['task__end_date'] >= day)
+
+def build_team_dashboard(team_ids, weeks=None, today=None):
+    """
+    汇总教练看板数据
+
+    从每日汇总表读取完成情况，查询数量与队伍数量无关。
+    每日完成率只统计每日任务：已验证人次 / (队员数 × 当天有效的每日任务数)。
+
+    Args:
+        team_ids: 队伍ID列表
+        weeks: 统计最近几周，默认 DEFAULT_WEEKS
+        today: 统计截止日期，默认今天
+
+    Returns:
+        list: 每个队伍的看板数据
+    """
+    config = _dashboard_settings()
+    weeks = weeks or config.get('DEFAULT_WEEKS', 4)
+    today = today or date.today()
+    # 从 weeks 周前的周一开始
+    start_date = today - timedelta(days=today.weekday() + 7 * (weeks - 1))
+    days = [start_date + timedelta(days=offset) for offset in range((today - start_date).days + 1)]
+
+    teams = list(Team.objects.filter(id__in=team_ids).order_by('name', 'id').values('id', 'name'))
+    team_ids = [team['id'] for team in teams]
+
+    members = defaultdict(dict)
+    for team_id, player_id, player_name in Team.players.through.objects.filter(
+        team_id__in=team_ids
+    ).values_list('team_id', 'player_id', 'player__name'):
+        members[team_id][player_id] = player_name
+
+    team_tasks = defaultdict(list)
+    for task in Task.teams.through.objects.filter(team_id__in=team_ids).exclude(task__status='draft').values(
+        'team_id', 'task_id', 'task__title', 'task__period', 'task__status', 'task__start_date', 'task__end_date'
+    ):
+        team_tasks[task['team_id']].append(task)
+
+    # (队伍, 日期) -> [提交人次, 已验证人次, 每日任务已验证人次]
+    daily_counts = defaultdict(lambda: [0, 0, 0])
+    daily_task_ids = {
+        task['task_id'] for tasks in team_tasks.values() for task in tasks if task['task__period'] == 'daily'
+    }
+    for team_id, task_id, stat_date, completed, verified in TeamTaskDailyStat.objects.filter(
+        team_id__in=team_ids, date__range=(start_date, today)
+    ).values_list('team_id', 'task_id', 'date', 'completed_count', 'verified_count'):
+        entry = daily_counts[(team_id, stat_date)]
+        entry[0] += completed
+        entry[1] += verified
+        if task_id in daily_task_ids:
+            entry[2] += verified
+
+    pending = dict(TeamTaskDailyStat.objects.filter(
+        team_id__in=team_ids, pending_count__gt=0
+    ).values('team_id').order_by().annotate(pending=Sum('pending_count')).values_list('team_id', 'pending'))
+
+    # 连续记录中断的队员：仍在进行中的任务上曾连续完成，但已错过上一个周期
+    min_streak = config.get('AT_RISK_MIN_STREAK', 2)
+    active_tasks = {
+        task['task_id']: task for tasks in team_tasks.values() for task in tasks
+        if task['task__status'] == 'active' and task['task__period'] != 'once' and _task_active_on(task, today)
+    }
+    all_members = {player_id for team_members in members.values() for player_id in team_members}
+    broken = defaultdict(list)
+    for task_id, player_id, streak, last_date in TaskStreak.objects.filter(
+        task_id__in=active_tasks.keys(), player_id__in=all_members, current_streak__gte=min_streak
+    ).values_list('task_id', 'player_id', 'current_streak', 'last_completion_date'):
+        if last_date and _streak_broken(active_tasks[task_id]['task__period'], last_date, today):
+            broken[task_id].append((player_id, streak, last_date))
+
+    dashboards = []
+    for team in teams:
+        team_id = team['id']
+        team_members = members[team_id]
+        tasks = team_tasks[team_id]
+        daily_tasks = [task for task in tasks if task['task__period'] == 'daily']
+
+        daily = []
+        for day in days:
+            completed, verified, daily_verified = daily_counts.get((team_id, day), (0, 0, 0))
+            expected = len(team_members) * sum(1 for task in daily_tasks if _task_active_on(task, day))
+            daily.append({
+                'date': day.strftime('%Y-%m-%d'),
+                'completed': completed,
+                'verified': verified,
+                'expected': expected,
+                'completion_rate': round(daily_verified * 100 / expected) if expected else 0,
+                '_daily_verified': daily_verified,
+            })
+
+        trend = []
+        for week_start in range(0, len(daily), 7):
+            week = daily[week_start:week_start + 7]
+            expected = sum(item['expected'] for item in week)
+            daily_verified = sum(item['_daily_verified'] for item in week)
+            trend.append({
+                'week_start': week[0]['date'],
+                'completed': sum(item['completed'] for item in week),
+                'verified': sum(item['verified'] for item in week),
+                'completion_rate': round(daily_verified * 100 / expected) if expected else 0,
+            })
+        for item in daily:
+            del item['_daily_verified']
+
+        at_risk = []
+        for task in tasks:
+            for player_id, streak, last_date in broken.get(task['task_id'], ()):
+                if player_id in team_members:
+                    at_risk.append({
+                        'player_id': player_id,
+                        'player_name': team_members[player_id],
+                        'task_id': task['task_id'],
+                        'task_title': task['task__title'],
+                        'lost_streak': streak,
+                        'last_completion_date': last_date.strftime('%Y-%m-%d'),
+                    })
+        at_risk.sort(key=lambda item: (-item['lost_streak'], item['player_id']))
+
+        dashboards.append({
+            'team': {'id': team_id, 'name': team['name'], 'player_count': len(team_members)},
+            'pending_verification': pending.get(team_id, 0),
+            'daily': daily,
+            'weekly_trend': trend,
+            'at_risk_players': at_risk,
+        })
+    return dashboards
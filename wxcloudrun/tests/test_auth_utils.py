@@ -0,0 +1,32 @@
+import time
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, override_settings
+from wxcloudrun import auth_utils
+from wxcloudrun.models import Parent, Player
+from .utils import create_players
+
+@override_settings(PARENT_PLAYER_CACHE={'ALIAS': None, 'LOCAL_TTL': 5, 'TIMEOUT': 3600})
+class OwnedPlayersCacheTests(TestCase):
+    """未配置共享缓存时，进程内的绑定关系缓存同样按 LOCAL_TTL 过期"""
+
+    def setUp(self):
+        auth_utils.invalidate_owned_players()
+        self.addCleanup(auth_utils.invalidate_owned_players)
+        self.parent = Parent.objects.create(phone='13800000001')
+        self.player = create_players(1)[0]
+        self.player.parents.add(self.parent)
+
+    def test_binding_revoked_elsewhere_is_denied_after_ttl(self):
+        self.assertTrue(auth_utils.parent_owns_player(self.parent.id, self.player.id))
+
+        # 模拟其他进程或直接修改数据库解除绑定：不经过本进程的信号
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {Player.parents.through._meta.db_table} WHERE parent_id = %s', [self.parent.id]
+            )
+        self.assertTrue(auth_utils.parent_owns_player(self.parent.id, self.player.id))
+
+        expired = time.monotonic() + 6
+        with mock.patch.object(auth_utils.time, 'monotonic', return_value=expired):
+            self.assertFalse(auth_utils.parent_owns_player(self.parent.id, self.player.id))
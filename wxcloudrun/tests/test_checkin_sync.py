@@ -0,0 +1,93 @@
+import json
+from datetime import date, timedelta
+from unittest import mock
+from django.test import TestCase
+from wxcloudrun import checkin_sync
+from wxcloudrun.miniprogram_views import generate_token
+from wxcloudrun.models import Parent, TaskCompletion, TaskStreak
+from .utils import create_coach, create_players, create_task, create_team
+
+class BatchCompleteTasksTests(TestCase):
+    """离线打卡批量提交：幂等、回传 client_id、逐条校验、每批重算一次连续完成记录"""
+
+    @classmethod
+    def setUpTestData(cls):
+        coach = create_coach()
+        cls.own, cls.sibling, cls.other = create_players(3)
+        team = create_team('A队', coach, [cls.own, cls.sibling, cls.other])
+        other_team = create_team('B队', coach, [])
+        cls.daily = create_task('每日任务', [team], coach.user, 'daily')
+        cls.weekly = create_task('每周任务', [team], coach.user, 'weekly')
+        cls.other_team_task = create_task('B队任务', [other_team], coach.user, 'daily')
+        cls.parent = Parent.objects.create(phone='13800000002')
+        cls.own.parents.add(cls.parent)
+        cls.sibling.parents.add(cls.parent)
+
+    def _post(self, completions):
+        response = self.client.post(
+            '/api/player/batch_complete_tasks/',
+            data=json.dumps({'completions': completions}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f"Bearer {generate_token(self.parent.id, 'parent')}",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']
+
+    def _batch(self):
+        yesterday = (date.today() - timedelta(days=1)).isoformat()
+        return [
+            {'client_id': 'a-1', 'player_id': self.own.id, 'task_id': self.daily.id},
+            {'client_id': 'a-2', 'player_id': self.own.id, 'task_id': self.daily.id, 'completed_at': yesterday},
+            {'client_id': 'b-1', 'player_id': self.sibling.id, 'task_id': self.weekly.id, 'notes': '补传'},
+        ]
+
+    def test_replayed_batch_is_idempotent(self):
+        first = self._post(self._batch())
+        self.assertEqual(first['created'], 3)
+        count = TaskCompletion.objects.count()
+
+        second = self._post(self._batch())
+        self.assertEqual(second['created'], 0)
+        self.assertEqual(TaskCompletion.objects.count(), count)
+        self.assertEqual([result['result'] for result in second['results']], [checkin_sync.DUPLICATE] * 3)
+        # 除处理结果外，重复提交返回与第一次相同的记录
+        fields = ('client_id', 'completion_id', 'status', 'completion_date', 'streak')
+        self.assertEqual(
+            [{field: result[field] for field in fields} for result in first['results']],
+            [{field: result[field] for field in fields} for result in second['results']],
+        )
+
+    def test_client_id_is_echoed(self):
+        batch = self._batch() + [{'client_id': 'bad', 'player_id': 'x', 'task_id': self.daily.id}]
+        results = self._post(batch)['results']
+        self.assertEqual([result['client_id'] for result in results], ['a-1', 'a-2', 'b-1', 'bad'])
+
+    def test_invalid_and_foreign_items_are_rejected_individually(self):
+        results = self._post([
+            {'client_id': 'ok', 'player_id': self.own.id, 'task_id': self.daily.id},
+            {'client_id': 'foreign-player', 'player_id': self.other.id, 'task_id': self.daily.id},
+            {'client_id': 'missing-task', 'player_id': self.own.id, 'task_id': 999999},
+            {'client_id': 'foreign-task', 'player_id': self.own.id, 'task_id': self.other_team_task.id},
+            {'client_id': 'bool-id', 'player_id': True, 'task_id': self.daily.id},
+            {'client_id': 'string-id', 'player_id': str(self.own.id), 'task_id': self.daily.id},
+        ])['results']
+        self.assertEqual({result['client_id']: result['result'] for result in results}, {
+            'ok': checkin_sync.CREATED,
+            'foreign-player': checkin_sync.FORBIDDEN,
+            'missing-task': checkin_sync.NOT_FOUND,
+            'foreign-task': checkin_sync.FORBIDDEN,
+            'bool-id': checkin_sync.INVALID,
+            'string-id': checkin_sync.INVALID,
+        })
+        self.assertEqual(list(TaskCompletion.objects.values_list('player_id', 'task_id')), [(self.own.id, self.daily.id)])
+
+    def test_streaks_refreshed_once_per_batch(self):
+        with mock.patch.object(
+            checkin_sync, 'refresh_task_streaks', wraps=checkin_sync.refresh_task_streaks
+        ) as refresh:
+            results = self._post(self._batch())['results']
+        refresh.assert_called_once_with({(self.daily.id, self.own.id), (self.weekly.id, self.sibling.id)})
+
+        streak = TaskStreak.objects.get(task=self.daily, player=self.own)
+        self.assertEqual(streak.current_streak, 2)
+        self.assertEqual(results[0]['streak'], 2)
@@ -0,0 +1,84 @@
+import os
+from django.test import SimpleTestCase, override_settings
+from wxcloudrun.utils import cloud_storage
+from wxcloudrun.utils.cloud_storage import CloudStorage, storage_settings
+from wxcloudrun.utils.fake_cos import FakeCOSServer
+
+class CloudStorageTests(SimpleTestCase):
+    """对本地模拟的对象存储执行上传、分块上传和删除"""
+
+    def setUp(self):
+        self.server = FakeCOSServer().start()
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(CLOUD_STORAGE_SETTINGS={
+            **storage_settings(),
+            'BASE_URL': self.server.base_url,
+            'MAX_RETRIES': 3,
+            'BACKOFF_FACTOR': 0,
+            'MULTIPART_THRESHOLD': 64 * 1024,
+            'PART_SIZE': 16 * 1024,
+            'MULTIPART_CONCURRENCY': 2,
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cloud_storage.reset_session()
+        self.addCleanup(cloud_storage.reset_session)
+
+    def _requests(self, method, query=''):
+        return [path for request_method, path in self.server.request_log if request_method == method and query in path]
+
+    def test_upload_retries_server_errors(self):
+        self.server.fail_next('PUT', 2)
+        url = CloudStorage.upload_file(b'badge', 'a.png', 'badges', content_type='image/png')
+        self.assertEqual(url, f'{self.server.base_url}/badges/a.png')
+        self.assertEqual(self.server.objects['/badges/a.png'][0], b'badge')
+        self.assertEqual(len(self._requests('PUT')), 3)
+
+    def test_upload_gives_up_after_max_retries(self):
+        self.server.fail_next('PUT', 10)
+        self.assertIsNone(CloudStorage.upload_file(b'badge', 'a.png', 'badges'))
+        self.assertEqual(len(self._requests('PUT')), 4)
+
+    def test_multipart_upload(self):
+        data = os.urandom(100 * 1024)
+        url = CloudStorage.upload_file(data, 'big.bin', 'badges', cache_control='public, max-age=60')
+        self.assertIsNotNone(url)
+        body, metadata, _ = self.server.objects['/badges/big.bin']
+        self.assertEqual(body, data)
+        self.assertEqual(metadata['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(len(self._requests('PUT', 'partNumber=')), 7)
+        self.assertEqual(self.server.uploads, {})
+
+    def test_multipart_resumes_failed_parts(self):
+        # 超过单个请求的自动重试次数，分块需要续传
+        self.server.fail_next('PUT', 6, 'partNumber')
+        data = os.urandom(100 * 1024)
+        self.assertIsNotNone(CloudStorage.upload_file(data, 'big.bin', 'badges'))
+        self.assertEqual(self.server.objects['/badges/big.bin'][0], data)
+
+    def test_initiate_multipart_is_not_retried(self):
+        self.server.fail_next('POST', 1, 'uploads')
+        self.assertIsNone(CloudStorage.upload_file(os.urandom(100 * 1024), 'big.bin', 'badges'))
+        # 只发起一次初始化，不会留下未完成的上传ID
+        self.assertEqual(len(self._requests('POST', 'uploads')), 1)
+        self.assertEqual(self.server.uploads, {})
+
+    def test_complete_multipart_is_retried(self):
+        self.server.fail_next('POST', 2, 'uploadId')
+        self.assertIsNotNone(CloudStorage.upload_file(os.urandom(100 * 1024), 'big.bin', 'badges'))
+        self.assertEqual(len(self._requests('POST', 'uploadId')), 3)
+        self.assertEqual(len(self._requests('POST', 'uploads')), 1)
+        self.assertIn('/badges/big.bin', self.server.objects)
+
+    def test_failed_multipart_is_aborted(self):
+        self.server.fail_next('POST', 10, 'uploadId')
+        self.assertIsNone(CloudStorage.upload_file(os.urandom(100 * 1024), 'big.bin', 'badges'))
+        self.assertEqual(self.server.uploads, {})
+        self.assertNotIn('/badges/big.bin', self.server.objects)
+
+    def test_delete(self):
+        url = CloudStorage.upload_file(b'badge', 'a.png', 'badges')
+        self.server.fail_next('DELETE', 1)
+        self.assertTrue(CloudStorage.delete_file(url))
+        self.assertNotIn('/badges/a.png', self.server.objects)
+        self.assertFalse(CloudStorage.file_exists(url))
@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+from unittest import mock
+from django.test import TestCase
+from wxcloudrun import exports
+from wxcloudrun.models import TaskCompletion
+from .utils import create_coach, create_players, create_task, create_team
+
+class ExportRowsTests(TestCase):
+    """导出按键集分页逐批查询，行的顺序和数量与一次性查询相同"""
+
+    @classmethod
+    def setUpTestData(cls):
+        coach = create_coach()
+        players = create_players(4)
+        team = create_team('A队', coach, players)
+        tasks = [create_task(f'任务{index}', [team], coach.user) for index in range(3)]
+        today = date.today()
+        # 同一天有多条记录，分页边界落在相同日期中间
+        for player in players:
+            for index, task in enumerate(tasks):
+                TaskCompletion.objects.create(
+                    task=task, player=player, completion_date=today - timedelta(days=index % 2), verified=True
+                )
+
+    def test_pages_match_single_query(self):
+        queryset = TaskCompletion.objects.all()
+        expected = list(queryset.order_by('completion_date', 'id').values_list(
+            *[field for _, field in exports.COMPLETION_COLUMNS]
+        ))
+        with mock.patch.object(exports, 'CHUNK_SIZE', 5):
+            # 12 行，每批 5 行：3 次查询
+            with self.assertNumQueries(3):
+                rows = list(exports._export_rows('completions', queryset))
+        self.assertEqual(rows, expected)
+
+    def test_exact_multiple_of_chunk_size(self):
+        with mock.patch.object(exports, 'CHUNK_SIZE', 4):
+            rows = list(exports._export_rows('completions', TaskCompletion.objects.all()))
+        self.assertEqual(len(rows), 12)
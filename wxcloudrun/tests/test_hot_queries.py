@@ -0,0 +1,16 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from wxcloudrun.management.commands.explain_hot_queries import explain, hot_queries
+
+class HotQueryIndexTests(TestCase):
+    """热点查询的执行计划中不能出现对业务表的全表扫描（索引被删除或查询写法变化时失败）"""
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset, tables in hot_queries():
+            with self.subTest(name):
+                plan, full_scans, _ = explain(queryset)
+                self.assertFalse(full_scans & set(tables), f'{name} 全表扫描：\n{plan}')
+
+    def test_command_passes(self):
+        call_command('explain_hot_queries', stdout=StringIO())
@@ -0,0 +1,86 @@
+import io
+import tempfile
+from django.test import TestCase, override_settings
+from PIL import Image
+from wxcloudrun.image_pipeline import process_image, thumbnail_urls, variant_urls
+from wxcloudrun.media_store import get_backend
+from wxcloudrun.models import ImageAsset
+from wxcloudrun.upload_offload import _replace_urls, process_image_async
+from wxcloudrun.utils import cloud_storage
+from wxcloudrun.utils.cloud_storage import storage_settings
+from wxcloudrun.utils.fake_cos import FakeCOSServer
+
+def image_bytes(color='red', size=(600, 400)):
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, 'PNG')
+    return output.getvalue()
+
+class ImagePipelineTests(TestCase):
+    """同一张图片在不同存储、目录中分别保存"""
+
+    def setUp(self):
+        self.server = FakeCOSServer().start()
+        self.addCleanup(self.server.stop)
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root.name,
+            CLOUD_STORAGE_SETTINGS={**storage_settings(), 'BASE_URL': self.server.base_url, 'BACKOFF_FACTOR': 0},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cloud_storage.reset_session()
+        self.addCleanup(cloud_storage.reset_session)
+
+    def test_local_asset_is_not_reused_for_cloud(self):
+        data = image_bytes()
+        local = process_image(data, folder='badges', storage='local')
+        cloud = process_image(data, folder='badges', storage='cloud')
+
+        self.assertNotEqual(local.id, cloud.id)
+        local_urls = {variant.url for variant in local.variants.all()}
+        cloud_urls = {variant.url for variant in cloud.variants.all()}
+        self.assertTrue(local_urls.isdisjoint(cloud_urls))
+        self.assertTrue(all(url.startswith('/media/badges/') for url in local_urls))
+        self.assertTrue(all(url.startswith(f'{self.server.base_url}/badges/') for url in cloud_urls))
+        self.assertEqual(len(self.server.objects), len(cloud_urls))
+
+    def test_reuse_within_same_storage_and_folder(self):
+        data = image_bytes()
+        first = process_image(data, folder='badges', storage='cloud')
+        requests = len(self.server.request_log)
+        self.assertEqual(process_image(data, folder='badges', storage='cloud').id, first.id)
+        self.assertEqual(len(self.server.request_log), requests)
+
+        other = process_image(data, folder='covers', storage='cloud')
+        self.assertNotEqual(other.id, first.id)
+        self.assertTrue(all('/covers/' in variant.url for variant in other.variants.all()))
+        self.assertEqual(ImageAsset.objects.count(), 2)
+
+    def test_thumbnail_prefers_same_location(self):
+        data = image_bytes()
+        local = process_image(data, folder='avatars', storage='local')
+        cloud = process_image(data, folder='avatars', storage='cloud')
+        local_original = variant_urls(local)[512]['jpeg']
+        cloud_original = variant_urls(cloud)[512]['jpeg']
+
+        thumbnails = thumbnail_urls([local_original, cloud_original])
+        self.assertEqual(thumbnails[local_original], variant_urls(local)[128]['jpeg'])
+        self.assertEqual(thumbnails[cloud_original], variant_urls(cloud)[128]['jpeg'])
+
+    def test_async_reuses_uploaded_asset(self):
+        data = image_bytes()
+        cloud = process_image(data, folder='badges', storage='cloud')
+        asset, job = process_image_async(data, folder='badges')
+        self.assertEqual(asset.id, cloud.id)
+        self.assertIsNone(job)
+
+    def test_uploaded_local_asset_moves_to_cloud(self):
+        asset, job = process_image_async(image_bytes(), folder='badges')
+        self.assertEqual(asset.storage, 'local')
+        cloud = get_backend('cloud')
+        _replace_urls({upload_file.local_url: cloud.url(upload_file.key) for upload_file in job.files.all()})
+
+        asset.refresh_from_db()
+        self.assertEqual(asset.storage, 'cloud')
+        self.assertTrue(all(variant.url.startswith(self.server.base_url) for variant in asset.variants.all()))
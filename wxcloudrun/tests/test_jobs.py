@@ -0,0 +1,44 @@
+import time
+from datetime import datetime, timedelta
+from django.test import TestCase, TransactionTestCase
+from wxcloudrun import jobs
+from wxcloudrun.background import renew_lease
+from wxcloudrun.models import ImportJob
+
+def create_job(status, lease_seconds):
+    return ImportJob.objects.create(
+        file_name='players.xlsx', status=status,
+        lease_until=datetime.now() + timedelta(seconds=lease_seconds) if lease_seconds is not None else None,
+    )
+
+class StaleImportJobTests(TestCase):
+    """服务启动时只处理租约已过期的导入任务，其他进程中仍在执行的任务不受影响"""
+
+    def test_claims_only_expired_jobs(self):
+        stale_running = create_job('running', -60)
+        live_running = create_job('running', 300)
+        stale_pending = create_job('pending', -60)
+        legacy_pending = create_job('pending', None)
+        fresh_pending = create_job('pending', 300)
+
+        interrupted, claimed = jobs.claim_stale_jobs()
+
+        self.assertEqual(interrupted, 1)
+        self.assertCountEqual(claimed, [stale_pending.id, legacy_pending.id])
+        statuses = dict(ImportJob.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[stale_running.id], 'failed')
+        self.assertEqual(statuses[live_running.id], 'running')
+        self.assertEqual(statuses[fresh_pending.id], 'pending')
+        # 认领时已续约，再次恢复（如另一个 worker 同时启动）不会重复认领
+        self.assertEqual(jobs.claim_stale_jobs(), (0, []))
+
+class RenewLeaseTests(TransactionTestCase):
+    """执行期间由续约线程更新租约"""
+
+    def test_lease_is_renewed_while_running(self):
+        job = create_job('running', 0.05)
+        with renew_lease(ImportJob.objects.filter(id=job.id, status='running'), 0.3):
+            time.sleep(0.4)
+        job.refresh_from_db()
+        self.assertGreater(job.lease_until, datetime.now())
+        self.assertEqual(jobs.claim_stale_jobs(), (0, []))
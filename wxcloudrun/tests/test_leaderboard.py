@@ -0,0 +1,22 @@
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from wxcloudrun.models import PlayerPoints
+from .utils import create_players
+
+class VerifyLeaderboardCommandTests(TestCase):
+    """排行榜校验命令在不一致且未修复时失败，可用于定时任务和 CI"""
+
+    def setUp(self):
+        player = create_players(1)[0]
+        # 没有任何成就的队员却有积分
+        PlayerPoints.objects.create(player=player, achievement_points=10, bonus_points=0, total_points=10)
+
+    def test_fails_on_mismatch(self):
+        with self.assertRaises(CommandError):
+            call_command('verify_leaderboard', stdout=StringIO())
+
+    def test_fix_repairs_and_succeeds(self):
+        call_command('verify_leaderboard', '--fix', stdout=StringIO())
+        call_command('verify_leaderboard', stdout=StringIO())
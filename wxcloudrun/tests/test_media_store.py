@@ -0,0 +1,68 @@
+import os
+import tempfile
+import time
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from wxcloudrun import media_store
+from wxcloudrun.utils import cloud_storage
+from wxcloudrun.utils.cloud_storage import storage_settings
+from wxcloudrun.utils.fake_cos import FakeCOSServer
+
+# 早于清理宽限期的修改时间
+OLD = time.time() - 3 * 24 * 3600
+
+class DeduplicatedUploadGCTests(TestCase):
+    """重复上传命中已有文件时更新修改时间，清理任务不会删除刚被重新使用的文件"""
+
+    def setUp(self):
+        self.server = FakeCOSServer().start()
+        self.addCleanup(self.server.stop)
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root.name,
+            CLOUD_STORAGE_SETTINGS={**storage_settings(), 'BASE_URL': self.server.base_url, 'BACKOFF_FACTOR': 0},
+            MEDIA_STORE_SETTINGS={**media_store.store_settings(), 'GC_PREFIXES': ['badges'], 'GC_GRACE_HOURS': 24},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cloud_storage.reset_session()
+        self.addCleanup(cloud_storage.reset_session)
+
+    def _gc(self, storage):
+        call_command('gc_media', '--delete', '--storage', storage, stdout=StringIO())
+
+    def test_local_dedup_then_gc(self):
+        local = media_store.get_backend('local')
+        reused_url = media_store.save(b'reused', 'badges', '.png', 'image/png', storage='local')
+        orphan_url = media_store.save(b'orphan', 'badges', '.png', 'image/png', storage='local')
+        for url in (reused_url, orphan_url):
+            os.utime(local._path(local.key_from_url(url)), (OLD, OLD))
+
+        self.assertEqual(media_store.save(b'reused', 'badges', '.png', 'image/png', storage='local'), reused_url)
+        self._gc('local')
+
+        self.assertTrue(local.exists(local.key_from_url(reused_url)))
+        self.assertFalse(local.exists(local.key_from_url(orphan_url)))
+
+    def test_cloud_dedup_then_gc(self):
+        reused_url = media_store.save(b'reused', 'badges', '.png', 'image/png', storage='cloud')
+        orphan_url = media_store.save(b'orphan', 'badges', '.png', 'image/png', storage='cloud')
+        for url in (reused_url, orphan_url):
+            key = url[len(self.server.base_url):]
+            body, metadata, _ = self.server.objects[key]
+            self.server.objects[key] = (body, metadata, OLD)
+
+        uploads = len([1 for method, _ in self.server.request_log if method == 'PUT'])
+        self.assertEqual(media_store.save(b'reused', 'badges', '.png', 'image/png', storage='cloud'), reused_url)
+        # 只复制更新修改时间，不重新上传内容
+        self.assertEqual(len([1 for method, _ in self.server.request_log if method == 'PUT']), uploads + 1)
+        body, metadata, _ = self.server.objects[reused_url[len(self.server.base_url):]]
+        self.assertEqual(body, b'reused')
+        self.assertEqual(metadata['Cache-Control'], media_store.immutable_cache_control())
+
+        self._gc('cloud')
+
+        self.assertIn(reused_url[len(self.server.base_url):], self.server.objects)
+        self.assertNotIn(orphan_url[len(self.server.base_url):], self.server.objects)
@@ -0,0 +1,43 @@
+import tempfile
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from wxcloudrun.metrics import metrics_settings, registry
+from wxcloudrun.query_budget import endpoint_stats
+
+PUBLIC_ADDR = '203.0.113.5'
+
+@override_settings(DEBUG=False)
+class QueryBudgetMiddlewareTests(TestCase):
+    def setUp(self):
+        endpoint_stats.flush()
+
+    def test_unmatched_paths_share_one_key(self):
+        for index in range(5):
+            self.client.get(f'/scan/{index}.php', REMOTE_ADDR=PUBLIC_ADDR)
+        self.assertEqual(list(endpoint_stats._stats), ['unmatched'])
+        self.assertEqual(endpoint_stats._stats['unmatched'][0], 5)
+
+    def test_server_timing_hidden_from_public_requests(self):
+        response = self.client.get('/health/', REMOTE_ADDR=PUBLIC_ADDR)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_server_timing_for_internal_and_authenticated_requests(self):
+        self.assertIn('Server-Timing', self.client.get('/health/', REMOTE_ADDR='127.0.0.1'))
+
+        self.client.force_login(User.objects.create(username='staff', is_staff=True))
+        self.assertIn('Server-Timing', self.client.get('/health/', REMOTE_ADDR=PUBLIC_ADDR))
+
+    @override_settings(DEBUG=True)
+    def test_server_timing_in_debug(self):
+        self.assertIn('Server-Timing', self.client.get('/health/', REMOTE_ADDR=PUBLIC_ADDR))
+
+class MetricsMiddlewareTests(TestCase):
+    def test_flush_failure_does_not_fail_request(self):
+        # 多进程目录指向一个普通文件，写入指标文件必然失败
+        with tempfile.NamedTemporaryFile() as not_a_directory, \
+                override_settings(METRICS_SETTINGS={**metrics_settings(), 'MULTIPROC_DIR': not_a_directory.name}):
+            registry._last_flush = 0.0
+            with self.assertLogs('log', level='ERROR') as logs:
+                response = self.client.get('/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('写入监控指标文件出错', logs.output[0])
@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+from io import StringIO
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+class StartupTests(SimpleTestCase):
+    """服务启动时不导入 pandas、Pillow 等只在用到时才需要的依赖"""
+
+    def _modules_after_setup(self):
+        # 在新进程中执行，当前测试进程可能已经导入过这些模块
+        result = subprocess.run(
+            [sys.executable, '-c', 'import sys, django; django.setup(); print("\\n".join(sys.modules))'],
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE},
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return set(result.stdout.split())
+
+    def test_django_setup_does_not_import_pandas(self):
+        modules = self._modules_after_setup()
+        self.assertFalse([name for name in modules if name == 'pandas' or name.startswith('pandas.')])
+
+    def test_heavy_modules_are_not_imported_at_startup(self):
+        stdout = StringIO()
+        call_command('profile_startup', '--top', '1', stdout=stdout)
+        self.assertIn('启动时未导入', stdout.getvalue())
@@ -0,0 +1,77 @@
+from datetime import date, timedelta
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from wxcloudrun.models import TaskCompletion, TaskStreak
+from wxcloudrun.task_utils import summarize_streaks, summarize_streaks_bulk
+from .utils import create_coach, create_players, create_task, create_team
+
+class MonthlyStreakTests(SimpleTestCase):
+    dates = [date(2025, 11, 5), date(2025, 12, 20), date(2026, 1, 3), date(2026, 2, 28), date(2026, 4, 1)]
+
+    def test_month_streak_crosses_year(self):
+        # 11月 -> 12月 -> 次年1月 -> 2月 连续，4月重新开始
+        self.assertEqual(summarize_streaks('monthly', self.dates), (1, 4, date(2026, 4, 1)))
+        self.assertEqual(summarize_streaks('monthly', self.dates[:4]), (4, 4, date(2026, 2, 28)))
+
+    def test_same_month_number_in_different_years_is_not_consecutive(self):
+        self.assertEqual(summarize_streaks('monthly', [date(2024, 12, 1), date(2026, 1, 1)])[:2], (1, 1))
+
+    def test_bulk_matches_single(self):
+        periods = {1: 'monthly', 2: 'monthly'}
+        rows = [(1, 7, d) for d in self.dates] + [(2, 7, d) for d in self.dates[:4]]
+        self.assertEqual(summarize_streaks_bulk(rows, periods), {
+            (1, 7): summarize_streaks('monthly', self.dates),
+            (2, 7): summarize_streaks('monthly', self.dates[:4]),
+        })
+
+class CompletionSignalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        coach = create_coach()
+        cls.player = create_players(1)[0]
+        team = create_team('A队', coach, [cls.player])
+        cls.task = create_task('每日任务', [team], coach.user, 'daily')
+
+    def _complete(self, days_ago, verified):
+        return TaskCompletion.objects.create(
+            task=self.task, player=self.player, completion_date=date.today() - timedelta(days=days_ago), verified=verified
+        )
+
+    def _streak(self):
+        return TaskStreak.objects.get(task=self.task, player=self.player).current_streak
+
+    def test_edits_that_do_not_affect_streak_are_skipped(self):
+        verified = self._complete(1, True)
+        pending = self._complete(0, False)
+        with mock.patch('wxcloudrun.signals.record_completion') as record:
+            verified = TaskCompletion.objects.get(id=verified.id)
+            verified.notes = '补充说明'
+            verified.save()
+            pending = TaskCompletion.objects.get(id=pending.id)
+            pending.completion_date -= timedelta(days=5)
+            pending.proof = 'proof.jpg'
+            pending.save()
+        record.assert_not_called()
+
+    def test_verify_and_reject_update_streak(self):
+        self._complete(1, True)
+        completion = self._complete(0, False)
+        self.assertEqual(self._streak(), 1)
+
+        completion = TaskCompletion.objects.get(id=completion.id)
+        completion.verified = True
+        completion.save()
+        self.assertEqual(self._streak(), 2)
+
+        completion.verified = False
+        completion.save()
+        self.assertEqual(self._streak(), 1)
+
+    def test_changing_verified_date_updates_streak(self):
+        self._complete(2, True)
+        completion = self._complete(0, True)
+        self.assertEqual(self._streak(), 1)
+        completion = TaskCompletion.objects.get(id=completion.id)
+        completion.completion_date = date.today() - timedelta(days=1)
+        completion.save()
+        self.assertEqual(self._streak(), 2)
@@ -0,0 +1,71 @@
+from datetime import date, timedelta
+from django.test import TestCase
+from wxcloudrun.models import TaskCompletion
+from wxcloudrun.task_board import build_player_task_board
+from .utils import create_coach, create_players, create_task, create_team
+
+class PlayerTaskBoardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        coach = create_coach()
+        cls.players = create_players(8)
+        cls.player = cls.players[0]
+        team_a = create_team('A队', coach, cls.players)
+        team_b = create_team('B队', coach, cls.players[:4])
+        cls.tasks = {
+            'once': create_task('一次性任务', [team_a], coach.user, 'once'),
+            'daily': create_task('每日任务', [team_a, team_b], coach.user, 'daily'),
+            'weekly': create_task('每周任务', [team_b], coach.user, 'weekly'),
+            'monthly': create_task('每月任务', [team_a], coach.user, 'monthly'),
+            'once_shared': create_task('一次性共同任务', [team_a, team_b], coach.user, 'once'),
+            'daily_other': create_task('每日练习', [team_b], coach.user, 'daily'),
+        }
+        today = date.today()
+        # 一次性任务：几天前的已验证记录仍算完成
+        TaskCompletion.objects.create(
+            task=cls.tasks['once'], player=cls.player, completion_date=today - timedelta(days=3), verified=True
+        )
+        # 周期性任务：只看当天记录，昨天的记录不算
+        TaskCompletion.objects.create(
+            task=cls.tasks['daily'], player=cls.player, completion_date=today - timedelta(days=1), verified=True
+        )
+        TaskCompletion.objects.create(
+            task=cls.tasks['weekly'], player=cls.player, completion_date=today, verified=False
+        )
+        for member in cls.players[1:5]:
+            TaskCompletion.objects.create(
+                task=cls.tasks['monthly'], player=member, completion_date=today, verified=True
+            )
+
+    def test_query_count_is_constant(self):
+        with self.assertNumQueries(6):
+            board = build_player_task_board(self.player)
+        self.assertEqual(len(board), len(self.tasks))
+
+    def test_query_count_does_not_grow_with_board_size(self):
+        coach = create_coach('coach_large')
+        players = create_players(30, '大看板队员')
+        teams = [create_team(f'大看板{index}队', coach, players[index * 5:]) for index in range(4)]
+        for index in range(24):
+            period = ('once', 'daily', 'weekly', 'monthly')[index % 4]
+            task = create_task(f'大看板任务{index}', teams[index % 4:index % 4 + 2], coach.user, period)
+            for member in players[::3]:
+                TaskCompletion.objects.create(task=task, player=member, completion_date=date.today(), verified=True)
+
+        # 队伍、任务、成员和完成记录都是小看板的数倍，查询次数不变
+        with self.assertNumQueries(6):
+            board = build_player_task_board(players[-1])
+        self.assertEqual(len(board), 24)
+
+    def test_once_and_periodic_status(self):
+        board = {task['id']: task for task in build_player_task_board(self.player)}
+        self.assertEqual(board[self.tasks['once'].id]['player_completion']['status'], 'completed')
+        self.assertEqual(board[self.tasks['daily'].id]['player_completion']['status'], 'incomplete')
+        self.assertEqual(board[self.tasks['weekly'].id]['player_completion']['status'], 'pending')
+
+        monthly = board[self.tasks['monthly'].id]
+        self.assertEqual(monthly['player_completion']['status'], 'incomplete')
+        self.assertEqual(monthly['team_progress'], {'percentage': 50, 'completed': 4, 'total': 8})
+        statuses = {row['player_id']: row['status'] for row in monthly['team_completions']}
+        self.assertEqual(statuses[self.players[1].id], 'completed')
+        self.assertEqual(statuses[self.players[5].id], 'incomplete')
@@ -0,0 +1,161 @@
+import importlib
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+from django.test import TestCase, TransactionTestCase, override_settings
+from wxcloudrun import media_store, upload_offload
+from wxcloudrun.models import AchievementCategory, Player, UploadJob
+from wxcloudrun.utils import cloud_storage
+from wxcloudrun.utils.cloud_storage import storage_settings
+from wxcloudrun.utils.fake_cos import FakeCOSServer
+from .utils import create_players
+
+class StaleUploadJobTests(TestCase):
+    """进程退出后未完成的上传任务按租约由任一进程接手"""
+
+    def _job(self, status, lease_seconds, host='old-container'):
+        return UploadJob.objects.create(
+            file_name='a.png', host=host, status=status,
+            lease_until=datetime.now() + timedelta(seconds=lease_seconds),
+        )
+
+    def test_claims_expired_jobs_from_any_host(self):
+        stale_running = self._job('running', -60)
+        stale_pending = self._job('pending', -60)
+        without_lease = UploadJob.objects.create(file_name='b.png', host='old-container', status='pending')
+        live = self._job('running', 300)
+        self._job('succeeded', -60)
+        self._job('failed', -60)
+
+        claimed = upload_offload.claim_stale_jobs()
+
+        self.assertCountEqual(claimed, [stale_running.id, stale_pending.id, without_lease.id])
+        for job in UploadJob.objects.filter(id__in=claimed):
+            self.assertEqual(job.status, 'pending')
+            self.assertGreater(job.lease_until, datetime.now())
+        live.refresh_from_db()
+        self.assertEqual(live.status, 'running')
+        # 已认领的任务续约后不会被再次认领
+        self.assertEqual(upload_offload.claim_stale_jobs(), [])
+
+    def test_importing_wsgi_starts_no_threads(self):
+        import wxcloudrun.wsgi
+        before = {thread.name for thread in threading.enumerate()}
+        importlib.reload(wxcloudrun.wsgi)
+        started = {thread.name for thread in threading.enumerate()} - before
+        self.assertFalse([name for name in started if name.startswith('wxcloudrun-upload')])
+
+class RunUploadTests(TransactionTestCase):
+    """
+    上传到本地模拟的对象存储并替换记录中的临时地址
+
+    run_upload 结束时释放线程的数据库连接，使用 TransactionTestCase 而不是在测试事务中执行。
+    """
+
+    def setUp(self):
+        self.server = FakeCOSServer().start()
+        self.addCleanup(self.server.stop)
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root.name,
+            CLOUD_STORAGE_SETTINGS={
+                **storage_settings(), 'BASE_URL': self.server.base_url, 'MAX_RETRIES': 0, 'BACKOFF_FACTOR': 0,
+            },
+            UPLOAD_OFFLOAD_SETTINGS={'WORKERS': 1, 'MAX_ATTEMPTS': 2, 'RETRY_DELAY': 30, 'LEASE_SECONDS': 600},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cloud_storage.reset_session()
+        self.addCleanup(cloud_storage.reset_session)
+        self.player = create_players(1)[0]
+
+    def _save_async(self, content=b'badge'):
+        # 测试中手动执行任务，不提交到线程池
+        with mock.patch.object(upload_offload, 'submit_upload'):
+            local_url, job = upload_offload.save_async(content, 'badges', '.png', 'image/png')
+        key = media_store.get_backend('local').key_from_url(local_url)
+        return local_url, job, key
+
+    def test_upload_replaces_provisional_urls(self):
+        local_url, job, key = self._save_async()
+        Player.objects.filter(id=self.player.id).update(avatar=local_url)
+        category = AchievementCategory.objects.create(name='训练', cover_image=local_url)
+
+        upload_offload.run_upload(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.attempts, 1)
+        final_url = f'{self.server.base_url}/{key}'
+        self.assertEqual(self.server.objects[f'/{key}'][0], b'badge')
+        self.assertEqual(job.files.get().final_url, final_url)
+        self.player.refresh_from_db()
+        category.refresh_from_db()
+        self.assertEqual(self.player.avatar, final_url)
+        self.assertEqual(category.cover_image, final_url)
+
+    def test_retry_then_failure(self):
+        local_url, job, _ = self._save_async()
+        Player.objects.filter(id=self.player.id).update(avatar=local_url)
+        self.server.fail_next('PUT', 100)
+
+        with mock.patch.object(upload_offload.threading, 'Timer') as timer:
+            upload_offload.run_upload(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertTrue(job.message.startswith('上传失败，等待重试'))
+        self.assertEqual(timer.call_args[0][0], 30)
+        timer.return_value.start.assert_called_once_with()
+        # 等待重试期间租约不会过期，不会被其他进程认领
+        self.assertGreater(job.lease_until, datetime.now() + timedelta(seconds=30))
+        self.assertEqual(upload_offload.claim_stale_jobs(), [])
+
+        with mock.patch.object(upload_offload.threading, 'Timer') as timer:
+            upload_offload.run_upload(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertTrue(job.message.startswith('上传失败：'))
+        timer.assert_not_called()
+        self.player.refresh_from_db()
+        self.assertEqual(self.player.avatar, local_url)
+
+    def test_missing_staged_file_fails_without_retry(self):
+        _, job, key = self._save_async()
+        os.remove(media_store.get_backend('local')._path(key))
+
+        with mock.patch.object(upload_offload.threading, 'Timer') as timer:
+            upload_offload.run_upload(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('暂存文件丢失', job.message)
+        timer.assert_not_called()
+
+    def test_pre_save_resolves_finished_upload(self):
+        # 管理员上传后填写表单期间上传已完成，保存表单时仍是临时地址
+        local_url, job, key = self._save_async()
+        upload_offload.run_upload(job.id)
+
+        self.player.avatar = local_url
+        self.player.save()
+        self.player.refresh_from_db()
+        self.assertEqual(self.player.avatar, f'{self.server.base_url}/{key}')
+
+    def test_replay_uploads_recovers_stale_jobs(self):
+        local_url, job, _ = self._save_async()
+        Player.objects.filter(id=self.player.id).update(avatar=local_url)
+        UploadJob.objects.filter(id=job.id).update(status='running', lease_until=datetime.now() - timedelta(minutes=1))
+
+        upload_offload.replay_uploads()
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            job.refresh_from_db()
+            if job.status == 'succeeded':
+                break
+            time.sleep(0.05)
+        self.assertEqual(job.status, 'succeeded')
+        self.player.refresh_from_db()
+        self.assertTrue(self.player.avatar.startswith(self.server.base_url))
@@ -0,0 +1,56 @@
+import json
+from datetime import date, timedelta
+from unittest import mock
+from django.test import TestCase
+from wxcloudrun.miniprogram_views import generate_token
+from wxcloudrun.models import TaskCompletion
+from .utils import create_coach, create_players, create_task, create_team
+
+class VerifyCompletionsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach = create_coach('coach_a')
+        other_coach = create_coach('coach_b')
+        cls.players = create_players(3)
+        team_a = create_team('A队', cls.coach, cls.players)
+        # 队员0同时在B队，B队的任务不属于A队教练
+        team_b = create_team('B队', other_coach, cls.players[:1])
+        cls.own_task = create_task('A队任务', [team_a], cls.coach.user)
+        cls.other_task = create_task('B队任务', [team_b], other_coach.user)
+        today = date.today()
+        cls.own = [
+            TaskCompletion.objects.create(task=cls.own_task, player=player, completion_date=today - timedelta(days=days))
+            for player in cls.players for days in range(2)
+        ]
+        cls.other = TaskCompletion.objects.create(task=cls.other_task, player=cls.players[0], completion_date=today)
+
+    def _verify(self, payload):
+        response = self.client.post(
+            '/api/coach/verify_completions/', json.dumps(payload), content_type='application/json',
+            HTTP_AUTHORIZATION=f"Bearer {generate_token(self.coach.id, 'coach')}"
+        )
+        return response.status_code, response.json()
+
+    def test_cannot_verify_other_teams_task(self):
+        status, body = self._verify({'completion_ids': [self.other.id, self.own[0].id]})
+        self.assertEqual(status, 200)
+        results = {row['completion_id']: row['result'] for row in body['data']['results']}
+        self.assertEqual(results, {self.other.id: 'forbidden', self.own[0].id: 'updated'})
+        self.other.refresh_from_db()
+        self.assertFalse(self.other.verified)
+
+    def test_filter_only_covers_coached_tasks(self):
+        status, body = self._verify({'date': date.today().strftime('%Y-%m-%d')})
+        self.assertEqual(body['data']['updated'], len(self.players))
+        self.assertFalse(TaskCompletion.objects.get(id=self.other.id).verified)
+
+    def test_boolean_ids_rejected(self):
+        status, _ = self._verify({'completion_ids': [True]})
+        self.assertEqual(status, 400)
+
+    def test_truncation_reported(self):
+        with mock.patch('wxcloudrun.verification.MAX_BATCH_SIZE', 4):
+            _, first = self._verify({'task_id': self.own_task.id})
+            _, second = self._verify({'task_id': self.own_task.id})
+        self.assertEqual((first['data']['updated'], first['data']['truncated']), (4, True))
+        self.assertEqual((second['data']['updated'], second['data']['truncated']), (2, False))
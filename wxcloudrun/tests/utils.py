@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from wxcloudrun.models import Coach, EnrollmentYear, Player, School, Task, Team
+
+def create_coach(username='coach'):
+    user = User.objects.create(username=username, is_staff=True)
+    return Coach.objects.create(user=user)
+
+def create_players(count, prefix='队员'):
+    school, _ = School.objects.get_or_create(name='测试学校')
+    year, _ = EnrollmentYear.objects.get_or_create(year=2018)
+    return [
+        Player.objects.create(name=f'{prefix}{index}', school=school, enrollment_year=year)
+        for index in range(count)
+    ]
+
+def create_team(name, coach, players=()):
+    team = Team.objects.create(name=name, head_coach=coach)
+    team.players.add(*players)
+    return team
+
+def create_task(title, teams, created_by, period='daily', start_days_ago=30):
+    task = Task.objects.create(
+        title=title,
+        description='测试任务',
+        period=period,
+        start_date=date.today() - timedelta(days=start_days_ago),
+        created_by=created_by,
+    )
+    task.teams.add(*teams)
+    return task
@@ -0,0 +1,284 @@
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from . import media_store
+from .background import renew_lease
+from .image_pipeline import FORMATS, process_image
+from .metrics import upload_jobs
+from .models import ImageAsset, ImageVariant, UploadJob, UploadJobFile
+
+# 设置日志
+logger = logging.getLogger('log')
+
+_lock = threading.Lock()
+_executor = None
+# 上次接手过期任务的时间（time.monotonic）
+_last_recovery = None
+
+def _offload_settings():
+    return getattr(settings, 'UPLOAD_OFFLOAD_SETTINGS', {})
+
+def _host():
+    """创建任务的实例，只用于排查问题（容器重建后主机名会变化，不能用来认领任务）"""
+    return socket.gethostname()
+
+def _lease_seconds():
+    return _offload_settings().get('LEASE_SECONDS', 600)
+
+def _lease(delay=0):
+    """任务租约的到期时间，上传期间由续约线程定期续约（background.renew_lease）"""
+    return datetime.now() + timedelta(seconds=delay + _lease_seconds())
+
+def use_async(request):
+    """请求是否使用后台上传（async 参数，未指定时使用 ASYNC_BY_DEFAULT）"""
+    value = request.POST.get('async', request.GET.get('async'))
+    if value is None:
+        return bool(_offload_settings().get('ASYNC_BY_DEFAULT', False))
+    return value.lower() in ('1', 'true', 'yes')
+
+def _get_executor():
+    """
+    按需创建上传线程池
+
+    第一次提交任务时创建，此后每个租约周期最多一次顺带接手租约已过期的任务，
+    导入模块、执行管理命令时不会启动线程。
+    """
+    global _executor, _last_recovery
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_offload_settings().get('WORKERS', 2),
+                thread_name_prefix='wxcloudrun-upload'
+            )
+        now = time.monotonic()
+        if _last_recovery is None or now - _last_recovery >= _lease_seconds():
+            _last_recovery = now
+            _executor.submit(recover_stale_jobs)
+        return _executor
+
+def claim_stale_jobs():
+    """
+    认领租约已过期的未完成任务，改回等待中并续约
+
+    执行任务的进程已退出（重新部署、崩溃），文件以内容哈希命名，重新上传不会产生重复。
+
+    Returns:
+        list: 本进程认领到的任务ID
+    """
+    now = datetime.now()
+    stale = UploadJob.objects.filter(status__in=('pending', 'running')).filter(
+        Q(lease_until__lt=now) | Q(lease_until__isnull=True)
+    )
+    claimed = []
+    for job_id in stale.values_list('id', flat=True):
+        # 多个进程同时认领时只有一个能更新成功
+        if stale.filter(id=job_id).update(status='pending', lease_until=_lease()):
+            claimed.append(job_id)
+    return claimed
+
+def recover_stale_jobs():
+    """重新提交租约已过期的任务（在线程池中运行）"""
+    try:
+        job_ids = claim_stale_jobs()
+        if job_ids:
+            logger.warning(f"重新提交 {len(job_ids)} 个未完成的上传任务")
+        for job_id in job_ids:
+            _get_executor().submit(run_upload, job_id)
+    except Exception as e:
+        logger.error(f"恢复上传任务出错: {str(e)}")
+    finally:
+        connections.close_all()
+
+def replay_uploads():
+    """服务启动时调用（gunicorn post_worker_init），在线程池中恢复租约已过期的任务，不阻塞启动"""
+    global _last_recovery
+    with _lock:
+        _last_recovery = time.monotonic()
+    _get_executor().submit(recover_stale_jobs)
+
+def submit_upload(job):
+    """提交上传任务，在当前事务提交后开始执行"""
+    transaction.on_commit(lambda: _get_executor().submit(run_upload, job.id))
+
+def _create_job(file_name, files, user=None):
+    """
+    为已保存到本地的文件创建上传任务
+
+    Args:
+        file_name: 原文件名
+        files: [(对象键, 文件类型)]
+        user: 上传人
+    """
+    local = media_store.get_backend('local')
+    with transaction.atomic():
+        job = UploadJob.objects.create(
+            file_name=file_name[:255],
+            host=_host(),
+            lease_until=_lease(),
+            message='等待上传',
+            created_by=user if user is not None and user.is_authenticated else None,
+        )
+        UploadJobFile.objects.bulk_create([
+            UploadJobFile(job=job, key=key, content_type=content_type, local_url=local.url(key))
+            for key, content_type in files
+        ])
+        submit_upload(job)
+    return job
+
+def save_async(source, folder, ext='', content_type=None, user=None):
+    """
+    以内容哈希命名保存到本地并创建上传任务，不等待对象存储
+
+    Returns:
+        tuple: (临时地址, 上传任务)
+    """
+    content_type = content_type or 'application/octet-stream'
+    local_url = media_store.save(source, folder, ext, content_type=content_type, storage='local')
+    key = media_store.get_backend('local').key_from_url(local_url)
+    job = _create_job(getattr(source, 'name', '') or key.rsplit('/', 1)[-1], [(key, content_type)], user)
+    return local_url, job
+
+def process_image_async(source, folder='images', user=None):
+    """
+    在本地处理图片并为各版本创建上传任务
+
+    同一张图片已上传到对象存储的同一目录时直接返回已有记录，不创建任务。
+
+    Returns:
+        tuple: (ImageAsset, 上传任务或None)
+    """
+    asset = process_image(source, folder=folder, storage='local', reuse_storages=['cloud', 'local'])
+    local = media_store.get_backend('local')
+    files = []
+    for variant in asset.variants.all():
+        key = local.key_from_url(variant.url)
+        if key:
+            files.append((key, FORMATS[variant.format][1]))
+    if not files:
+        return asset, None
+    return asset, _create_job(getattr(source, 'name', '') or asset.content_hash, files, user)
+
+def _replace_urls(replacements):
+    """把记录中的临时地址替换为正式地址（update 不触发信号）"""
+    with transaction.atomic():
+        for local_url, final_url in replacements.items():
+            for model_name, field in media_store.REFERENCE_FIELDS:
+                apps.get_model('wxcloudrun', model_name).objects.filter(**{field: local_url}).update(**{field: final_url})
+            ImageVariant.objects.filter(url=local_url).update(url=final_url)
+        _move_assets(list(replacements.values()))
+
+def _move_assets(final_urls):
+    """处理后图片的所有版本都已上传时，把图片记录改为对象存储"""
+    local = media_store.get_backend('local')
+    assets = ImageAsset.objects.filter(storage='local', variants__url__in=final_urls).distinct().prefetch_related('variants')
+    for asset in assets:
+        if any(local.key_from_url(variant.url) for variant in asset.variants.all()):
+            continue
+        duplicate = ImageAsset.objects.filter(
+            content_hash=asset.content_hash, folder=asset.folder, storage='cloud'
+        ).exists()
+        if duplicate:
+            # 同一张图片已直接上传过，文件路径相同，保留已有记录
+            asset.delete()
+        else:
+            ImageAsset.objects.filter(id=asset.id).update(storage='cloud')
+
+def resolve_urls(instance):
+    """
+    保存记录前把已上传完成的临时地址替换为正式地址
+
+    管理员上传后填写表单时上传可能已经完成，任务替换地址时该记录还未保存。
+    """
+    fields = [field for model_name, field in media_store.REFERENCE_FIELDS if model_name == type(instance).__name__]
+    local = media_store.get_backend('local')
+    values = {getattr(instance, field) for field in fields} - {None, ''}
+    provisional = [value for value in values if local.key_from_url(value)]
+    if not provisional:
+        return
+    final_urls = dict(
+        UploadJobFile.objects.filter(local_url__in=provisional)
+        .exclude(final_url='').values_list('local_url', 'final_url')
+    )
+    for field in fields:
+        value = getattr(instance, field)
+        if value in final_urls:
+            setattr(instance, field, final_urls[value])
+
+def run_upload(job_id):
+    """执行上传任务（在线程池中运行）"""
+    try:
+        # 只有一个线程能把任务从等待中改为上传中
+        claimed = UploadJob.objects.filter(id=job_id, status='pending').update(
+            status='running', started_at=datetime.now(), lease_until=_lease(), message='上传中'
+        )
+        if not claimed:
+            return
+
+        job = UploadJob.objects.get(id=job_id)
+        attempts = job.attempts + 1
+        local = media_store.get_backend('local')
+        try:
+            replacements = {}
+            # 大文件分块上传可能超过租约时间，上传期间续约，避免被其他进程认领后重复上传
+            with renew_lease(UploadJob.objects.filter(id=job_id, status='running'), _lease_seconds()):
+                for upload_file in job.files.all():
+                    if not upload_file.final_url:
+                        with local.open(upload_file.key) as f:
+                            upload_file.final_url = media_store.put(upload_file.key, f, upload_file.content_type, 'cloud')
+                        upload_file.save(update_fields=['final_url'])
+                    replacements[upload_file.local_url] = upload_file.final_url
+            _replace_urls(replacements)
+        except FileNotFoundError as e:
+            # 暂存文件丢失，重试也无法完成
+            logger.error(f"上传任务 {job_id} 暂存文件丢失: {str(e)}")
+            attempts = _offload_settings().get('MAX_ATTEMPTS', 3)
+            error = '暂存文件丢失'
+        except Exception as e:
+            logger.error(f"上传任务 {job_id} 执行出错: {str(e)}")
+            error = str(e)
+        else:
+            UploadJob.objects.filter(id=job_id).update(
+                status='succeeded', attempts=attempts, message='上传成功', finished_at=datetime.now()
+            )
+            upload_jobs.inc(result='succeeded')
+            return
+
+        if attempts < _offload_settings().get('MAX_ATTEMPTS', 3):
+            retry_delay = _offload_settings().get('RETRY_DELAY', 30)
+            UploadJob.objects.filter(id=job_id).update(
+                status='pending', attempts=attempts, lease_until=_lease(retry_delay),
+                message=f'上传失败，等待重试：{error}'[:255]
+            )
+            upload_jobs.inc(result='retried')
+            timer = threading.Timer(retry_delay, lambda: _get_executor().submit(run_upload, job_id))
+            timer.daemon = True
+            timer.start()
+        else:
+            UploadJob.objects.filter(id=job_id).update(
+                status='failed', attempts=attempts, message=f'上传失败：{error}'[:255], finished_at=datetime.now()
+            )
+            upload_jobs.inc(result='failed')
+    except Exception as e:
+        logger.error(f"上传任务 {job_id} 状态更新出错: {str(e)}")
+    finally:
+        # 线程池中的数据库连接在任务结束后释放
+        connections.close_all()
+
+def job_status(job):
+    """状态接口返回的数据"""
+    return {
+        'id': job.id,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'message': job.message,
+        'attempts': job.attempts,
+        # 临时地址 -> 正式地址（未完成时为 None）
+        'urls': {upload_file.local_url: upload_file.final_url or None for upload_file in job.files.all()},
+    }
@@ -1,11 +1,11 @@
-import os
-import uuid
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-import jwt
-from datetime import datetime
-from django.conf import settings
+from django.views.static import serve
+from .auth_utils import require_principal
+from .image_pipeline import ImageProcessingError, asset_thumbnail, primary_url, process_image, variant_urls
+from .media_store import immutable_cache_control, is_content_addressed
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -13,21 +13,9 @@ def upload_image(request):
     """处理图片上传，返回图片URL"""
     try:
         # 验证token
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return JsonResponse({
-                'code': 401,
-                'message': '未登录'
-            }, status=401)
-
-        # 解析token
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-        except jwt.InvalidTokenError:
-            return JsonResponse({
-                'code': 401,
-                'message': '无效的token'
-            }, status=401)
+        _, error_response = require_principal(request)
+        if error_response:
+            return error_response
 
         # 检查是否有上传文件
         if 'file' not in request.FILES:
@@ -53,28 +41,22 @@ def upload_image(request):
                 'message': '文件太大，请上传小于2MB的图片'
             }, status=400)
             
-        # 确保上传目录存在
-        upload_dir = os.path.join(settings.MEDIA_ROOT, 'avatars')
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # 生成唯一文件名
-        ext = os.path.splitext(image_file.name)[1]
-        filename = f"{uuid.uuid4()}{ext}"
-        filepath = os.path.join(upload_dir, filename)
-        
-        # 保存文件
-        with open(filepath, 'wb+') as destination:
-            for chunk in image_file.chunks():
-                destination.write(chunk)
-                
-        # 构建URL路径
-        url = f"{settings.MEDIA_URL}avatars/{filename}"
+        # 生成各尺寸的 WebP/JPEG 版本，以内容哈希命名保存
+        try:
+            asset = process_image(image_file, folder='avatars', storage='local')
+        except ImageProcessingError as e:
+            return JsonResponse({
+                'code': 400,
+                'message': str(e)
+            }, status=400)
         
         return JsonResponse({
             'code': 200,
             'message': '上传成功',
             'data': {
-                'url': url
+                'url': primary_url(asset),
+                'thumbnail': asset_thumbnail(asset),
+                'variants': variant_urls(asset)
             }
         })
         
@@ -83,3 +65,11 @@ def upload_image(request):
             'code': 500,
             'message': f'上传失败: {str(e)}'
         }, status=500)
+
+@require_http_methods(["GET", "HEAD"])
+def serve_media(request, path):
+    """提供 MEDIA_ROOT 下的文件，以内容哈希命名的文件内容不会变化，允许浏览器和CDN长期缓存"""
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if response.status_code == 200 and is_content_addressed(path):
+        response['Cache-Control'] = immutable_cache_control()
+    return response
@@ -9,10 +9,19 @@ from . import task_views  # 导入任务视图
 from . import achievement_views  # 导入成就视图
 from . import admin_views  # 导入管理视图
 from . import player_views  # 导入新的player_views模块
+from . import export_views
+from . import monitoring_views
+from . import coach_views
+from . import upload_views
 
 urlpatterns = [
     # 获取主页
     path('', views.index, name='index'),
+    # 健康检查（Dockerfile HEALTHCHECK 使用 /health/）
+    path('health/', monitoring_views.health, name='health'),
+    path('health/ready/', monitoring_views.health_ready, name='health_ready'),
+    # 监控指标（内部接口）
+    path('internal/metrics/', monitoring_views.metrics, name='metrics'),
     # 管理员界面
     path('admin/', admin.site.urls),
     # 登录页面
@@ -34,11 +43,16 @@ urlpatterns = [
     # 任务相关接口
     path('api/player/tasks/', task_views.get_player_tasks, name='get_player_tasks'),
     path('api/player/complete_task/', task_views.complete_task, name='complete_task'),
+    path('api/player/batch_complete_tasks/', task_views.batch_complete_tasks, name='batch_complete_tasks'),
     path('api/player/task_details/', task_views.get_task_details, name='get_task_details'),
     path('api/player/team_task_stats/', task_views.get_team_task_stats, name='get_team_task_stats'),
     path('api/player/task_history/', task_views.get_player_task_history, name='get_player_task_history'),
     path('api/player/update_task_completion/', task_views.update_task_completion_status, name='update_task_completion_status'),
     path('api/coach/assign_task/', task_views.assign_task_to_team, name='assign_task_to_team'),
+    path('api/coach/dashboard/', coach_views.coach_dashboard, name='coach_dashboard'),
+    path('api/coach/verify_completions/', coach_views.verify_completions, name='verify_completions'),
+    path('api/coach/export/completions/', export_views.export_task_completions, name='export_task_completions'),
+    path('api/coach/export/scores/', export_views.export_assessment_scores, name='export_assessment_scores'),
     
     # 添加调试接口
     path('api/debug/player_tasks/', task_views.debug_player_tasks, name='debug_player_tasks'),
@@ -49,12 +63,16 @@ urlpatterns = [
     
     # 管理员工具API
     path('api/admin/upload_badge/', admin_views.upload_badge_image, name='upload_badge_image'),
+    path('api/admin/upload_jobs/<int:job_id>/', admin_views.upload_job_status, name='upload_job_status'),
 
     # 在urlpatterns列表中添加:
     path('api/parent/players/', views.get_parent_players, name='get_parent_players'),
     
     # 队员详情API
     path('api/player/details/', player_views.get_player_details, name='get_player_details'),
+
+    # 上传的媒体文件（以内容哈希命名的文件允许长期缓存）
+    path('media/<path:path>', upload_views.serve_media, name='serve_media'),
 ]
 
 # 这段代码通常不需要修改，因为Django admin会自动处理注册的模型
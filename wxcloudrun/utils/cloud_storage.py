@@ -1,17 +1,271 @@
+import io
 import os
+import threading
+import time
 import uuid
 import logging
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 from django.conf import settings
+from ..metrics import storage_request_duration, storage_requests
 
 logger = logging.getLogger(__name__)
 
 try:
     import requests
     import json
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 except ImportError:
     logger.error("requests 库未安装。请运行 `pip install requests` 安装此依赖。")
     requests = None
 
+def storage_settings():
+    return getattr(settings, 'CLOUD_STORAGE_SETTINGS', {})
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def _build_session():
+    """
+    创建连接池会话：保持长连接，5xx 和连接错误按指数退避重试
+
+    GET、HEAD、PUT 和 DELETE 都是幂等操作，重试不会产生副作用。
+    POST 不自动重试：重复初始化分块上传会产生多个上传ID，未完成的分块会一直占用存储；
+    完成分块上传由 _complete_multipart 单独重试。
+    """
+    config = storage_settings()
+    retry = Retry(
+        total=config.get('MAX_RETRIES', 3),
+        connect=config.get('MAX_RETRIES', 3),
+        read=config.get('MAX_RETRIES', 3),
+        status=config.get('MAX_RETRIES', 3),
+        backoff_factor=config.get('BACKOFF_FACTOR', 0.5),
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD', 'PUT', 'DELETE']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config.get('POOL_CONNECTIONS', 2),
+        pool_maxsize=config.get('POOL_MAXSIZE', 10),
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_session():
+    """进程内共享的会话（gunicorn fork 出的子进程各自创建，不共用父进程的连接）"""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                _session = _build_session()
+                _session_pid = os.getpid()
+    return _session
+
+def reset_session():
+    """关闭连接池，下次请求时按当前配置重新创建"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+def _timeout():
+    config = storage_settings()
+    return (config.get('CONNECT_TIMEOUT', 3), config.get('READ_TIMEOUT', 30))
+
+def _request(method, url, operation, **kwargs):
+    """
+    通过连接池发送请求并记录耗时
+
+    Returns:
+        Response，重试后仍然失败时抛出 requests 的异常
+    """
+    start = time.perf_counter()
+    result = 'error'
+    try:
+        response = get_session().request(method, url, timeout=_timeout(), **kwargs)
+        result = str(response.status_code)
+        return response
+    finally:
+        storage_request_duration.observe(time.perf_counter() - start, operation=operation)
+        storage_requests.inc(operation=operation, result=result)
+
+def _content_size(file):
+    """文件对象的大小（字节），读取位置不变"""
+    size = getattr(file, 'size', None)
+    if size is not None:
+        return size
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(position)
+    return size
+
+def _iter_parts(file, part_size):
+    """按分块大小从头依次读取文件，Django 的 UploadedFile 使用 chunks()"""
+    if hasattr(file, 'chunks'):
+        yield from file.chunks(part_size)
+        return
+    file.seek(0)
+    while True:
+        data = file.read(part_size)
+        if not data:
+            return
+        yield data
+
+def _read_part(file, part_number, part_size):
+    file.seek((part_number - 1) * part_size)
+    return file.read(part_size)
+
+def _xml_find(root, tag):
+    """忽略命名空间查找第一个 tag 元素的文本"""
+    for element in root.iter():
+        if element.tag.rsplit('}', 1)[-1] == tag:
+            return element.text
+    return None
+
+def _xml_parts(root):
+    """分块列表中的 {分块号: ETag}"""
+    parts = {}
+    for element in root.iter():
+        if element.tag.rsplit('}', 1)[-1] == 'Part':
+            values = {child.tag.rsplit('}', 1)[-1]: child.text for child in element}
+            parts[int(values['PartNumber'])] = values['ETag']
+    return parts
+
+def _upload_part(upload_url, upload_id, part_number, data):
+    """上传一个分块，返回 ETag，失败时返回 None"""
+    try:
+        response = _request(
+            'PUT', upload_url, 'upload_part', data=data,
+            params={'partNumber': part_number, 'uploadId': upload_id}
+        )
+    except requests.RequestException as e:
+        logger.warning(f"分块 {part_number} 上传异常: {str(e)}")
+        return None
+    if response.status_code != 200:
+        logger.warning(f"分块 {part_number} 上传失败: {response.status_code}")
+        return None
+    return response.headers.get('ETag')
+
+def _list_parts(upload_url, upload_id):
+    """服务端已收到的分块 {分块号: ETag}，查询失败时返回空"""
+    try:
+        response = _request('GET', upload_url, 'list_parts', params={'uploadId': upload_id})
+        if response.status_code == 200:
+            return _xml_parts(ET.fromstring(response.content))
+    except (requests.RequestException, ET.ParseError) as e:
+        logger.warning(f"查询已上传分块失败: {str(e)}")
+    return {}
+
+def _complete_multipart(upload_url, upload_id, etags):
+    """
+    完成分块上传，5xx 和连接错误按指数退避重试
+
+    同一上传ID重复提交相同的分块列表是安全的；之前的请求已成功但响应丢失时，
+    上传ID已不存在（404），此时以对象是否已存在为准。
+
+    Returns:
+        bool: 是否完成
+    """
+    config = storage_settings()
+    body = '<CompleteMultipartUpload>{}</CompleteMultipartUpload>'.format(''.join(
+        f'<Part><PartNumber>{part_number}</PartNumber><ETag>{etag}</ETag></Part>'
+        for part_number, etag in sorted(etags.items())
+    )).encode()
+    attempts = config.get('MAX_RETRIES', 3) + 1
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(config.get('BACKOFF_FACTOR', 0.5) * (2 ** (attempt - 1)))
+        try:
+            response = _request(
+                'POST', upload_url, 'complete_multipart', params={'uploadId': upload_id},
+                data=body, headers={'Content-Type': 'application/xml'}
+            )
+        except requests.RequestException as e:
+            logger.warning(f"完成分块上传请求异常（第 {attempt + 1} 次）: {str(e)}")
+            continue
+        if response.status_code == 200:
+            return True
+        if response.status_code == 404 and attempt and CloudStorage.file_exists(upload_url):
+            return True
+        if response.status_code < 500:
+            logger.error(f"完成分块上传失败: {response.status_code} {response.text}")
+            return False
+        logger.warning(f"完成分块上传失败（第 {attempt + 1} 次）: {response.status_code}")
+    return False
+
+def _multipart_upload(upload_url, file, size, headers):
+    """
+    分块上传大文件
+
+    主线程按顺序读取分块交给线程池并行上传，同时在途的分块不超过并发数，内存占用与文件大小无关。
+    分块重试后仍失败时，先向服务端查询已收到的分块，再从文件中重新读取缺失的分块续传；
+    最终仍失败则取消本次分块上传。初始化请求不重试，失败时整个上传失败。
+
+    Returns:
+        bool: 是否上传成功
+    """
+    config = storage_settings()
+    part_size = config.get('PART_SIZE', 2 * 1024 * 1024)
+    concurrency = config.get('MULTIPART_CONCURRENCY', 3)
+    part_count = max(1, (size + part_size - 1) // part_size)
+
+    response = _request('POST', upload_url, 'initiate_multipart', params={'uploads': ''}, headers=headers)
+    upload_id = _xml_find(ET.fromstring(response.content), 'UploadId') if response.status_code == 200 else None
+    if not upload_id:
+        logger.error(f"初始化分块上传失败: {response.status_code} {response.text}")
+        return False
+
+    etags = {}
+    try:
+        # 信号量限制在途分块数量：各线程上传的分块之外最多预读一块
+        in_flight = threading.Semaphore(concurrency + 1)
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='cos-part') as executor:
+            futures = {}
+            for part_number, data in enumerate(_iter_parts(file, part_size), start=1):
+                in_flight.acquire()
+                future = executor.submit(_upload_part, upload_url, upload_id, part_number, data)
+                future.add_done_callback(lambda _: in_flight.release())
+                futures[part_number] = future
+            for part_number, future in futures.items():
+                etag = future.result()
+                if etag:
+                    etags[part_number] = etag
+
+        for attempt in range(config.get('PART_RESUME_ATTEMPTS', 2)):
+            missing = [part_number for part_number in range(1, part_count + 1) if part_number not in etags]
+            if not missing:
+                break
+            # 以服务端记录为准：响应丢失但实际已上传的分块不再重传
+            etags.update(_list_parts(upload_url, upload_id))
+            missing = [part_number for part_number in missing if part_number not in etags]
+            logger.warning(f"分块上传续传：第 {attempt + 1} 次，缺少 {len(missing)} 个分块")
+            for part_number in missing:
+                etag = _upload_part(upload_url, upload_id, part_number, _read_part(file, part_number, part_size))
+                if etag:
+                    etags[part_number] = etag
+
+        if len(etags) < part_count:
+            raise IOError(f"{part_count - len(etags)} 个分块上传失败")
+
+        if not _complete_multipart(upload_url, upload_id, etags):
+            raise IOError("完成分块上传失败")
+        return True
+    except Exception as e:
+        logger.error(f"分块上传失败，已取消: {str(e)}")
+        try:
+            _request('DELETE', upload_url, 'abort_multipart', params={'uploadId': upload_id})
+        except requests.RequestException:
+            pass
+        return False
+
 class CloudStorage:
     """微信云存储工具类"""
     
@@ -19,16 +273,25 @@ class CloudStorage:
     BUCKET = '7072-prod-9g1ksrgj4afc4ff1-1345213190'
     REGION = 'ap-shanghai'
     BASE_URL = f'https://{BUCKET}.cos.{REGION}.myqcloud.com'
+
+    @staticmethod
+    def base_url():
+        """对象存储地址，CLOUD_STORAGE_SETTINGS 中配置了 BASE_URL 时使用配置（如本地模拟服务）"""
+        return storage_settings().get('BASE_URL') or CloudStorage.BASE_URL
     
     @staticmethod
-    def upload_file(file_content, file_name=None, folder='badges'):
+    def upload_file(file_content, file_name=None, folder='badges', content_type=None, cache_control=None):
         """
         上传文件到微信云存储
+
+        文件对象直接流式上传，不整体读入内存；超过 MULTIPART_THRESHOLD 的文件使用分块上传。
         
         Args:
-            file_content: 文件内容（字节流）
+            file_content: 文件内容（字节流或文件对象，如 UploadedFile）
             file_name: 文件名，如不提供则自动生成
             folder: 存储目录，默认为'badges'
+            content_type: 文件类型，默认为 application/octet-stream
+            cache_control: 对象的 Cache-Control 响应头，默认不设置
             
         Returns:
             成功返回文件访问URL，失败返回None
@@ -48,18 +311,21 @@ class CloudStorage:
             object_key = f'{folder}/{file_name}'
             
             # 构建上传URL
-            upload_url = f'{CloudStorage.BASE_URL}/{object_key}'
+            upload_url = f'{CloudStorage.base_url()}/{object_key}'
             
-            # 上传文件
-            if hasattr(file_content, 'read'):
-                # 如果是文件对象
-                content = file_content.read()
-            else:
-                # 如果是字节内容
-                content = file_content
-                
-            headers = {'Content-Type': 'application/octet-stream'}
-            response = requests.put(upload_url, data=content, headers=headers)
+            # 字节内容包装为文件对象，统一按文件上传
+            file = file_content if hasattr(file_content, 'read') else io.BytesIO(file_content)
+            headers = {'Content-Type': content_type or 'application/octet-stream'}
+            if cache_control:
+                headers['Cache-Control'] = cache_control
+            size = _content_size(file)
+
+            if size > storage_settings().get('MULTIPART_THRESHOLD', 8 * 1024 * 1024):
+                return upload_url if _multipart_upload(upload_url, file, size, headers) else None
+
+            # 传入文件对象时 requests 边读边发送，重试时会回到起始位置重新发送
+            file.seek(0)
+            response = _request('PUT', upload_url, 'upload', data=file, headers=headers)
             
             if response.status_code == 200:
                 # 返回可访问的URL
@@ -90,16 +356,96 @@ class CloudStorage:
             
         try:
             # 从URL中提取对象键
-            object_key = file_url.replace(f'{CloudStorage.BASE_URL}/', '')
+            object_key = file_url.replace(f'{CloudStorage.base_url()}/', '')
             
             # 构建删除URL
-            delete_url = f'{CloudStorage.BASE_URL}/{object_key}'
+            delete_url = f'{CloudStorage.base_url()}/{object_key}'
             
             # 删除文件
-            response = requests.delete(delete_url)
+            response = _request('DELETE', delete_url, 'delete')
             
             return response.status_code == 204 or response.status_code == 200
                 
         except Exception as e:
             logger.error(f"文件删除异常: {str(e)}")
             return False
+
+    @staticmethod
+    def file_exists(file_url):
+        """
+        检查文件是否已存在
+
+        Returns:
+            存在返回True，不存在返回False，无法确定（请求失败）时返回None
+        """
+        if requests is None:
+            return None
+        try:
+            response = _request('HEAD', file_url, 'head')
+        except requests.RequestException as e:
+            logger.warning(f"检查文件是否存在失败: {str(e)}")
+            return None
+        if response.status_code == 200:
+            return True
+        if response.status_code == 404:
+            return False
+        return None
+
+    @staticmethod
+    def touch_file(file_url, content_type=None, cache_control=None):
+        """
+        把对象复制到自身以更新修改时间，不重新上传内容
+
+        复制时替换元数据，需要重新指定 Content-Type 和 Cache-Control。
+
+        Returns:
+            成功返回True，失败返回False
+        """
+        if requests is None:
+            return False
+        parts = urlsplit(file_url)
+        headers = {
+            'x-cos-copy-source': f'{parts.netloc}{parts.path}',
+            'x-cos-metadata-directive': 'Replaced',
+            'Content-Type': content_type or 'application/octet-stream',
+        }
+        if cache_control:
+            headers['Cache-Control'] = cache_control
+        try:
+            response = _request('PUT', file_url, 'copy', headers=headers)
+        except requests.RequestException as e:
+            logger.warning(f"更新文件修改时间失败: {str(e)}")
+            return False
+        # 复制失败时也可能返回 200，响应体中带有错误信息
+        return response.status_code == 200 and b'<Error>' not in response.content
+
+    @staticmethod
+    def list_files(prefix):
+        """
+        列出目录下的所有文件（分页读取）
+
+        Args:
+            prefix: 对象键前缀，如 'avatars/'
+
+        Yields:
+            tuple: (对象键, 最后修改时间字符串, 文件大小)
+        """
+        marker = ''
+        while True:
+            response = _request(
+                'GET', f'{CloudStorage.base_url()}/', 'list',
+                params={'prefix': prefix, 'marker': marker, 'max-keys': 1000}
+            )
+            if response.status_code != 200:
+                raise IOError(f"列出文件失败: {response.status_code} {response.text}")
+            root = ET.fromstring(response.content)
+            key = None
+            for element in root.iter():
+                if element.tag.rsplit('}', 1)[-1] != 'Contents':
+                    continue
+                values = {child.tag.rsplit('}', 1)[-1]: child.text for child in element}
+                key = values['Key']
+                yield key, values.get('LastModified'), int(values.get('Size') or 0)
+            if _xml_find(root, 'IsTruncated') != 'true' or key is None:
+                return
+            marker = _xml_find(root, 'NextMarker') or key
@@ -0,0 +1,252 @@
+import hashlib
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlsplit
+
+class _Handler(BaseHTTPRequestHandler):
+    # 支持长连接，才能观察到客户端连接池的效果
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.fake.connection_opened()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _handle(self):
+        fake = self.server.fake
+        body = self._read_body() if self.command in ('PUT', 'POST') else b''
+        status = fake.before_request(self.command, self.path)
+        if not status and self.command == 'PUT' and 'partNumber=' in self.path:
+            status = fake.part_failure()
+        if status:
+            self._reply(status, b'<Error><Code>ServiceUnavailable</Code></Error>')
+            return
+        self._reply(*fake.handle(self.command, self.path, body, self.headers))
+
+    do_GET = do_HEAD = do_PUT = do_POST = do_DELETE = _handle
+
+def _metadata(headers):
+    """上传时随对象保存、下载时返回的响应头"""
+    metadata = {'Content-Type': headers.get('Content-Type', 'application/octet-stream')}
+    if headers.get('Cache-Control'):
+        metadata['Cache-Control'] = headers['Cache-Control']
+    return metadata
+
+class FakeCOSServer:
+    """
+    本地模拟的对象存储服务，用于离线测试和压测上传
+
+    按路径在内存中保存对象，支持 PUT/GET/HEAD/DELETE、复制、列出对象和分块上传，
+    可设置每个请求的延迟和随机返回 503 的比例，用于验证超时与重试；
+    part_fail_rate 只作用于分块上传，用于验证续传；fail_next 让指定的请求确定地失败，供自动化测试使用。
+
+    用法：
+        with FakeCOSServer(latency=0.01) as server:
+            # 把 CLOUD_STORAGE_SETTINGS['BASE_URL'] 指向 server.base_url 后调用 CloudStorage
+            ...
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_rate=0.0, part_fail_rate=0.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.part_fail_rate = part_fail_rate
+        # 对象路径 -> (内容, 对象元数据响应头, 修改时间)
+        self.objects = {}
+        # 上传ID -> (对象路径, 内容类型, {分块号: 内容})
+        self.uploads = {}
+        self.requests = 0
+        self.connections = 0
+        # 收到的请求 (方法, 路径含查询参数)
+        self.request_log = []
+        # 待注入的故障 [[方法, 查询参数名, 剩余次数]]
+        self._failures = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections += 1
+
+    def fail_next(self, method, count=1, query=None):
+        """
+        接下来的 count 个匹配请求返回 503
+
+        Args:
+            method: 请求方法
+            query: 只匹配带有该查询参数的请求（如 'uploads'、'uploadId'、'partNumber'）
+        """
+        with self._lock:
+            self._failures.append([method, query, count])
+
+    def _scripted_failure(self, method, path):
+        query = parse_qs(urlsplit(path).query, keep_blank_values=True)
+        for failure in self._failures:
+            if failure[2] > 0 and failure[0] == method and (failure[1] is None or failure[1] in query):
+                failure[2] -= 1
+                return True
+        return False
+
+    def before_request(self, method, path):
+        """模拟延迟和故障，返回非空状态码时直接以该状态码响应"""
+        with self._lock:
+            self.requests += 1
+            self.request_log.append((method, path))
+            if self._scripted_failure(method, path):
+                return 503
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            return 503
+        return None
+
+    def part_failure(self):
+        if self.part_fail_rate and random.random() < self.part_fail_rate:
+            return 503
+        return None
+
+    def handle(self, method, path, body, headers):
+        """
+        Returns:
+            tuple: (状态码, 响应体, 响应头)
+        """
+        parts = urlsplit(path)
+        key = parts.path
+        query = parse_qs(parts.query, keep_blank_values=True)
+        if 'uploads' in query or 'uploadId' in query:
+            return self._handle_multipart(method, key, query, body, headers)
+        if key == '/' and method == 'GET':
+            return self._list_objects(query)
+
+        with self._lock:
+            if method == 'PUT' and headers.get('x-cos-copy-source'):
+                return self._copy_object(key, headers)
+            if method in ('PUT', 'POST'):
+                self.objects[key] = (body, _metadata(headers), time.time())
+                return 200, b'', {'ETag': f'"{hashlib.md5(body).hexdigest()}"'}
+            if method == 'DELETE':
+                self.objects.pop(key, None)
+                return 204, b'', {}
+            stored = self.objects.get(key)
+        if stored is None:
+            return 404, b'<Error><Code>NoSuchKey</Code></Error>', {}
+        body, metadata, _ = stored
+        return 200, body, metadata
+
+    def _copy_object(self, key, headers):
+        """复制对象（x-cos-copy-source 为 <域名>/<对象键>），复制到自身时只更新修改时间和元数据"""
+        source = '/' + headers['x-cos-copy-source'].split('/', 1)[-1]
+        stored = self.objects.get(source)
+        if stored is None:
+            return 404, b'<Error><Code>NoSuchKey</Code></Error>', {}
+        body, metadata, _ = stored
+        if headers.get('x-cos-metadata-directive') == 'Replaced':
+            metadata = _metadata(headers)
+        self.objects[key] = (body, metadata, time.time())
+        return 200, (
+            f'<CopyObjectResult><ETag>"{hashlib.md5(body).hexdigest()}"</ETag></CopyObjectResult>'
+        ).encode(), {'Content-Type': 'application/xml'}
+
+    def _list_objects(self, query):
+        prefix = query.get('prefix', [''])[0]
+        marker = query.get('marker', [''])[0]
+        max_keys = int(query.get('max-keys', ['1000'])[0])
+        with self._lock:
+            keys = sorted(key.lstrip('/') for key in self.objects if key.lstrip('/').startswith(prefix))
+            keys = [key for key in keys if key > marker]
+            page, truncated = keys[:max_keys], len(keys) > max_keys
+            contents = ''.join(
+                f'<Contents><Key>{key}</Key>'
+                f'<LastModified>{datetime.fromtimestamp(self.objects["/" + key][2], timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")}</LastModified>'
+                f'<Size>{len(self.objects["/" + key][0])}</Size></Contents>'
+                for key in page
+            )
+        next_marker = f'<NextMarker>{page[-1]}</NextMarker>' if truncated else ''
+        return 200, (
+            f'<ListBucketResult><Prefix>{prefix}</Prefix><IsTruncated>{str(truncated).lower()}</IsTruncated>'
+            f'{next_marker}{contents}</ListBucketResult>'
+        ).encode(), {'Content-Type': 'application/xml'}
+
+    def _handle_multipart(self, method, key, query, body, headers):
+        with self._lock:
+            if method == 'POST' and 'uploads' in query:
+                upload_id = uuid.uuid4().hex
+                self.uploads[upload_id] = (key, _metadata(headers), {})
+                return 200, (
+                    f'<InitiateMultipartUploadResult><Key>{key.lstrip("/")}</Key>'
+                    f'<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>'
+                ).encode(), {'Content-Type': 'application/xml'}
+
+            upload_id = query['uploadId'][0]
+            upload = self.uploads.get(upload_id)
+            if upload is None or upload[0] != key:
+                return 404, b'<Error><Code>NoSuchUpload</Code></Error>', {}
+            _, metadata, uploaded = upload
+
+            if method == 'PUT':
+                etag = f'"{hashlib.md5(body).hexdigest()}"'
+                uploaded[int(query['partNumber'][0])] = (body, etag)
+                return 200, b'', {'ETag': etag}
+            if method == 'GET':
+                listed = ''.join(
+                    f'<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag><Size>{len(data)}</Size></Part>'
+                    for number, (data, etag) in sorted(uploaded.items())
+                )
+                return 200, f'<ListPartsResult><UploadId>{upload_id}</UploadId>{listed}</ListPartsResult>'.encode(), {}
+            if method == 'DELETE':
+                del self.uploads[upload_id]
+                return 204, b'', {}
+            if method == 'POST':
+                requested = [
+                    (int(number), etag) for number, etag in
+                    re.findall(r'<PartNumber>(\d+)</PartNumber>\s*<ETag>([^<]+)</ETag>', body.decode())
+                ]
+                if not requested or any(uploaded.get(number, (None, None))[1] != etag for number, etag in requested):
+                    return 400, b'<Error><Code>InvalidPart</Code></Error>', {}
+                data = b''.join(uploaded[number][0] for number, _ in sorted(requested))
+                self.objects[key] = (data, metadata, time.time())
+                del self.uploads[upload_id]
+                return 200, b'<CompleteMultipartUploadResult></CompleteMultipartUploadResult>', {}
+        return 405, b'', {}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-cos', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
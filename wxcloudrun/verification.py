@@ -0,0 +1,98 @@
+import logging
+from datetime import datetime
+from django.db import transaction
+from .models import Task, TaskCompletion, Team
+from .achievement_service import enqueue_bulk_task_completion_event
+from .background import submit_on_commit
+from .streak_service import refresh_task_streaks
+from .team_dashboard import refresh_daily_stats_bulk
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 单次批量审核的最多记录数
+MAX_BATCH_SIZE = 1000
+
+# 每条记录的处理结果
+UPDATED = 'updated'          # 已更新
+UNCHANGED = 'unchanged'      # 已是目标状态，未修改
+NOT_FOUND = 'not_found'      # 记录不存在
+FORBIDDEN = 'forbidden'      # 不在可审核的队伍范围内
+
+def _limit_to_teams(queryset, team_ids):
+    """只保留队员在这些队伍中、且任务分配给了这些队伍的完成记录"""
+    return queryset.filter(
+        player_id__in=Team.players.through.objects.filter(team_id__in=team_ids).values('player_id'),
+        task_id__in=Task.teams.through.objects.filter(team_id__in=team_ids).values('task_id'),
+    )
+
+def filter_completions(queryset, team_id=None, task_id=None, completion_date=None):
+    """按队伍（队员所在、任务所属的队伍）、任务和完成日期筛选完成记录"""
+    if team_id:
+        queryset = _limit_to_teams(queryset, [team_id])
+    if task_id:
+        queryset = queryset.filter(task_id=task_id)
+    if completion_date:
+        queryset = queryset.filter(completion_date=completion_date)
+    return queryset
+
+def bulk_set_verified(user, verified=True, completion_ids=None, queryset=None, team_ids=None):
+    """
+    批量审核通过或驳回完成记录
+
+    以一条 UPDATE 写入 verified 和 verified_by。queryset.update 不触发 post_save，
+    连续完成记录在同一事务中批量重算，队伍统计和任务类成就在提交后各提交一次后台任务。
+
+    Args:
+        user: 审核人（User）
+        verified: True 为审核通过，False 为驳回
+        completion_ids: 完成记录ID列表，与 queryset 二选一
+        queryset: 按条件筛选的完成记录，每次最多处理 MAX_BATCH_SIZE 条（按ID顺序）
+        team_ids: 只允许审核这些队伍中队员完成这些队伍任务的记录，None 表示不限
+
+    Returns:
+        tuple: ({完成记录ID: 处理结果}, 是否还有超出 MAX_BATCH_SIZE 未处理的记录)
+    """
+    if completion_ids is not None:
+        completion_ids = list(dict.fromkeys(completion_ids))
+        queryset = TaskCompletion.objects.filter(id__in=completion_ids)
+    if team_ids is not None:
+        queryset = _limit_to_teams(queryset, team_ids)
+
+    with transaction.atomic():
+        # 多取一条用于判断是否还有未处理的记录
+        rows = list(queryset.select_for_update().order_by('id').values_list(
+            'id', 'task_id', 'player_id', 'completion_date', 'verified'
+        )[:MAX_BATCH_SIZE + 1])
+        truncated = len(rows) > MAX_BATCH_SIZE
+        rows = rows[:MAX_BATCH_SIZE]
+        changed = [row for row in rows if row[4] != verified]
+
+        if changed:
+            TaskCompletion.objects.filter(id__in=[row[0] for row in changed]).update(
+                verified=verified, verified_by=user, updated_at=datetime.now()
+            )
+            refresh_task_streaks({(task_id, player_id) for _, task_id, player_id, _, _ in changed})
+
+            submit_on_commit(
+                refresh_daily_stats_bulk,
+                tuple(sorted({row[1] for row in changed})),
+                tuple(sorted({row[3] for row in changed}))
+            )
+
+            if verified:
+                task_ids = {row[1] for row in changed}
+                include_daily = Task.objects.filter(id__in=task_ids, period='daily').exists()
+                enqueue_bulk_task_completion_event([row[2] for row in changed], include_daily)
+
+    changed_ids = {row[0] for row in changed}
+    outcomes = {row[0]: UPDATED if row[0] in changed_ids else UNCHANGED for row in rows}
+
+    if completion_ids is not None:
+        missing = [completion_id for completion_id in completion_ids if completion_id not in outcomes]
+        existing = set(TaskCompletion.objects.filter(id__in=missing).values_list('id', flat=True)) if missing else set()
+        for completion_id in missing:
+            outcomes[completion_id] = FORBIDDEN if completion_id in existing else NOT_FOUND
+
+    logger.info(f"批量{'审核通过' if verified else '驳回'}完成记录：更新 {len(changed)} 条，共 {len(outcomes)} 条")
+    return outcomes, truncated
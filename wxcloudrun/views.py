@@ -1,13 +1,13 @@
 import json
 import logging
-import jwt  # Add this import for JWT functions
 from django.http import JsonResponse
 from django.shortcuts import render, redirect
-from django.conf import settings  # Add this import for settings
 from django.contrib.auth import authenticate, login as auth_login
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from .models import Parent, Player  # Add models import
+from .auth_utils import require_principal
+from .image_pipeline import thumbnail_urls
 
 logger = logging.getLogger('log')
 
@@ -92,21 +92,12 @@ def parent_login(request):
 def get_parent_players(request):
     """获取家长绑定的队员列表"""
     # 验证token
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return JsonResponse({'code': 401, 'message': '无效的token格式'}, status=401)
-    
-    token = auth_header.split(' ')[1]
+    principal, error_response = require_principal(request, 'parent')
+    if error_response:
+        return error_response
     
     try:
-        # 解码token
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=['HS256'])
-        
-        # 验证用户类型
-        if payload.get('user_type') != 'parent':
-            return JsonResponse({'code': 401, 'message': '用户类型错误'}, status=401)
-            
-        parent_id = payload.get('user_id')
+        parent_id = principal.user_id
         
         # 获取家长
         try:
@@ -115,8 +106,10 @@ def get_parent_players(request):
             return JsonResponse({'code': 404, 'message': '家长不存在'}, status=404)
         
         # 获取绑定的队员列表
+        players = list(parent.players.all())
+        thumbnails = thumbnail_urls([player.avatar for player in players])
         players_data = []
-        for player in parent.players.all():
+        for player in players:
             players_data.append({
                 'id': player.id,
                 'name': player.name,
@@ -130,6 +123,7 @@ def get_parent_players(request):
                     'year': player.enrollment_year.year
                 } if player.enrollment_year else None,
                 'avatar': player.avatar,
+                'avatar_thumbnail': thumbnails.get(player.avatar),
                 'teams': [{'id': team.id, 'name': team.name} for team in player.teams.all()]
             })
         
@@ -140,10 +134,6 @@ def get_parent_players(request):
                 'players': players_data
             }
         })
-    except jwt.ExpiredSignatureError:
-        return JsonResponse({'code': 401, 'message': 'token已过期'}, status=401)
-    except jwt.InvalidTokenError:
-        return JsonResponse({'code': 401, 'message': '无效的token'}, status=401)
     except Exception as e:
         logger.error(f"获取队员列表错误: {str(e)}")
         return JsonResponse({'code': 500, 'message': '服务器错误'}, status=500)